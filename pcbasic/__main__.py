@@ -145,6 +145,7 @@ def start_basic():
     import devices
     import disk
     import cassette
+    import var
     import reset
     import sound
     import audio
@@ -161,6 +162,9 @@ def start_basic():
             # override selected settings from command line
             cassette.override()
             disk.override()
+            # states saved by older versions have no line number index or variable slots
+            program.rebuild_line_index()
+            var.convert_variables()
             # suppress double prompt
             if not state.basic_state.execute_mode:
                 state.basic_state.prompt = False
@@ -29,6 +29,7 @@ esc_set_scroll_screen = '\x1b[r'
 esc_set_scroll_region = '\x1b[%i;%ir'
 esc_clear_screen = '\x1b[2J'
 esc_clear_line = '\x1b[2K'
+esc_clear_to_eol = '\x1b[K'
 esc_scroll_up = '\x1b[%iS'
 esc_scroll_down = '\x1b[%iT'
 esc_show_cursor = '\x1b[?25h'
@@ -41,6 +42,7 @@ esc_request_size = '\x1b[18;t'
 esc_set_cursor_colour = '\x1b]12;%s\x07'
 esc_set_cursor_shape = '\x1b[%i q'  #% (2*(is_line+1) - blinks)    # 1 blinking block 2 block 3 blinking line 4 line
 esc_set_colour = '\x1b[%im'
+esc_set_colours = '\x1b[%sm'
 esc_set_title = '\x1b]2;%s\x07'
 esc_clear_line = '\x1b[2K'
 esc_move_right = '\x1b\x5b\x43'
@@ -16,7 +16,64 @@ import scancode
 import error
 import clipboard
 
-video_queue = Queue.Queue()
+
+class VideoQueue(Queue.Queue):
+    """ Video signal queue that collects glyph and cursor updates into batches. """
+
+    def __init__(self):
+        """ Initialise queue and empty batch. """
+        Queue.Queue.__init__(self)
+        self._clear_batch()
+
+    def _clear_batch(self):
+        """ Start a new batch. """
+        # (glyph params, rect params or None) per cell, in order of last update
+        self._batch = []
+        # position in the batch of each cell's latest update
+        self._cells = {}
+        # latest cursor signal of each type
+        self._cursor = {}
+
+    def put(self, item, block=True, timeout=None):
+        """ Put a signal on the queue, after any pending updates. """
+        if self._batch or self._cursor:
+            self.flush()
+        Queue.Queue.put(self, item, block, timeout)
+
+    def put_cell(self, glyph, rect=None):
+        """ Add a cell update to the batch, replacing any previous one. """
+        key = glyph[:3]
+        index = self._cells.get(key)
+        if index is not None:
+            # a glyph-only update leaves the previous pixels to be drawn
+            rect = rect or self._batch[index][1]
+            self._batch[index] = None
+        self._cells[key] = len(self._batch)
+        self._batch.append((glyph, rect))
+        # compact if most of the batch has been overwritten
+        if len(self._batch) > 2 * len(self._cells) + 64:
+            self._batch = [entry for entry in self._batch if entry]
+            self._cells = dict((entry[0][:3], i)
+                               for i, entry in enumerate(self._batch))
+
+    def put_cursor(self, signal):
+        """ Hold a cursor signal until the batch is sent, replacing any previous one. """
+        self._cursor[signal.event_type] = signal
+
+    def flush(self):
+        """ Hand the pending updates to the video plugin. """
+        if not self._batch and not self._cursor:
+            return
+        batch = [entry for entry in self._batch if entry]
+        cursor = self._cursor
+        self._clear_batch()
+        if batch:
+            Queue.Queue.put(self, Event(VIDEO_PUT_BATCH, batch))
+        for event_type in sorted(cursor):
+            Queue.Queue.put(self, cursor[event_type])
+
+
+video_queue = VideoQueue()
 input_queue = Queue.Queue()
 # audio queues
 message_queue = Queue.Queue()
@@ -100,10 +157,14 @@ VIDEO_FILL_INTERVAL = 19
 # put rect
 VIDEO_PUT_RECT = 20
 VIDEO_FILL_RECT = 21
+# put batch of glyphs and their rects
+VIDEO_PUT_BATCH = 22
 # copy page
 VIDEO_COPY_PAGE = 28
 # set caption message
 VIDEO_SET_CAPTION = 29
+# capture a frame
+VIDEO_CAPTURE = 30
 
 # input queue signals
 # special keys
@@ -136,7 +197,11 @@ num_fn_keys = 10
 
 def prepare():
     """ Initialise backend module. """
-    global pcjr_sound
+    global pcjr_sound, speed, capture_s
+    # statements per second to emulate; 0 for unthrottled
+    speed = max(0, config.get('speed'))
+    # interval between frame captures while a program runs; 0 for none
+    capture_s = max(0, config.get('capture-interval')) / 1000.
     # we need this for KEY event
     global num_fn_keys
     if config.get('syntax') == 'tandy':
@@ -165,18 +230,94 @@ def prepare():
 tick_s = 0.0006
 longtick_s = 0.024 - tick_s
 
+# while running a program, check events at least every poll_statements
+# statements and at least every poll_s seconds
+poll_statements = 500
+poll_s = 0.002
+# if throttling falls further behind than this, don't try to catch up
+throttle_slack_s = 0.1
+# a program that polls an empty keyboard this many times in a row, with less than
+# poll_s between polls, is only waiting for a key and can sleep between polls
+idle_polls = 20
+# hand batched screen updates to the video plugin at least this often
+frame_s = 0.024
+
 icon = None
 initial_mode = None
 
+# statements left until the next event check
+poll_countdown = 0
+# time at which the next event check is due
+poll_due = 0.
+# throttle reference time and statements executed since
+throttle_start, throttle_count = 0., 0
+# consecutive empty keyboard polls and the time the last one ended
+idle_count, idle_last = 0, 0.
+# time at which the next batch of screen updates is due
+frame_due = 0.
+# interval between frame captures in seconds, 0 for none
+capture_s = 0.
+# time at which the next frame capture is due
+capture_due = 0.
+
 def wait(suppress_events=False):
     """ Wait and check events. """
+    video_queue.flush()
     time.sleep(longtick_s)
     if not suppress_events:
         check_events()
 
+def poll_events():
+    """ Count a statement and check events if due; throttle if required. """
+    global poll_countdown, poll_due
+    poll_countdown -= 1
+    now = time.time()
+    if poll_countdown > 0 and now < poll_due:
+        return
+    if speed:
+        now = throttle(now)
+    poll_countdown, poll_due = poll_statements, now + poll_s
+    # let the interface threads have a go
+    time.sleep(0)
+    check_events()
+
+def idle(is_empty):
+    """ Note a nonblocking keyboard poll; wait if the program is only polling. """
+    global idle_count, idle_last
+    now = time.time()
+    if not is_empty or now - idle_last > poll_s:
+        # a key was found or the program did other work since the last poll
+        idle_count = 0
+    else:
+        idle_count += 1
+    if idle_count > idle_polls:
+        wait()
+        now = time.time()
+    idle_last = now
+
+def throttle(now):
+    """ Sleep until the emulated statement rate catches up; return the time. """
+    global throttle_start, throttle_count
+    throttle_count += poll_statements - poll_countdown
+    target = throttle_start + throttle_count / float(speed)
+    if target < now - throttle_slack_s:
+        # we've been waiting on something else; restart the count
+        throttle_start, throttle_count = now, 0
+    elif target > now:
+        time.sleep(target - now)
+        now = time.time()
+    return now
+
 def check_events():
     """ Main event cycle. """
-    time.sleep(tick_s)
+    global frame_due, capture_due
+    now = time.time()
+    if now >= frame_due:
+        frame_due = now + frame_s
+        video_queue.flush()
+    if capture_s and state.basic_state.run_mode and now >= capture_due:
+        capture_due = now + capture_s
+        video_queue.put(Event(VIDEO_CAPTURE, 'interval'))
     check_input()
     if state.basic_state.run_mode:
         for e in state.basic_state.events.all:
@@ -192,6 +333,7 @@ def check_input():
             if not state.console_state.keyb.pause:
                 break
             else:
+                video_queue.flush()
                 time.sleep(tick_s)
                 continue
         # we're on it
@@ -0,0 +1,230 @@
+"""
+PC-BASIC - codecache.py
+Pre-parsed program code
+
+(c) 2016 Rob Hagemans
+This file is released under the GNU GPL version 3.
+"""
+
+import string
+
+import config
+import error
+import state
+import util
+import var
+import vartypes
+import expressions
+import basictoken as tk
+
+# compiled execution mode: parse program code once and keep the result
+enabled = False
+
+# pre-parsed expressions, keyed by bytecode offset: (callable, end offset)
+# None if the code at that offset can't be pre-parsed
+expressions_cache = {}
+# pre-parsed statements, keyed by bytecode offset: (callable, end offset)
+statements_cache = {}
+# resolved jump targets, keyed by bytecode offset of the line number reference:
+# (offset of target line, end offset); these are kept even if not enabled
+jumps_cache = {}
+# variable names as read from the code, keyed by bytecode offset: (name, end offset)
+# the type is completed on use as it depends on DEFtype; also kept if not enabled
+names_cache = {}
+
+
+class CannotCompile(Exception):
+    """ Code can't be pre-parsed and must be interpreted. """
+    pass
+
+
+def prepare():
+    """ Initialise the codecache module. """
+    global enabled
+    enabled = config.get('precompile')
+
+def invalidate():
+    """ Drop all pre-parsed code; must be called whenever the program changes. """
+    expressions_cache.clear()
+    statements_cache.clear()
+    jumps_cache.clear()
+    names_cache.clear()
+
+def get_expression(ins):
+    """ Retrieve pre-parsed expression at the current code pointer, or None. """
+    return _get_cached(ins, expressions_cache, compile_expression)
+
+def get_let(ins):
+    """ Retrieve pre-parsed LET statement at the current code pointer, or None. """
+    return _get_cached(ins, statements_cache, compile_let)
+
+def _get_cached(ins, cache, compile_fn):
+    """ Retrieve or build pre-parsed code and move the pointer past it. """
+    pos = ins.tell()
+    try:
+        entry = cache[pos]
+    except KeyError:
+        try:
+            entry = compile_fn(ins), ins.tell()
+        except (CannotCompile, error.RunError):
+            # leave errors and unsupported syntax to the interpreter
+            entry = None
+        cache[pos] = entry
+    if entry is None:
+        ins.seek(pos)
+        return None
+    ins.seek(entry[1])
+    return entry[0]
+
+
+###############################################################################
+# statements
+
+def compile_let(ins):
+    """ Pre-parse the LET statement at the current code pointer. """
+    get_name, get_indices = compile_var_or_array_name(ins)
+    util.require_read(ins, (tk.O_EQ,))
+    get_value = compile_expression(ins)
+    util.require(ins, tk.end_statement)
+    if get_indices is None:
+        get_slot = get_name
+        def let():
+            """ Assign to a scalar variable. """
+            var.set_slot(get_slot(), get_value())
+    else:
+        def let():
+            """ Assign to an array element. """
+            name, indices = get_name(), get_indices()
+            # pre-dim even if this is not a legal statement!
+            var.check_dim_array(name, indices)
+            var.set_array(name, indices, get_value())
+    return let
+
+
+###############################################################################
+# expressions
+
+def compile_expression(ins):
+    """ Pre-parse the non-empty expression at the current code pointer. """
+    units, operators = [], []
+    while True:
+        d = util.skip_white(ins)
+        if d in tk.end_expression:
+            break
+        units.append(compile_expr_unit(ins))
+        d = util.skip_white(ins)
+        if d not in expressions.operator_tokens:
+            break
+        operators.append(expressions.read_operator(ins))
+    if not units or len(units) <= len(operators):
+        raise CannotCompile()
+    if not operators:
+        return units[0]
+    steps = _operator_steps(operators)
+    value_operator = expressions.value_operator
+    def evaluate():
+        """ Evaluate all units from left to right, then apply operators. """
+        values = [unit() for unit in units]
+        for op, left, right in steps:
+            values[left] = value_operator(op, values[left], values[right])
+        return values[0]
+    return evaluate
+
+def _operator_steps(operators):
+    """ Work out the order in which binary operators are applied to the units. """
+    # same precedence climbing as expressions.parse_operators, on unit slots
+    stack, steps = [(0, None, None)], []
+    left = 0
+    for right, op in enumerate(operators, 1):
+        strength = expressions.binding.get(op)
+        if strength is None:
+            raise CannotCompile()
+        while stack[-1][0] >= strength:
+            _, stacked_op, stacked_left = stack.pop()
+            steps.append((stacked_op, stacked_left, left))
+            left = stacked_left
+        stack.append((strength, op, left))
+        left = right
+    while len(stack) > 1:
+        _, stacked_op, stacked_left = stack.pop()
+        steps.append((stacked_op, stacked_left, left))
+        left = stacked_left
+    return steps
+
+def compile_expr_unit(ins):
+    """ Pre-parse the expression unit at the current code pointer. """
+    d = util.skip_white(ins)
+    if d == '"' or d in string.digits or d in tk.number or d == tk.T_UINT:
+        # literals: parse now, copy on use
+        value = expressions.parse_expr_unit(ins)
+        if value is None:
+            raise CannotCompile()
+        typechar, literal = value
+        return lambda: (typechar, literal[:])
+    elif d in string.ascii_letters:
+        get_name, get_indices = compile_var_or_array_name(ins)
+        if get_indices is None:
+            get_slot = get_name
+            return lambda: var.get_slot_value(get_slot())
+        return lambda: var.get_array(get_name(), get_indices())
+    elif d == '(':
+        return compile_bracket(ins)
+    ins.read(1)
+    if d == tk.O_PLUS:
+        return compile_expr_unit(ins)
+    elif d == tk.O_MINUS:
+        operand = compile_expr_unit(ins)
+        return lambda: vartypes.number_neg(vartypes.pass_number_keep(operand()))
+    elif d == tk.NOT:
+        operand = compile_expr_unit(ins)
+        return lambda: vartypes.pack_int(~vartypes.pass_int_unpack(operand()))
+    elif d == '\xFF':
+        d += ins.read(1)
+        try:
+            fn = expressions.bracket_functions[d]
+        except KeyError:
+            raise CannotCompile()
+        argument = compile_bracket(ins)
+        return lambda: fn(argument())
+    raise CannotCompile()
+
+def compile_bracket(ins):
+    """ Pre-parse a bracketed expression. """
+    util.require_read(ins, ('(',))
+    inner = compile_expression(ins)
+    util.require_read(ins, (')',))
+    return inner
+
+def compile_var_or_array_name(ins):
+    """ Pre-parse a variable or array name with its indices, if any.
+        For scalars, return a slot getter instead of a name getter. """
+    name = util.read_var_name(ins)
+    typed = name[-1] in ('$', '%', '!', '#')
+    if typed:
+        name = util.complete_var_name(name)
+        get_name = lambda: name
+    else:
+        # type depends on DEFtype statements at run time
+        base, letter = name[:40].upper(), ord(name[0].upper()) - ord('A')
+        get_name = lambda: base + state.basic_state.deftype[letter]
+    if not util.skip_white_read_if(ins, ('[', '(')):
+        if typed:
+            # slots are never released, so the slot number can be kept
+            slot = var.get_slot(name)
+            return (lambda: slot), None
+        return (lambda: var.get_slot(get_name())), None
+    index_exprs = []
+    while True:
+        index_exprs.append(compile_expression(ins))
+        if not util.skip_white_read_if(ins, (',',)):
+            break
+    if len(index_exprs) > 255:
+        raise CannotCompile()
+    util.require_read(ins, (']', ')'))
+    def get_indices():
+        """ Evaluate all indices, then convert. """
+        values = [index() for index in index_exprs]
+        return [vartypes.pass_int_unpack(value) for value in values]
+    return get_name, get_indices
+
+prepare()
@@ -77,7 +77,7 @@ arguments = {
     'interface': {
         'type': 'string', 'default': '',
         'choices': ('', 'none', 'cli', 'text', 'graphical',
-                    'ansi', 'curses', 'pygame', 'sdl2'), },
+                    'ansi', 'curses', 'pygame', 'sdl2', 'headless'), },
     'load': {'type': 'string', 'default': '', },
     'run': {'type': 'string', 'default': '',  },
     'convert': {'type': 'string', 'default': '', },
@@ -123,6 +123,7 @@ arguments = {
     'cga-low': {'type': 'bool', 'default': False,},
     'nobox': {'type': 'bool', 'default': False,},
     'utf8': {'type': 'bool', 'default': False,},
+    'text-flush': {'type': 'string', 'default': 'line',},
     'border': {'type': 'int', 'default': 5,},
     'pen': {
         'type': 'string', 'default': 'left',
@@ -152,6 +153,12 @@ arguments = {
     'ctrl-c-break': {'type': 'bool', 'default': True,},
     'wait': {'type': 'bool', 'default': False,},
     'current-device': {'type': 'string', 'default': 'Z'},
+    'precompile': {'type': 'bool', 'default': False,},
+    'speed': {'type': 'int', 'default': 0,},
+    'capture-file': {'type': 'string', 'default': 'frame%04d',},
+    'capture-format': {'type': 'string', 'choices': ('png', 'raw'), 'default': 'png',},
+    'capture-on': {'type': 'string', 'list': '*', 'choices': ('end', 'pcopy', 'quit'), 'default': ['end'],},
+    'capture-interval': {'type': 'int', 'default': 0,},
     'use-serial-brewer': { 'type' : 'bool', 'default': True },
     'verbose-brewer': { 'type' : 'bool', 'default': True }
 }
@@ -146,7 +146,7 @@ def get_logical_line(srow):
     # add all rows of the logical line
     for therow in state.console_state.screen.apage.row[
                                 srow-1:state.console_state.screen.mode.height]:
-        line += bytearray(pair[0] for pair in therow.buf[:therow.end])
+        line += therow.chars[:therow.end]
         # continue so long as the line wraps
         if not therow.wrap:
             break
@@ -171,11 +171,9 @@ def get_logical_line_input(srow, prompt_row, left, right):
             therow = state.console_state.screen.apage.row[crow-1]
             # exclude prompt, if any; only go from furthest_left to furthest_right
             if crow == prompt_row:
-                rowpairs = therow.buf[:therow.end][left-1:right-1]
+                line += therow.chars[:therow.end][left-1:right-1]
             else:
-                rowpairs = therow.buf[:therow.end]
-            # get characters from char/attr pairs and convert to bytearray
-            line += bytearray(pair[0] for pair in rowpairs)
+                line += therow.chars[:therow.end]
             if not therow.wrap:
                 break
             # wrap before end of line means LF
@@ -322,9 +320,11 @@ def insert(crow, ccol, c, cattr):
     """ Insert a single byte at the current position. """
     while True:
         therow = state.console_state.screen.apage.row[crow-1]
-        therow.buf.insert(ccol-1, (c, cattr))
+        therow.chars.insert(ccol-1, c)
+        therow.attrs.insert(ccol-1, cattr)
         if therow.end < state.console_state.screen.mode.width:
-            therow.buf.pop()
+            therow.chars.pop()
+            therow.attrs.pop()
             if therow.end > ccol-1:
                 therow.end += 1
             else:
@@ -338,7 +338,7 @@ def insert(crow, ccol, c, cattr):
             if not therow.wrap and crow < state.console_state.screen.mode.height:
                 state.console_state.screen.scroll_down(crow+1)
                 therow.wrap = True
-            c, cattr = therow.buf.pop()
+            c, cattr = chr(therow.chars.pop()), therow.attrs.pop()
             crow += 1
             ccol = 1
 
@@ -368,19 +368,23 @@ def delete_sbcs_char(crow, ccol):
         nextrow = thepage.row[crow]
         # replace everything after the delete location with
         # stuff from the next row
-        therow.buf[ccol-1:] = nextrow.buf[:width-ccol+1]
+        therow.chars[ccol-1:] = nextrow.chars[:width-ccol+1]
+        therow.attrs[ccol-1:] = nextrow.attrs[:width-ccol+1]
         therow.end = min(max(therow.end, ccol) + nextrow.end, width)
         # and continue on the following rows as long as we wrap.
         while crow < state.console_state.scroll_height and nextrow.wrap:
             nextrow2 = thepage.row[crow+1]
-            nextrow.buf = (nextrow.buf[width-ccol+1:] +
-                           nextrow2.buf[:width-ccol+1])
+            nextrow.chars = (nextrow.chars[width-ccol+1:] +
+                             nextrow2.chars[:width-ccol+1])
+            nextrow.attrs = (nextrow.attrs[width-ccol+1:] +
+                             nextrow2.attrs[:width-ccol+1])
             nextrow.end = min(nextrow.end + nextrow2.end, width)
             crow += 1
             therow, nextrow = thepage.row[crow-1], thepage.row[crow]
         # replenish last row with empty space
-        nextrow.buf = (nextrow.buf[width-ccol+1:] +
-                       [(' ', state.console_state.screen.attr)] * (width-ccol+1))
+        nextrow.chars = nextrow.chars[width-ccol+1:] + ' ' * (width-ccol+1)
+        nextrow.attrs = (nextrow.attrs[width-ccol+1:] +
+                         chr(state.console_state.screen.attr) * (width-ccol+1))
         # adjust the row end
         nextrow.end -= width - ccol
         # redraw the full logical line from the original position onwards
@@ -397,16 +401,20 @@ def delete_sbcs_char(crow, ccol):
             if (therow.end < width or crow == state.console_state.scroll_height
                     or not therow.wrap):
                 # no knock on to next row, just delete the char
-                del therow.buf[ccol-1]
+                del therow.chars[ccol-1]
+                del therow.attrs[ccol-1]
                 # and replenish the buffer at the end of the line
-                therow.buf.insert(therow.end-1, (' ', state.console_state.screen.attr))
+                therow.chars.insert(therow.end-1, ' ')
+                therow.attrs.insert(therow.end-1, state.console_state.screen.attr)
                 break
             else:
                 # wrap and end[row-1]==width
                 nextrow = thepage.row[crow]
                 # delete the char and replenish from next row
-                del therow.buf[ccol-1]
-                therow.buf.insert(therow.end-1, nextrow.buf[0])
+                del therow.chars[ccol-1]
+                del therow.attrs[ccol-1]
+                therow.chars.insert(therow.end-1, nextrow.chars[0])
+                therow.attrs.insert(therow.end-1, nextrow.attrs[0])
                 # then move on to the next row and delete the first char
                 crow += 1
                 therow, nextrow = thepage.row[crow-1], thepage.row[crow]
@@ -432,9 +440,9 @@ def clear_rest_of_line(srow, scol):
     """ Clear from given position to end of logical line (CTRL+END). """
     mode = state.console_state.screen.mode
     therow = state.console_state.screen.apage.row[srow-1]
-    therow.buf = (therow.buf[:scol-1] +
-        [(' ', state.console_state.screen.attr)] * (mode.width-scol+1))
-    therow.double = (therow.double[:scol-1] + [0] * (mode.width-scol+1))
+    therow.chars[scol-1:] = ' ' * (mode.width-scol+1)
+    therow.attrs[scol-1:] = chr(state.console_state.screen.attr) * (mode.width-scol+1)
+    therow.double[scol-1:] = bytearray(mode.width-scol+1)
     therow.end = min(therow.end, scol-1)
     crow = srow
     while state.console_state.screen.apage.row[crow-1].wrap:
@@ -521,8 +529,8 @@ def skip_word_right():
     crow, ccol = state.console_state.row, state.console_state.col
     # find non-alphanumeric chars
     while True:
-        c = state.console_state.screen.apage.row[crow-1].buf[ccol-1][0]
-        if (c not in string.digits + string.ascii_letters):
+        c = state.console_state.screen.apage.row[crow-1].chars[ccol-1]
+        if (chr(c) not in string.digits + string.ascii_letters):
             break
         ccol += 1
         if ccol > state.console_state.screen.mode.width:
@@ -533,8 +541,8 @@ def skip_word_right():
             ccol = 1
     # find alphanumeric chars
     while True:
-        c = state.console_state.screen.apage.row[crow-1].buf[ccol-1][0]
-        if (c in string.digits + string.ascii_letters):
+        c = state.console_state.screen.apage.row[crow-1].chars[ccol-1]
+        if (chr(c) in string.digits + string.ascii_letters):
             break
         ccol += 1
         if ccol > state.console_state.screen.mode.width:
@@ -557,8 +565,8 @@ def skip_word_left():
                 return
             crow -= 1
             ccol = state.console_state.screen.mode.width
-        c = state.console_state.screen.apage.row[crow-1].buf[ccol-1][0]
-        if (c in string.digits + string.ascii_letters):
+        c = state.console_state.screen.apage.row[crow-1].chars[ccol-1]
+        if (chr(c) in string.digits + string.ascii_letters):
             break
     # find non-alphanumeric chars
     while True:
@@ -569,8 +577,8 @@ def skip_word_left():
                 break
             crow -= 1
             ccol = state.console_state.screen.mode.width
-        c = state.console_state.screen.apage.row[crow-1].buf[ccol-1][0]
-        if (c not in string.digits + string.ascii_letters):
+        c = state.console_state.screen.apage.row[crow-1].chars[ccol-1]
+        if (chr(c) not in string.digits + string.ascii_letters):
             break
     set_pos(last_row, last_col)
 
@@ -9,15 +9,20 @@ This file is released under the GNU GPL version 3.
 from StringIO import StringIO
 import sys
 import traceback
+import timeit
 
 import config
 import logging
 import state
 import vartypes
+import var
 import representation
 import expressions
 import tokenise
 import program
+import statements
+import basictoken as tk
+import disk
 
 debug_mode = False
 debug_tron = False
@@ -67,6 +72,33 @@ def debug_handle_exc(e):
     """ Handle debugging exception. """
     logging.debug(str(type(e))+' '+str(e))
 
+
+class TokenProfile(object):
+    """ Per-token call counts and cumulative execution times. """
+
+    def __init__(self):
+        """ Initialise empty profile. """
+        self.counts = {}
+        self.times = {}
+
+    def call(self, token, fn, ins):
+        """ Call the handler for a token and record count and time taken. """
+        start = timeit.default_timer()
+        try:
+            return fn(ins)
+        finally:
+            self.times[token] = (self.times.get(token, 0.) +
+                                 timeit.default_timer() - start)
+            self.counts[token] = self.counts.get(token, 0) + 1
+
+    def report(self):
+        """ Return (keyword, count, total time) tuples, slowest first. """
+        return sorted(((tk.to_keyword.get(token, token.encode('hex')),
+                        self.counts[token], self.times[token])
+                       for token in self.counts),
+                      key=lambda item: item[2], reverse=True)
+
+
 # DEBUG user utilities
 
 def dump_program():
@@ -75,7 +107,7 @@ def dump_program():
 
 def dump_vars():
     """ Dump all variables to the log. """
-    logging.debug(repr(state.basic_state.variables))
+    logging.debug(repr(dict(var.get_var_list())))
 
 def show_screen():
     """ Copy the screen buffer to the log. """
@@ -83,14 +115,13 @@ def show_screen():
     i = 0
     lastwrap = False
     for row in state.console_state.screen.apage.row:
-        s = [ c[0] for c in row.buf ]
         i += 1
         outstr = '{0:2}'.format(i)
         if lastwrap:
             outstr += ('\\')
         else:
             outstr += ('|')
-        outstr += (''.join(s))
+        outstr += str(row.chars)
         if row.wrap:
             logging.debug(outstr + '\\ {0:2}'.format(row.end))
         else:
@@ -122,6 +153,36 @@ def trace(on=True):
     global debug_tron
     debug_tron = on
 
+def profile(on=True):
+    """ Switch per-token statement and function profiling on or off. """
+    statements.profile = TokenProfile() if on else None
+    expressions.profile = TokenProfile() if on else None
+
+def show_profile():
+    """ Write the per-token profile to the log. """
+    for name, prof in (('statements', statements.profile),
+                       ('functions', expressions.profile)):
+        if not prof:
+            continue
+        logging.debug('%s profile:', name)
+        for keyword, count, total in prof.report():
+            logging.debug('%-10s %10d %10.6fs %10.3fus', keyword, count,
+                          total, 1e6*total/count)
+
+def show_gc():
+    """ Write string space garbage collection statistics to the log. """
+    logging.debug('collections: %d, bytes moved: %d, pause time: %.6fs, free: %d',
+                  var.gc_stats.collections, var.gc_stats.bytes_moved,
+                  var.gc_stats.pause_time, var.fre())
+
+def show_locks():
+    """ Write file lock contention statistics to the log. """
+    logging.debug('opens denied: %d, locks granted: %d, locks denied: %d, '
+                  'unlocks denied: %d, files with locks: %d',
+                  disk.lock_stats.opens_denied, disk.lock_stats.locks_granted,
+                  disk.lock_stats.locks_denied, disk.lock_stats.unlocks_denied,
+                  sum(1 for locks in state.io_state.locks.itervalues() if locks.starts))
+
 def watch(expr):
     """ Add an expression to the watch list. """
     outs = tokenise.tokenise_line('?'+expr)
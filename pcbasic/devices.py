@@ -7,6 +7,7 @@ This file is released under the GNU GPL version 3.
 """
 
 import os
+import re
 import copy
 
 import config
@@ -285,9 +286,21 @@ class RawFile(object):
 import representation
 import vartypes
 
+# EOF char will actually stop further reading
+# (that's true in disk text files but not on LPT devices)
+eof_char_re = re.compile('\x1a')
+# chars that end an output line
+newline_re = re.compile('[\r\n]')
+# nonprinting chars, which do not count towards the WIDTH
+control_chars = ''.join(chr(c) for c in range(32))
+
 class TextFileBase(RawFile):
     """ Base for text files on disk, KYBD file, field buffer. """
 
+    # number of bytes to read ahead from the stream at once
+    # only the look-ahead char is read on streams that are used directly
+    read_block_size = 1
+
     def __init__(self, fhandle, filetype, mode,
                  first_char='', split_long_lines=True):
         """ Setup the basic properties of the file. """
@@ -300,7 +313,7 @@ class TextFileBase(RawFile):
         # Random files are derived from text files and start in 'I' operating mode
         if self.mode in 'IR' and not first_char:
             try:
-                self.next_char = self.fhandle.read(1)
+                self._fill()
             except (EnvironmentError, ValueError):
                 # only catching ValueError here because that's what Serial raises
                 self.next_char = ''
@@ -308,18 +321,70 @@ class TextFileBase(RawFile):
         self.split_long_lines = split_long_lines
         self.char, self.last = '', ''
 
-    def read_raw(self, num=-1):
-        """ Read num characters as string. """
-        s = ''
-        while True:
-            if (num > -1 and len(s) >= num):
+    def __setstate__(self, st):
+        """ Unpickle; convert files saved with a single look-ahead char. """
+        if 'next_char' in st:
+            st['_buf'], st['_pos'] = st.pop('next_char'), 0
+        self.__dict__.update(st)
+
+    # read-ahead buffer: the look-ahead char is at _pos in _buf
+    # and the rest of _buf has been read from the stream but not used yet
+
+    @property
+    def next_char(self):
+        """ The next char to be read; empty at end of stream. """
+        return self._buf[self._pos:self._pos+1]
+
+    @next_char.setter
+    def next_char(self, c):
+        """ Replace the read-ahead buffer with a single look-ahead char. """
+        self._buf, self._pos = str(c), 0
+
+    def _fill(self):
+        """ Read the next block from the stream once the buffer is used up. """
+        if self._pos >= len(self._buf):
+            self._buf, self._pos = str(self.fhandle.read(self.read_block_size)), 0
+
+    def _skip(self):
+        """ Drop the look-ahead char without recording it as read. """
+        self._pos += 1
+        self._fill()
+
+    def _read_run(self, num, stop_re):
+        """ Read up to num chars (all if -1), stopping before a match of stop_re. """
+        parts, count = [], 0
+        while num < 0 or count < num:
+            buf, pos = self._buf, self._pos
+            if pos >= len(buf):
                 break
-            # check for \x1A (EOF char will actually stop further reading
-            # (that's true in disk text files but not on LPT devices)
-            if self.next_char in ('\x1a', ''):
+            end = len(buf) if num < 0 else min(len(buf), pos + num - count)
+            match = stop_re.search(buf, pos, end)
+            if match:
+                end = match.start()
+            parts.append(buf[pos:end])
+            count += end - pos
+            self._pos = end
+            self._fill()
+            if match:
                 break
-            s += self.next_char
-            self.next_char, self.char, self.last = self.fhandle.read(1), self.next_char, self.char
+        return ''.join(parts)
+
+    def _track(self, s):
+        """ Record the last two chars read. """
+        if len(s) > 1:
+            self.last, self.char = s[-2], s[-1]
+        elif s:
+            self.last, self.char = self.char, s
+
+    def _stream_pos(self):
+        """ Stream position as if only the look-ahead char had been read. """
+        return (self.fhandle.tell() - len(self._buf) + self._pos
+                + len(self.next_char))
+
+    def read_raw(self, num=-1):
+        """ Read num characters as string. """
+        s = self._read_run(num, eof_char_re)
+        self._track(s)
         return s
 
     def read_line(self):
@@ -346,32 +411,33 @@ class TextFileBase(RawFile):
 
     def write(self, s):
         """ Write the string s to the file, taking care of width settings. """
+        s = str(s)
         # only break lines at the start of a new string. width 255 means unlimited width
-        s_width = 0
-        newline = False
         # find width of first line in s
-        for c in str(s):
-            if c in ('\r', '\n'):
-                newline = True
-                break
-            if ord(c) >= 32:
-                # nonprinting characters including tabs are not counted for WIDTH
-                s_width += 1
+        match = newline_re.search(s)
+        newline = match is not None
+        first = s[:match.start()] if newline else s
+        # nonprinting characters including tabs are not counted for WIDTH
+        s_width = len(first.translate(None, control_chars))
         if self.width != 255 and self.col != 1 and self.col-1 + s_width > self.width and not newline:
             self.write_line()
             self.flush()
             self.col = 1
-        for c in str(s):
-            # don't replace CR or LF with CRLF when writing to files
-            if c in ('\n', '\r'):
-                self.fhandle.write(c)
-                self.flush()
-                self.col = 1
-            else:
-                self.fhandle.write(c)
-                # nonprinting characters including tabs are not counted for WIDTH
-                if ord(c) >= 32:
-                    self.col += 1
+        # don't replace CR or LF with CRLF when writing to files
+        last_newline = max(s.rfind('\r'), s.rfind('\n'))
+        if last_newline >= 0:
+            self._write_out(s[:last_newline+1], True)
+            self.col = 1
+            s = s[last_newline+1:]
+        if s:
+            self._write_out(s, False)
+            self.col += len(s.translate(None, control_chars))
+
+    def _write_out(self, s, newline):
+        """ Write a run of chars to the stream; flush if it ends a line. """
+        self.fhandle.write(s)
+        if newline:
+            self.flush()
 
     def write_line(self, s=''):
         """ Write string or bytearray and follow with CR or CRLF. """
@@ -415,6 +481,11 @@ class TextFileBase(RawFile):
                 self.read(1)
         return c
 
+    def _read_field_run(self, num, quoted, typechar):
+        """ Read up to num further plain chars of an INPUT# entry at once. """
+        # unbuffered streams read entries char by char
+        return ''
+
     def _input_entry(self, typechar, allow_past_end):
         """ Read a number or string entry for INPUT """
         word, blanks = '', ''
@@ -453,6 +524,10 @@ class TextFileBase(RawFile):
             else:
                 word += blanks + c
                 blanks = ''
+                run = self._read_field_run(255 - len(word), quoted, typechar)
+                if run:
+                    word += run
+                    c = run[-1]
             if len(word) + len(blanks) >= 255:
                 break
             if not quoted:
@@ -511,6 +586,85 @@ class CRLFTextFileBase(TextFileBase):
         self.write(str(s) + '\r\n')
 
 
+# chars that end a line or a run of plain chars in an INPUT# entry
+line_end_re = re.compile('[\r\x1a]')
+quoted_stop_re = re.compile('["\0\x1a]')
+unquoted_stop_re = re.compile('[,\r\x1a \0\n]')
+
+class BlockTextFileBase(CRLFTextFileBase):
+    """ Text file with CRLF line endings, read from disk in blocks. """
+
+    read_block_size = 16384
+
+    def read(self, num=-1):
+        """ Read num characters, replacing CR LF with CR. """
+        out, count = [], 0
+        prev = self.char
+        while count < num:
+            s = self._read_run(num - count, eof_char_re)
+            if not s:
+                break
+            pieces, start = [], 0
+            while True:
+                cr = s.find('\r', start)
+                if cr < 0:
+                    pieces.append(s[start:])
+                    break
+                if cr > start:
+                    prev = s[cr-1]
+                pieces.append(s[start:cr+1])
+                start = cr + 1
+                # report CRLF as CR
+                # but LFCR, LFCRLF, LFCRLFCR etc pass unmodified
+                if prev != '\n':
+                    if start < len(s):
+                        if s[start] == '\n':
+                            start += 1
+                    elif self.next_char == '\n':
+                        self._skip()
+                prev = '\r'
+            s = ''.join(pieces)
+            if s:
+                prev = s[-1]
+            out.append(s)
+            count += len(s)
+        s = ''.join(out)
+        self._track(s)
+        return s
+
+    def read_line(self):
+        """ Read line from text file, break on CR or CRLF (not LF). """
+        s = ''
+        while not self._check_long_line(s):
+            s += self._read_run(255 - len(s), line_end_re)
+            if len(s) >= 255:
+                continue
+            if self.next_char != '\r':
+                # end of file or EOF char
+                break
+            last = s[-1] if s else self.char
+            self._skip()
+            if last == '\n':
+                # allow LF, LFCR to pass
+                s += '\r'
+                continue
+            # break on CR, CRLF
+            if self.next_char == '\n':
+                self._skip()
+            self._track(s + '\r')
+            return s
+        self._track(s)
+        if not s and self.next_char in ('', '\x1a'):
+            return None
+        return s
+
+    def _read_field_run(self, num, quoted, typechar):
+        """ Read up to num further plain chars of an INPUT# entry at once. """
+        s = self._read_run(num, quoted_stop_re if quoted else unquoted_stop_re)
+        self._track(s)
+        return s
+
+
 ############################################################################
 # FIELD buffers
 
@@ -641,6 +795,10 @@ class KYBDFile(TextFileBase):
             else:
                 word += blanks + c
                 blanks = ''
+                run = self._read_field_run(255 - len(word), quoted, typechar)
+                if run:
+                    word += run
+                    c = run[-1]
             if len(word) + len(blanks) >= 255:
                 break
             # there should be KYBD: control char replacement here even if quoted
@@ -14,6 +14,10 @@ import errno
 import logging
 import string
 import re
+import mmap
+import time
+import sys
+import bisect
 
 import plat
 if plat.system == 'Windows':
@@ -97,6 +101,11 @@ os_error = {
 universal_newline = False
 # interpret "ascii" program files as UTF-8
 utf8_files = False
+# number of bytes of text file output after which buffers are flushed to disk
+# 0 means flush on every line end, None means flush only on close
+text_flush_bytes = 0
+# size of the output buffer of text files if not flushed earlier
+text_buffer_size = 65536
 
 # allowable drive letters in GW-BASIC are letters or @
 drive_letters = '@' + string.ascii_uppercase
@@ -111,9 +120,10 @@ allowable_chars = set(string.ascii_letters + string.digits + " !#$%&'()-@^_`{}~"
 
 def prepare():
     """ Initialise disk devices. """
-    global utf8_files, universal_newline
+    global utf8_files, universal_newline, text_flush_bytes
     utf8_files = config.get('utf8')
     universal_newline = not config.get('strict-newline')
+    text_flush_bytes = _parse_text_flush(config.get('text-flush'))
     for letter in drive_letters:
         state.io_state.devices[letter + ':'] = DiskDevice(letter, None, u'')
     current_drive = config.get('current-device').upper()
@@ -125,11 +135,27 @@ def prepare():
     _set_current_device(current_drive + ':')
     reset_fields()
 
+def _parse_text_flush(spec):
+    """ Convert the text-flush setting to a number of bytes. """
+    if spec == 'line':
+        return 0
+    elif spec == 'close':
+        return None
+    try:
+        kbytes = int(spec)
+    except ValueError:
+        kbytes = -1
+    if kbytes <= 0:
+        logging.warning('Could not parse text-flush setting %s; flushing on each line.', spec)
+        return 0
+    return kbytes * 1024
+
 def override():
     """ Initialise module settings that override --resume. """
     _mount_drives(config.get('mount', False))
     # we always need to reset this or it may be a reference to an old device
     _set_current_device(config.get('current-device', True).upper() + ':')
+    _convert_locks()
 
 def _mount_drives(mount_list):
     """ Mount disk drives """
@@ -251,41 +277,272 @@ def create_file_object(fhandle, filetype, mode, name='', number=0,
 ##############################################################################
 # Locks
 
-# dict of native file names by number, for locking
+# lock table entries by native file name
 state.io_state.locks = {}
 
-def _list_locks(name):
-    """ Retrieve a list of files open to the same disk stream. """
-    return [ state.io_state.files[fnum]
-                   for (fnum, fname) in state.io_state.locks.iteritems()
-                   if fname == name ]
+# end of the byte range locked by a whole-file lock
+lock_whole_file = sys.maxint
+
+
+class LockStats(object):
+    """ File lock contention statistics. """
+
+    def __init__(self):
+        """ Initialise statistics. """
+        self.opens_denied = 0
+        self.locks_granted = 0
+        self.locks_denied = 0
+        self.unlocks_denied = 0
+
+lock_stats = LockStats()
+
+
+class FileLocks(object):
+    """ Open files and locked byte ranges on one native file. """
+
+    def __init__(self):
+        """ Initialise with no open files and no locks. """
+        # lock type and access by file number
+        self.files = {}
+        # locked ranges never overlap, so sorting by start also sorts the stops
+        self.starts, self.stops, self.owners = [], [], []
+
+    def overlaps(self, start, stop):
+        """ Whether any locked range overlaps the byte range start to stop. """
+        # the locked range starting last at or before stop is the only candidate
+        i = bisect.bisect_right(self.starts, stop) - 1
+        return i >= 0 and self.stops[i] >= start
+
+    def lock(self, number, start, stop):
+        """ Lock a byte range for a file number. """
+        if self.overlaps(start, stop):
+            lock_stats.locks_denied += 1
+            raise error.RunError(error.PERMISSION_DENIED)
+        i = bisect.bisect_left(self.starts, start)
+        self.starts.insert(i, start)
+        self.stops.insert(i, stop)
+        self.owners.insert(i, number)
+        lock_stats.locks_granted += 1
+
+    def unlock(self, number, start, stop):
+        """ Unlock a byte range; it must match a range locked by the same file. """
+        i = bisect.bisect_left(self.starts, start)
+        if (i == len(self.starts) or self.starts[i] != start or
+                self.stops[i] != stop or self.owners[i] != number):
+            lock_stats.unlocks_denied += 1
+            raise error.RunError(error.PERMISSION_DENIED)
+        del self.starts[i], self.stops[i], self.owners[i]
+
+    def release(self, number):
+        """ Remove a file number and all the ranges it has locked. """
+        del self.files[number]
+        if number in self.owners:
+            keep = [i for i, owner in enumerate(self.owners) if owner != number]
+            self.starts = [self.starts[i] for i in keep]
+            self.stops = [self.stops[i] for i in keep]
+            self.owners = [self.owners[i] for i in keep]
+
 
 def _acquire_lock(name, number, lock_type, access):
     """ Try to lock a file. """
     if not number:
         return
-    already_open = _list_locks(name)
-    for f in already_open:
+    locks = state.io_state.locks.get(name)
+    if not locks:
+        locks = state.io_state.locks[name] = FileLocks()
+    for f_lock_type, f_access in locks.files.itervalues():
         if (
                 # default mode: don't accept if SHARED/LOCK present
-                ((not lock_type) and f.lock_type) or
+                ((not lock_type) and f_lock_type) or
                 # LOCK READ WRITE: don't accept if already open
                 (lock_type == 'RW') or
                 # SHARED: don't accept if open in default mode
-                (lock_type == 'S' and not f.lock_type) or
+                (lock_type == 'S' and not f_lock_type) or
                 # LOCK READ or LOCK WRITE: accept base on ACCESS of open file
-                (lock_type in f.access) or (f.lock_type in access)):
+                (lock_type in f_access) or (f_lock_type in access)):
+            lock_stats.opens_denied += 1
             raise error.RunError(error.PERMISSION_DENIED)
-    state.io_state.locks[number] = name
+    locks.files[number] = (lock_type, access)
+
+def _release_lock(name, number):
+    """ Release the lock on a file and its locked ranges before closing. """
+    locks = state.io_state.locks.get(name)
+    if not locks or number not in locks.files:
+        return
+    locks.release(number)
+    if not locks.files:
+        del state.io_state.locks[name]
+
+def _convert_locks():
+    """ Rebuild the lock table of a session saved with file names by number. """
+    old_locks = state.io_state.locks
+    if all(isinstance(locks, FileLocks) for locks in old_locks.itervalues()):
+        return
+    # LOCK never worked with the old table, so there are no ranges to carry over
+    state.io_state.locks = {}
+    for number, name in old_locks.iteritems():
+        f = state.io_state.files.get(number)
+        locks = state.io_state.locks.setdefault(name, FileLocks())
+        locks.files[number] = (getattr(f, 'lock_type', ''), getattr(f, 'access', 'RW'))
+
+def _lock_range(name, number, start, stop):
+    """ Lock a byte range of an open file. """
+    state.io_state.locks[name].lock(number, start, stop)
+
+def _unlock_range(name, number, start, stop):
+    """ Unlock a byte range of an open file. """
+    state.io_state.locks[name].unlock(number, start, stop)
 
+##############################################################################
+# Record stores for random-access files
+
+# record stores by native file name, shared by all files open on the same name
+_record_stores = {}
 
-def _release_lock(number):
-    """ Release the lock on a file before closing. """
+def _open_record_store(name, fhandle=None):
+    """ Get the record store for a random-access file, opening it if needed. """
     try:
-        del state.io_state.locks[number]
+        store = _record_stores[name]
+    except KeyError:
+        store = _record_stores[name] = _create_record_store(name, fhandle)
+    else:
+        if fhandle:
+            fhandle.close()
+    store.users += 1
+    return store
+
+def _create_record_store(name, fhandle):
+    """ Open a memory-mapped store; fall back to the stream if it can't be mapped. """
+    # the BASIC access mode is checked by the file object; the store needs
+    # read access to map the file, so it opens its own stream where possible
+    try:
+        try:
+            own_handle = open(name, 'r+b')
+        except EnvironmentError:
+            own_handle = open(name, 'rb')
+    except EnvironmentError:
+        if not fhandle:
+            logging.warning('Could not re-open file %s. Replacing with null file.', name)
+            fhandle = open(os.devnull, 'r+b')
+        return StreamRecords(name, fhandle)
+    try:
+        store = MappedRecords(name, own_handle)
+    except (EnvironmentError, ValueError) as e:
+        logging.debug('Could not map file %s: %s', name, e)
+        store = StreamRecords(name, own_handle)
+    if fhandle:
+        fhandle.close()
+    return store
+
+def _flush_record_store(name):
+    """ Write out buffered records if the file is open for random access. """
+    try:
+        _record_stores[name].flush()
     except KeyError:
         pass
 
+
+class StreamRecords(object):
+    """ Record store that reads and writes through a file object. """
+
+    def __init__(self, name, fhandle):
+        """ Initialise the store and find the file length. """
+        self.name = name
+        self.fhandle = fhandle
+        self.users = 0
+        self.writable = 'r' not in fhandle.mode or '+' in fhandle.mode
+        self.fhandle.seek(0, 2)
+        self.length = self.fhandle.tell()
+
+    def read(self, pos, num):
+        """ Read up to num bytes at pos. """
+        self.fhandle.seek(pos)
+        return self.fhandle.read(num)
+
+    def write(self, pos, s):
+        """ Write s at pos, filling any gap beyond the end with NUL. """
+        if pos > self.length:
+            self.fhandle.seek(self.length)
+            self.fhandle.write('\0' * (pos-self.length))
+        else:
+            self.fhandle.seek(pos)
+        self.fhandle.write(s)
+        self.length = max(self.length, pos + len(s))
+
+    def flush(self):
+        """ Write out buffers. """
+        self.fhandle.flush()
+
+    def release(self):
+        """ Stop using the store; close it when the last user is gone. """
+        self.users -= 1
+        if self.users <= 0:
+            del _record_stores[self.name]
+            self.close()
+
+    def close(self):
+        """ Close the stream. """
+        try:
+            self.fhandle.close()
+        except EnvironmentError:
+            pass
+
+
+class MappedRecords(StreamRecords):
+    """ Record store that maps the file into memory. """
+
+    def __init__(self, name, fhandle):
+        """ Map the file; an empty file is mapped on first read. """
+        StreamRecords.__init__(self, name, fhandle)
+        self.map = None
+        # number of bytes covered by the map
+        self.mapped = 0
+        if self.length:
+            self._remap()
+
+    def _remap(self):
+        """ Map the file up to its current length. """
+        if self.map:
+            self.map.close()
+            self.map = None
+        if self.writable:
+            self.map = mmap.mmap(self.fhandle.fileno(), self.length, access=mmap.ACCESS_WRITE)
+        else:
+            self.map = mmap.mmap(self.fhandle.fileno(), self.length, access=mmap.ACCESS_READ)
+        self.mapped = self.length
+
+    def read(self, pos, num):
+        """ Read up to num bytes at pos. """
+        end = min(pos+num, self.length)
+        if end > self.mapped:
+            self._remap()
+        if not self.map:
+            return ''
+        return self.map[pos:end]
+
+    def write(self, pos, s):
+        """ Write s at pos; writes beyond the map extend the file through the stream. """
+        end = pos + len(s)
+        if end <= self.mapped:
+            self.map[pos:end] = str(s)
+            return
+        if not self.writable:
+            raise error.RunError(error.PERMISSION_DENIED)
+        # the file only ever grows to its true length, so other streams see the right size
+        try:
+            StreamRecords.write(self, pos, s)
+            self.fhandle.flush()
+        except EnvironmentError as e:
+            handle_oserror(e)
+
+    def close(self):
+        """ Release the map and close the stream. """
+        if self.map:
+            self.map.close()
+            self.map = None
+        StreamRecords.close(self)
+
+
 ##############################################################################
 # Exception handling
 
@@ -395,8 +652,8 @@ def match_dosname(dosname, path, isdir):
     if istype(path, dosname, isdir):
         return dosname
     # for case-sensitive filenames: find other case combinations, if present
-    for f in sorted(os.listdir(path)):
-        if f.upper() == dosname and istype(path, f, isdir):
+    for f in get_dir_index(path).by_upper.get(dosname, ()):
+        if istype(path, f, isdir):
             return f
     return None
 
@@ -425,28 +682,33 @@ def match_filename(name, defext, path, name_err, isdir):
 
 def match_wildcard(name, mask):
     """ Whether filename name matches DOS wildcard mask. """
-    # convert wildcard mask to regexp
-    regexp = '\A'
-    for c in mask:
-        if c == '?':
-            regexp += '.'
-        elif c == '*':
-            # we won't need to match newlines, so dot is fine
-            regexp += '.*'
-        else:
-            regexp += re.escape(c)
-    regexp += '\Z'
-    cregexp = re.compile(regexp)
+    try:
+        cregexp = _wildcard_cache[mask]
+    except KeyError:
+        # convert wildcard mask to regexp
+        regexp = '\A'
+        for c in mask:
+            if c == '?':
+                regexp += '.'
+            elif c == '*':
+                # we won't need to match newlines, so dot is fine
+                regexp += '.*'
+            else:
+                regexp += re.escape(c)
+        regexp += '\Z'
+        cregexp = _wildcard_cache[mask] = re.compile(regexp)
     return cregexp.match(name) is not None
 
+# compiled regular expressions by DOS wildcard mask
+_wildcard_cache = {}
+
 def filename_from_unicode(name):
     """ Replace disallowed characters in filename with ?. """
     name_str = name.encode('ascii', 'replace')
     return ''.join(c if c in allowable_chars | set('.') else '?' for c in name_str)
 
-def filter_names(path, files_list, mask=u'*.*'):
-    """ Apply filename filter to short version of names. """
-    all_files = [short_name(path, name) for name in files_list]
+def filter_dosnames(all_files, mask=u'*.*'):
+    """ Apply filename filter to 8.3 names given as (trunk, ext) tuples. """
     # apply mask separately to trunk and extension, dos-style.
     # hide dotfiles
     trunkmask, extmask = split_dosname(mask)
@@ -454,6 +716,61 @@ def filter_names(path, files_list, mask=u'*.*'):
         if (match_wildcard(t, trunkmask) and match_wildcard(e, extmask) and
             (t or not e or e == '.'))])
 
+
+##############################################################################
+# Directory index
+
+# directories modified this many seconds or less before they were indexed
+# are indexed again, as changes within the mtime resolution go unnoticed
+dir_index_margin = 2
+
+# directory indices by native path
+_dir_indices = {}
+
+def get_dir_index(path):
+    """ Get the index of a native directory, indexing it if it has changed. """
+    mtime = os.stat(path).st_mtime
+    index = _dir_indices.get(path)
+    if not index or not index.is_valid(mtime):
+        index = _dir_indices[path] = DirectoryIndex(path, mtime)
+    return index
+
+def invalidate_dir_index(native_name):
+    """ Drop the index of the directory containing a native file or directory. """
+    _dir_indices.pop(os.path.dirname(os.path.abspath(native_name)), None)
+
+
+class DirectoryIndex(object):
+    """ Native names in a directory, indexed by upper-case name. """
+
+    def __init__(self, path, mtime):
+        """ List and index the directory. """
+        self.path = path
+        self.mtime = mtime
+        self.indexed = time.time()
+        # native names by upper-case name, in sorted order
+        self.by_upper = {}
+        self.names = sorted(os.listdir(path))
+        for name in self.names:
+            self.by_upper.setdefault(name.upper(), []).append(name)
+        # 8.3 names of directories and files, for FILES
+        self._short_names = None
+
+    def is_valid(self, mtime):
+        """ Whether the directory is unchanged since it was indexed. """
+        return mtime == self.mtime and mtime < self.indexed - dir_index_margin
+
+    def short_names(self):
+        """ Return the 8.3 names of subdirectories and files in the directory. """
+        if self._short_names is None:
+            isdir = [os.path.isdir(os.path.join(self.path, n)) for n in self.names]
+            dirs = [filename_from_unicode(n) for n, d in zip(self.names, isdir) if d]
+            fils = [filename_from_unicode(n) for n, d in zip(self.names, isdir) if not d]
+            self._short_names = (
+                    [short_name(self.path, n) for n in dirs],
+                    [short_name(self.path, n) for n in fils])
+        return self._short_names
+
 ################################
 
 class DiskDevice(object):
@@ -505,6 +822,9 @@ class DiskDevice(object):
             self.check_file_not_open(param)
         # obtain a lock
         _acquire_lock(name, number, lock, access)
+        # let other streams see records written through a random-access file
+        if mode != 'R':
+            _flush_record_store(name)
         try:
             # open the underlying stream
             fhandle = self._open_stream(name, mode, access)
@@ -512,12 +832,15 @@ class DiskDevice(object):
             return create_file_object(fhandle, filetype, mode, name, number,
                                       access, lock, reclen, seg, offset, length)
         except Exception:
-            _release_lock(number)
+            _release_lock(name, number)
             raise
 
     def _open_stream(self, native_name, mode, access):
         """ Open a stream on disk by os-native name with BASIC mode and access level. """
         name = native_name
+        # opening may create the file
+        if mode != 'I':
+            invalidate_dir_index(name)
         if (access and mode == 'R'):
             posix_access = self._access_access[access]
         else:
@@ -630,15 +953,21 @@ class DiskDevice(object):
 
     def mkdir(self, name):
         """ Create directory at given BASIC path. """
-        safe(os.mkdir, self._native_path(name, name_err=None, isdir=True))
+        native_name = self._native_path(name, name_err=None, isdir=True)
+        invalidate_dir_index(native_name)
+        safe(os.mkdir, native_name)
 
     def rmdir(self, name):
         """ Remove directory at given BASIC path. """
-        safe(os.rmdir, self._native_path(name, name_err=error.PATH_NOT_FOUND, isdir=True))
+        native_name = self._native_path(name, name_err=error.PATH_NOT_FOUND, isdir=True)
+        invalidate_dir_index(native_name)
+        safe(os.rmdir, native_name)
 
     def kill(self, name):
         """ Remove regular file at given BASIC path. """
-        safe(os.remove, self._native_path(name))
+        native_name = self._native_path(name)
+        invalidate_dir_index(native_name)
+        safe(os.remove, native_name)
 
     def rename(self, oldname, newname):
         """ Rename a file or directory. """
@@ -647,6 +976,8 @@ class DiskDevice(object):
         newname = self._native_path(str(newname), name_err=None, isdir=False)
         if os.path.exists(newname):
             raise error.RunError(error.FILE_ALREADY_EXISTS)
+        invalidate_dir_index(oldname)
+        invalidate_dir_index(newname)
         safe(os.rename, oldname, newname)
 
     def files(self, pathmask):
@@ -673,12 +1004,10 @@ class DiskDevice(object):
         elif mask == '..':
             dirs = [split_dosname((os.sep+relpath).split(os.sep)[-2:][0])]
         else:
-            all_names = safe(os.listdir, path)
-            dirs = [filename_from_unicode(n) for n in all_names if os.path.isdir(os.path.join(path, n))]
-            fils = [filename_from_unicode(n) for n in all_names if not os.path.isdir(os.path.join(path, n))]
+            dirs, fils = safe(get_dir_index, path).short_names()
             # filter according to mask
-            dirs = filter_names(path, dirs + ['.', '..'], mask)
-            fils = filter_names(path, fils, mask)
+            dirs = filter_dosnames(dirs + [split_dosname('.'), split_dosname('..')], mask)
+            fils = filter_dosnames(fils, mask)
         if not dirs and not fils:
             raise error.RunError(error.FILE_NOT_FOUND)
         # format and print contents
@@ -720,6 +1049,7 @@ class BinaryFile(devices.RawFile):
         """ Initialise program file object and write header. """
         devices.RawFile.__init__(self, fhandle, filetype, mode)
         self.number = number
+        self.name = name
         # don't lock binary files
         self.lock = ''
         self.access = 'RW'
@@ -745,7 +1075,7 @@ class BinaryFile(devices.RawFile):
         if self.mode == 'O':
             self.write('\x1a')
         devices.RawFile.close(self)
-        _release_lock(self.number)
+        _release_lock(self.name, self.number)
 
 
 class RandomFile(devices.CRLFTextFileBase):
@@ -763,16 +1093,29 @@ class RandomFile(devices.CRLFTextFileBase):
         self.field.reset(self.reclen)
         devices.CRLFTextFileBase.__init__(self, ByteStream(self.field.buffer), 'D', 'R')
         self.operating_mode = 'I'
-        # note that for random files, output_stream must be a seekable stream.
-        self.output_stream = output_stream
+        # records are read and written through a store shared by all files
+        # open on the same name; it takes over the output stream.
+        self.records = _open_record_store(name, output_stream)
         self.lock_type = lock
         self.access = access
-        self.lock_list = set()
         self.number = number
         self.name = name
         # position at start of file
         self.recpos = 0
-        self.output_stream.seek(0)
+
+    def __getstate__(self):
+        """ Pickle; the record store is reopened on unpickling. """
+        st = self.__dict__.copy()
+        del st['records']
+        return st
+
+    def __setstate__(self, st):
+        """ Unpickle; reopen the record store or convert an output stream. """
+        output_stream = st.pop('output_stream', None)
+        # ranges are now kept in the lock table
+        st.pop('lock_list', None)
+        devices.CRLFTextFileBase.__setstate__(self, st)
+        self.records = _open_record_store(self.name, output_stream)
 
     def _check_overflow(self):
         """ Check for FIELD OVERFLOW. """
@@ -804,15 +1147,17 @@ class RandomFile(devices.CRLFTextFileBase):
     def close(self):
         """ Close random-access file. """
         devices.CRLFTextFileBase.close(self)
-        self.output_stream.close()
-        _release_lock(self.number)
+        self.records.release()
+        _release_lock(self.name, self.number)
 
     def get(self, dummy=None):
         """ Read a record. """
+        if 'R' not in self.access:
+            raise error.RunError(error.PERMISSION_DENIED)
         if self.eof():
-            contents = '\0' * self.reclen
+            contents = ''
         else:
-            contents = self.output_stream.read(self.reclen)
+            contents = self.records.read(self.recpos*self.reclen, self.reclen)
         # take contents and pad with NULL to required size
         self.field.buffer[:] = contents + '\0' * (self.reclen - len(contents))
         # reset field text file loc
@@ -821,18 +1166,15 @@ class RandomFile(devices.CRLFTextFileBase):
 
     def put(self, dummy=None):
         """ Write a record. """
-        current_length = self.lof()
-        if self.recpos > current_length:
-            self.output_stream.seek(0, 2)
-            numrecs = self.recpos-current_length
-            self.output_stream.write('\0' * numrecs * self.reclen)
-        self.output_stream.write(self.field.buffer)
+        if 'W' not in self.access:
+            raise error.RunError(error.PERMISSION_DENIED)
+        # any gap between the end of the file and the record is filled with NUL
+        self.records.write(self.recpos*self.reclen, self.field.buffer)
         self.recpos += 1
 
     def set_pos(self, newpos):
         """ Set current record number. """
         # first record is newpos number 1
-        self.output_stream.seek((newpos-1)*self.reclen)
         self.recpos = newpos - 1
 
     def loc(self):
@@ -841,46 +1183,37 @@ class RandomFile(devices.CRLFTextFileBase):
 
     def eof(self):
         """ Return whether we're past currentg end-of-file, for EOF. """
-        return self.recpos*self.reclen > self.lof()
+        return self.recpos*self.reclen > self.records.length
 
     def lof(self):
         """ Get length of file, in bytes, for LOF. """
-        current = self.output_stream.tell()
-        self.output_stream.seek(0, 2)
-        lof = self.output_stream.tell()
-        self.output_stream.seek(current)
-        return lof
+        return self.records.length
 
-    def lock(self, start, stop, lock_list):
+    def lock(self, start, stop):
         """ Lock range of records. """
-        bstart, bstop = (start-1) * self.reclen, stop*self.reclen - 1
-        other_lock_list = set.union(f.lock_list for f in _list_locks(self.name))
-        for start_1, stop_1 in other_lock_list:
-            if (stop_1 == -1 or (bstart >= start_1 and bstart <= stop_1)
-                             or (bstop >= start_1 and bstop <= stop_1)):
-                raise error.RunError(error.PERMISSION_DENIED)
-        self.lock_list.add((bstart, bstop))
-
-    def unlock(self, start, stop, lock_list):
+        if stop < start:
+            raise error.RunError(error.BAD_RECORD_NUMBER)
+        _lock_range(self.name, self.number,
+                    (start-1) * self.reclen, stop*self.reclen - 1)
+
+    def unlock(self, start, stop):
         """ Unlock range of records. """
-        bstart, bstop = (start-1) * self.reclen, stop*self.reclen - 1
         # permission denied if the exact record range wasn't given before
-        try:
-            self.lock_list.remove((bstart, bstop))
-        except KeyError:
-            raise error.RunError(error.PERMISSION_DENIED)
+        if stop < start:
+            raise error.RunError(error.BAD_RECORD_NUMBER)
+        _unlock_range(self.name, self.number,
+                      (start-1) * self.reclen, stop*self.reclen - 1)
 
 
-class TextFile(devices.CRLFTextFileBase):
+class TextFile(devices.BlockTextFileBase):
     """ Text file on disk device. """
 
     def __init__(self, fhandle, filetype, number, name,
                  mode='A', access='RW', lock='',
                  utf8=False, universal=False, split_long_lines=True):
         """ Initialise text file object. """
-        devices.CRLFTextFileBase.__init__(self, fhandle, filetype, mode,
-                                          '', split_long_lines)
-        self.lock_list = set()
+        devices.BlockTextFileBase.__init__(self, fhandle, filetype, mode,
+                                           '', split_long_lines)
         self.lock_type = lock
         self.access = access
         self.number = number
@@ -888,48 +1221,84 @@ class TextFile(devices.CRLFTextFileBase):
         self.utf8 = utf8
         self.universal = universal
         self.spaces = ''
+        # output not yet passed to the stream
+        self.out_buffer, self.out_length = [], 0
         if self.mode == 'A':
             self.fhandle.seek(0, 2)
         elif self.mode == 'O' and self.utf8:
             # start UTF-8 files with BOM as many Windows readers expect this
             self.fhandle.write('\xef\xbb\xbf')
 
+    def __setstate__(self, st):
+        """ Unpickle; add an empty output buffer to files saved without one. """
+        st.setdefault('out_buffer', [])
+        st.setdefault('out_length', 0)
+        # ranges are now kept in the lock table
+        st.pop('lock_list', None)
+        devices.BlockTextFileBase.__setstate__(self, st)
+
     def close(self):
         """ Close text file. """
+        self._write_buffer()
         if self.mode in ('O', 'A') and not self.utf8:
             # write EOF char
             self.fhandle.write('\x1a')
-        devices.CRLFTextFileBase.close(self)
-        _release_lock(self.number)
+        devices.BlockTextFileBase.close(self)
+        _release_lock(self.name, self.number)
 
     def loc(self):
         """ Get file pointer LOC """
         # for LOC(i)
         if self.mode == 'I':
-            return max(1, (127+self.fhandle.tell())/128)
-        return self.fhandle.tell()/128
+            return max(1, (127+self._stream_pos())/128)
+        return (self.fhandle.tell() + self.out_length)/128
 
     def lof(self):
         """ Get length of file LOF. """
+        self._write_buffer()
         current = self.fhandle.tell()
         self.fhandle.seek(0, 2)
         lof = self.fhandle.tell()
         self.fhandle.seek(current)
         return lof
 
+    def flush(self):
+        """ Write buffered output and flush the stream to disk. """
+        self._write_buffer()
+        self.fhandle.flush()
+
+    def _write_buffer(self):
+        """ Pass buffered output to the stream. """
+        if self.out_buffer:
+            self.fhandle.write(''.join(self.out_buffer))
+            self.out_buffer, self.out_length = [], 0
+
+    def _write_out(self, s, newline):
+        """ Buffer a run of chars; flush according to the text-flush setting. """
+        self.out_buffer.append(s)
+        self.out_length += len(s)
+        if text_flush_bytes is None:
+            if self.out_length >= text_buffer_size:
+                self._write_buffer()
+        elif text_flush_bytes:
+            if self.out_length >= text_flush_bytes:
+                self.flush()
+        elif newline:
+            self.flush()
+
     def write_line(self, s=''):
         """ Write to file in normal or UTF-8 mode. """
         if self.utf8:
             s = (state.console_state.codepage
                 .str_to_unicode(s).encode('utf-8', 'replace'))
-        devices.CRLFTextFileBase.write(self, s + '\r\n')
+        devices.BlockTextFileBase.write(self, s + '\r\n')
 
     def write(self, s):
         """ Write to file in normal or UTF-8 mode. """
         if self.utf8:
             s = (state.console_state.codepage
                 .str_to_unicode(s).encode('utf-8', 'replace'))
-        devices.CRLFTextFileBase.write(self, s)
+        devices.BlockTextFileBase.write(self, s)
 
     def _read_line_universal(self):
         """ Read line from ascii program file with universal newlines. """
@@ -961,24 +1330,19 @@ class TextFile(devices.CRLFTextFileBase):
     def read_line(self):
         """ Read line from text file. """
         if not self.universal:
-            s = devices.CRLFTextFileBase.read_line(self)
+            s = devices.BlockTextFileBase.read_line(self)
         else:
             s = self._read_line_universal()
         if self.utf8 and s is not None:
             s = state.console_state.codepage.str_from_unicode(s.decode('utf-8'))
         return s
 
-    def lock(self, start, stop, lock_list):
+    def lock(self, start, stop):
         """ Lock the file. """
-        if set.union(f.lock_list for f in _list_locks(self.name)):
-            raise error.RunError(error.PERMISSION_DENIED)
-        self.lock_list.add((0, -1))
+        _lock_range(self.name, self.number, 0, lock_whole_file)
 
     def unlock(self, start, stop):
         """ Unlock the file. """
-        try:
-            self.lock_list.remove((0, -1))
-        except KeyError:
-            raise error.RunError(error.PERMISSION_DENIED)
+        _unlock_range(self.name, self.number, 0, lock_whole_file)
 
 prepare()
@@ -30,6 +30,7 @@ import video_cli
 import video_curses
 import video_pygame
 import video_sdl2
+import video_headless
 video_backends = {
     # interface_name: video_plugin_name, fallback, warn_on_fallback
     'none': (('none',), None),
@@ -41,6 +42,7 @@ video_backends = {
     'curses': (('curses',), None),
     'pygame': (('pygame',), None),
     'sdl2': (('sdl2',), None),
+    'headless': (('headless',), None),
     }
 
 # create the window icon
@@ -56,6 +58,9 @@ carry_col_9_chars = [chr(c) for c in range(0xb0, 0xdf+1)]
 # ascii codepoints for which to repeat row 8 in row 9 (box drawing)
 carry_row_9_chars = [chr(c) for c in range(0xb0, 0xdf+1)]
 
+# SBCS glyphs built for each font size, by (width, height)
+glyph_atlas = {}
+
 def prepare():
     """ Prepare the video subsystem. """
     global egacursor
@@ -124,7 +129,10 @@ def init_video_plugin(interface_name):
                     pen=config.get('pen'),
                     icon=icon,
                     initial_mode=state.console_state.screen.mode,
-                    codepage=state.console_state.codepage):
+                    codepage=state.console_state.codepage,
+                    capture_file=config.get('capture-file'),
+                    capture_format=config.get('capture-format'),
+                    capture_on=config.get('capture-on')):
                 return interface_name
             logging.debug('Could not initialise %s plugin.', video_name)
         if fallback:
@@ -144,23 +152,41 @@ class TextRow(object):
     def __init__(self, battr, bwidth):
         """ Set up screen row empty and unwrapped. """
         # screen buffer, initialised to spaces, dim white on black
-        self.buf = [(' ', battr)] * bwidth
+        self.chars = bytearray(' ' * bwidth)
+        self.attrs = bytearray(chr(battr) * bwidth)
         # character is part of double width char; 0 = no; 1 = lead, 2 = trail
-        self.double = [ 0 ] * bwidth
+        self.double = bytearray(bwidth)
         # last non-whitespace character
         self.end = 0
         # line continues on next row (either LF or word wrap happened)
         self.wrap = False
 
+    def __setstate__(self, st):
+        """ Unpickle; convert rows saved as lists of (char, attr) pairs. """
+        if 'buf' in st:
+            buf = st.pop('buf')
+            st['chars'] = bytearray(''.join(c for c, _ in buf))
+            st['attrs'] = bytearray(a for _, a in buf)
+            st['double'] = bytearray(st['double'])
+        self.__dict__.update(st)
+
     def clear(self, battr):
         """ Clear the screen row buffer. Leave wrap untouched. """
-        bwidth = len(self.buf)
-        self.buf = [(' ', battr)] * bwidth
-        # character is part of double width char; 0 = no; 1 = lead, 2 = trail
-        self.double = [ 0 ] * bwidth
+        bwidth = len(self.chars)
+        self.chars = bytearray(' ' * bwidth)
+        self.attrs = bytearray(chr(battr) * bwidth)
+        self.double = bytearray(bwidth)
         # last non-whitespace character
         self.end = 0
 
+    def copy(self, other):
+        """ Copy contents from another row. """
+        self.chars[:] = other.chars
+        self.attrs[:] = other.attrs
+        self.double[:] = other.double
+        self.end = other.end
+        self.wrap = other.wrap
+
 
 class TextPage(object):
     """ Buffer for a screen page. """
@@ -175,32 +201,33 @@ class TextPage(object):
 
     def get_char_attr(self, crow, ccol, want_attr):
         """ Retrieve a byte from the screen (SBCS or DBCS half-char). """
-        ca = self.row[crow-1].buf[ccol-1][want_attr]
-        return ca if want_attr else ord(ca)
+        therow = self.row[crow-1]
+        return therow.attrs[ccol-1] if want_attr else therow.chars[ccol-1]
 
     def put_char_attr(self, crow, ccol, c, cattr, one_only=False, force=False):
         """ Put a byte to the screen, reinterpreting SBCS and DBCS as necessary. """
+        therow = self.row[crow-1]
         # update the screen buffer
-        self.row[crow-1].buf[ccol-1] = (c, cattr)
+        therow.chars[ccol-1] = c
+        therow.attrs[ccol-1] = cattr
         # mark the replaced char for refreshing
         start, stop = ccol, ccol+1
-        self.row[crow-1].double[ccol-1] = 0
+        therow.double[ccol-1] = 0
         # mark out sbcs and dbcs characters
         if state.console_state.codepage.dbcs and self.do_dbcs:
             orig_col = ccol
             # replace chars from here until necessary to update double-width chars
-            therow = self.row[crow-1]
             # replacing a trail byte? take one step back
             # previous char could be a lead byte? take a step back
             if (ccol > 1 and therow.double[ccol-2] != 2 and
-                    (therow.buf[ccol-1][0] in state.console_state.codepage.trail or
-                     therow.buf[ccol-2][0] in state.console_state.codepage.lead)):
+                    (chr(therow.chars[ccol-1]) in state.console_state.codepage.trail or
+                     chr(therow.chars[ccol-2]) in state.console_state.codepage.lead)):
                 ccol -= 1
                 start -= 1
             # check all dbcs characters between here until it doesn't matter anymore
             while ccol < self.width:
-                c = therow.buf[ccol-1][0]
-                d = therow.buf[ccol][0]
+                c = chr(therow.chars[ccol-1])
+                d = chr(therow.chars[ccol])
                 if (c in state.console_state.codepage.lead and
                         d in state.console_state.codepage.trail):
                     if (therow.double[ccol-1] == 1 and
@@ -225,8 +252,8 @@ class TextPage(object):
                 connecting = 0
                 bset = -1
                 while ccol < stop+2 and ccol < self.width:
-                    c = therow.buf[ccol-1][0]
-                    d = therow.buf[ccol][0]
+                    c = chr(therow.chars[ccol-1])
+                    d = chr(therow.chars[ccol])
                     if bset > -1 and state.console_state.codepage.connects(c, d, bset):
                         connecting += 1
                     else:
@@ -252,6 +279,18 @@ class TextPage(object):
                     ccol += 1
         return start, stop
 
+    def put_chars_attrs(self, crow, ccol, chars, attrs):
+        """ Put a run of bytes and attributes on a row; caller refreshes the row. """
+        if state.console_state.codepage.dbcs and self.do_dbcs:
+            for i in xrange(len(chars)):
+                self.put_char_attr(crow, ccol+i, chars[i], attrs[i])
+            return
+        therow = self.row[crow-1]
+        stop = ccol-1 + len(chars)
+        therow.chars[ccol-1:stop] = chars
+        therow.attrs[ccol-1:stop] = attrs
+        therow.double[ccol-1:stop] = bytearray(len(chars))
+
 class TextBuffer(object):
     """ Buffer for text on all screen pages. """
 
@@ -264,12 +303,8 @@ class TextBuffer(object):
 
     def copy_page(self, src, dst):
         """ Copy source to destination page. """
-        for x in range(self.height):
-            dstrow = self.pages[dst].row[x]
-            srcrow = self.pages[src].row[x]
-            dstrow.buf[:] = srcrow.buf[:]
-            dstrow.end = srcrow.end
-            dstrow.wrap = srcrow.wrap
+        for dstrow, srcrow in zip(self.pages[dst].row, self.pages[src].row):
+            dstrow.copy(srcrow)
 
 
 class PixelBuffer(object):
@@ -359,6 +394,14 @@ class PixelPage(object):
             except IndexError:
                 return numpy.zeros(len(colours), dtype=numpy.int8)
 
+        def put_pixels(self, xs, ys, attr):
+            """ Put arrays of pixels in the buffer. """
+            self.buffer[ys, xs] = attr
+
+        def get_pixels(self, xs, ys):
+            """ Get attributes of arrays of pixels in the buffer. """
+            return self.buffer[ys, xs]
+
         def get_interval(self, x, y, length):
             """ Return *view of* attributes of a scanline interval. """
             try:
@@ -573,7 +616,7 @@ class Screen(object):
                 (state.console_state.row, state.console_state.col)))
         if self.mode.is_text_mode:
             fore, _, _, _ = self.split_attr(
-                self.apage.row[state.console_state.row-1].buf[state.console_state.col-1][1] & 0xf)
+                self.apage.row[state.console_state.row-1].attrs[state.console_state.col-1] & 0xf)
         else:
             fore, _, _, _ = self.split_attr(self.mode.cursor_index or self.attr)
         backend.video_queue.put(backend.Event(backend.VIDEO_SET_CURSOR_ATTR, fore))
@@ -686,24 +729,29 @@ class Screen(object):
                 new_apagenum >= mode_info.num_pages or
                 new_vpagenum >= mode_info.num_pages):
             raise error.RunError(error.IFC)
-        # preload SBCS glyphs
+        # preload SBCS glyphs, or reuse those built for a mode with the same font size
+        glyph_size = mode_info.font_width, mode_info.font_height
         try:
-            self.glyphs = {
-                chr(c): fonts[mode_info.font_height].build_glyph(state.console_state.codepage.to_unicode(chr(c), u'\0'),
-                                mode_info.font_width, mode_info.font_height,
-                                chr(c) in carry_col_9_chars, chr(c) in carry_row_9_chars)
-                for c in range(256) }
-        except (KeyError, AttributeError):
-            logging.warning(
-                'No %d-pixel font available. Could not enter video mode %s.',
-                mode_info.font_height, mode_info.name)
-            raise error.RunError(error.IFC)
+            self.glyphs = glyph_atlas[glyph_size]
+        except KeyError:
+            try:
+                self.glyphs = {
+                    chr(c): fonts[mode_info.font_height].build_glyph(state.console_state.codepage.to_unicode(chr(c), u'\0'),
+                                    mode_info.font_width, mode_info.font_height,
+                                    chr(c) in carry_col_9_chars, chr(c) in carry_row_9_chars)
+                    for c in range(256) }
+            except (KeyError, AttributeError):
+                logging.warning(
+                    'No %d-pixel font available. Could not enter video mode %s.',
+                    mode_info.font_height, mode_info.name)
+                raise error.RunError(error.IFC)
+            glyph_atlas[glyph_size] = self.glyphs
         backend.video_queue.put(backend.Event(backend.VIDEO_SET_MODE, mode_info))
         if mode_info.is_text_mode:
             # send glyphs to backend; copy is necessary
             # as dict may change here while the other thread is working on it
             backend.video_queue.put(backend.Event(backend.VIDEO_BUILD_GLYPHS,
-                                                                self.glyphs))
+                                                        dict(self.glyphs)))
         # attribute and border persist on width-only change
         if (not (self.mode.is_text_mode and mode_info.is_text_mode) or
                 self.apagenum != new_apagenum or self.vpagenum != new_vpagenum
@@ -849,7 +897,8 @@ class Screen(object):
         self.attr = attr
         if not self.mode.is_text_mode and self.mode.cursor_index is None:
             fore, _, _, _ = self.split_attr(attr)
-            backend.video_queue.put(backend.Event(backend.VIDEO_SET_CURSOR_ATTR, fore))
+            backend.video_queue.put_cursor(
+                    backend.Event(backend.VIDEO_SET_CURSOR_ATTR, fore))
 
     def set_border(self, attr):
         """ Set the border attribute. """
@@ -862,6 +911,10 @@ class Screen(object):
         self.text.copy_page(src, dst)
         backend.video_queue.put(backend.Event(backend.VIDEO_COPY_PAGE, (src, dst)))
 
+    def capture_frame(self, trigger):
+        """ Ask the video plugin to capture the visible page. """
+        backend.video_queue.put(backend.Event(backend.VIDEO_CAPTURE, trigger))
+
     def get_char_attr(self, pagenum, crow, ccol, want_attr):
         """ Retrieve a byte from the screen. """
         return self.text.pages[pagenum].get_char_attr(crow, ccol, want_attr)
@@ -885,9 +938,8 @@ class Screen(object):
         while ccol <= stop:
             double = therow.double[ccol-1]
             if double == 1:
-                ca = therow.buf[ccol-1]
-                da = therow.buf[ccol]
-                r, c, char, attr = crow, ccol, ca[0]+da[0], da[1]
+                r, c = crow, ccol
+                char, attr = str(therow.chars[ccol-1:ccol+1]), therow.attrs[ccol]
                 therow.double[ccol-1] = 1
                 therow.double[ccol] = 2
                 ccol += 2
@@ -895,23 +947,24 @@ class Screen(object):
                 if double != 0:
                     logging.debug('DBCS buffer corrupted at %d, %d (%d)',
                                   crow, ccol, double)
-                ca = therow.buf[ccol-1]
-                r, c, char, attr = crow, ccol, ca[0], ca[1]
+                r, c = crow, ccol
+                char, attr = chr(therow.chars[ccol-1]), therow.attrs[ccol-1]
                 ccol += 1
             fore, back, blink, underline = self.split_attr(attr)
             # ensure glyph is stored
             mask = self.get_glyph(char)
-            backend.video_queue.put(backend.Event(backend.VIDEO_PUT_GLYPH,
-                    (pagenum, r, c, char, len(char) > 1,
-                                 fore, back, blink, underline, for_keys)))
+            glyph = (pagenum, r, c, char, len(char) > 1,
+                     fore, back, blink, underline, for_keys)
+            rect = None
             if not self.mode.is_text_mode and not text_only:
                 # update pixel buffer
                 x0, y0, x1, y1, sprite = self.glyph_to_rect(
                                                 r, c, mask, fore, back)
                 self.pixels.pages[self.apagenum].put_rect(
                                                 x0, y0, x1, y1, sprite, tk.PSET)
-                backend.video_queue.put(backend.Event(backend.VIDEO_PUT_RECT,
-                                        (self.apagenum, x0, y0, x1, y1, sprite)))
+                rect = (self.apagenum, x0, y0, x1, y1, sprite)
+            # only the latest update of each cell is sent on to the interface
+            backend.video_queue.put_cell(glyph, rect)
 
     # should be in console? uses wrap
     def redraw_row(self, start, crow, wrap=True):
@@ -922,7 +975,7 @@ class Screen(object):
                 # redrawing changes colour attributes to current foreground (cf. GW)
                 # don't update all dbcs chars behind at each put
                 self.put_char_attr(self.apagenum, crow, i+1,
-                        therow.buf[i][0], self.attr, one_only=True, force=True)
+                        chr(therow.chars[i]), self.attr, one_only=True, force=True)
             if (wrap and therow.wrap and
                     crow >= 0 and crow < self.text.height-1):
                 crow += 1
@@ -933,9 +986,7 @@ class Screen(object):
     def print_screen(self):
         """ Output the visible page to LPT1. """
         for crow in range(1, self.mode.height+1):
-            line = ''
-            for c, _ in self.vpage.row[crow-1].buf:
-                line += c
+            line = str(self.vpage.row[crow-1].chars)
             state.io_state.lpt1_file.write_line(line)
 
     def clear_text_at(self, x, y):
@@ -944,11 +995,11 @@ class Screen(object):
         cymax, cxmax = self.mode.height-1, self.mode.width-1
         cx, cy = x // fx, y // fy
         if cx >= 0 and cy >= 0 and cx <= cxmax and cy <= cymax:
-            self.apage.row[cy].buf[cx] = (' ', self.attr)
+            self.apage.row[cy].chars[cx] = ' '
+            self.apage.row[cy].attrs[cx] = self.attr
         fore, back, blink, underline = self.split_attr(self.attr)
-        backend.video_queue.put(backend.Event(backend.VIDEO_PUT_GLYPH,
-                (self.apagenum, cy+1, cx+1, ' ', False,
-                             fore, back, blink, underline, True)))
+        backend.video_queue.put_cell((self.apagenum, cy+1, cx+1, ' ', False,
+                                      fore, back, blink, underline, True))
 
     #MOVE to TextBuffer? replace with graphics_to_text_loc v.v.?
     def clear_text_area(self, x0, y0, x1, y1):
@@ -960,8 +1011,8 @@ class Screen(object):
         cx1 = min(cxmax, max(0, x1 // fx))
         cy1 = min(cymax, max(0, y1 // fy))
         for r in range(cy0, cy1+1):
-            self.apage.row[r].buf[cx0:cx1+1] = [
-                (' ', self.attr)] * (cx1 - cx0 + 1)
+            self.apage.row[r].chars[cx0:cx1+1] = ' ' * (cx1 - cx0 + 1)
+            self.apage.row[r].attrs[cx0:cx1+1] = chr(self.attr) * (cx1 - cx0 + 1)
 
     def text_to_pixel_area(self, row0, col0, row1, col1):
         """ Convert area from text buffer to area for pixel buffer. """
@@ -985,11 +1036,14 @@ class Screen(object):
     def move_cursor(self, row, col):
         """ Move the cursor to a new position. """
         state.console_state.row, state.console_state.col = row, col
-        backend.video_queue.put(backend.Event(backend.VIDEO_MOVE_CURSOR, (row, col)))
+        backend.video_queue.put_cursor(
+                backend.Event(backend.VIDEO_MOVE_CURSOR, (row, col)))
         self.cursor.reset_attr()
 
     def rebuild_glyph(self, ordval):
         """ Rebuild a text-mode character after POKE. """
+        # the font has changed, so glyphs kept for other modes are stale
+        glyph_atlas.clear()
         if self.mode.is_text_mode:
             # force rebuilding the character by deleting and requesting
             del self.glyphs[chr(ordval)]
@@ -1082,15 +1136,15 @@ class Screen(object):
         if self.vpage.row[stop_row-1].double[stop_col-1] == 1:
             # include trail byte
             stop_col += 1
-        while r < stop_row or (r == stop_row and c <= stop_col):
-            clip += self.vpage.row[r-1].buf[c-1][0]
-            c += 1
-            if c > self.mode.width:
-                if not self.vpage.row[r-1].wrap:
+        for crow in range(r, stop_row+1):
+            therow = self.vpage.row[crow-1]
+            last = stop_col if crow == stop_row else self.mode.width
+            if c <= last:
+                clip += str(therow.chars[c-1:last])
+                if last >= self.mode.width and not therow.wrap:
                     full += state.console_state.codepage.str_to_unicode(clip) + '\r\n'
                     clip = ''
-                r += 1
-                c = 1
+            c = 1
         full += state.console_state.codepage.str_to_unicode(clip)
         return full.replace(u'\0', u' ')
 
@@ -1106,6 +1160,45 @@ class Screen(object):
             backend.video_queue.put(backend.Event(backend.VIDEO_PUT_PIXEL, (pagenum, x, y, index)))
             self.clear_text_at(x, y)
 
+    def put_pixels(self, xs, ys, index, pagenum=None):
+        """ Put numpy arrays of pixels on the screen in one update; empty character buffer. """
+        # index is a single attribute or an array of one attribute per pixel
+        if pagenum is None:
+            pagenum = self.apagenum
+        if not len(xs):
+            return
+        vx0, vy0, vx1, vy1 = self.drawing.get_view()
+        x0, y0, x1, y1 = xs.min(), ys.min(), xs.max(), ys.max()
+        if x0 < vx0 or y0 < vy0 or x1 > vx1 or y1 > vy1:
+            inside = (xs >= vx0) & (xs <= vx1) & (ys >= vy0) & (ys <= vy1)
+            xs, ys = xs[inside], ys[inside]
+            if numpy.ndim(index):
+                index = index[inside]
+            if not len(xs):
+                return
+            x0, y0, x1, y1 = xs.min(), ys.min(), xs.max(), ys.max()
+        page = self.pixels.pages[pagenum]
+        page.put_pixels(xs, ys, index)
+        backend.video_queue.put(backend.Event(backend.VIDEO_PUT_RECT,
+                    (pagenum, x0, y0, x1, y1, page.get_rect(x0, y0, x1, y1))))
+        # clear each character cell once; only cells holding text need an update
+        fx, fy = self.mode.font_width, self.mode.font_height
+        touched = numpy.zeros((self.mode.height, self.mode.width), dtype=bool)
+        touched[ys // fy, xs // fx] = True
+        for cy in numpy.flatnonzero(touched.any(axis=1)):
+            therow = self.apage.row[cy]
+            cxs = numpy.flatnonzero(touched[cy])
+            chars = numpy.frombuffer(therow.chars, dtype=numpy.uint8)
+            for cx in cxs[chars[cxs] != ord(' ')]:
+                self.clear_text_at(cx * fx, cy * fy)
+            numpy.frombuffer(therow.attrs, dtype=numpy.uint8)[cxs] = self.attr
+
+    def get_pixels(self, xs, ys, pagenum=None):
+        """ Return the attributes of numpy arrays of pixels on the screen. """
+        if pagenum is None:
+            pagenum = self.apagenum
+        return self.pixels.pages[pagenum].get_pixels(xs, ys)
+
     def get_pixel(self, x, y, pagenum=None):
         """ Return the attribute a pixel on the screen. """
         if pagenum is None:
@@ -1156,6 +1249,17 @@ class Screen(object):
                                 (self.apagenum, x0, y0, x1, y1, index)))
         self.clear_text_area(x0, y0, x1, y1)
 
+    def put_spans(self, spans):
+        """ Show (x0, x1, y) scanline intervals drawn directly into the active page buffer. """
+        if not spans:
+            return
+        x0, x1 = min(s[0] for s in spans), max(s[1] for s in spans)
+        y0, y1 = min(s[2] for s in spans), max(s[2] for s in spans)
+        backend.video_queue.put(backend.Event(backend.VIDEO_PUT_RECT,
+                (self.apagenum, x0, y0, x1, y1, self.get_rect(x0, y0, x1, y1))))
+        for sx0, sx1, y in spans:
+            self.clear_text_area(sx0, y, sx1, y)
+
     # text
 
     def get_glyph(self, c):
@@ -1302,9 +1406,10 @@ class Cursor(object):
         """ Set the text cursor attribute to that of the current location. """
         if self.screen.mode.is_text_mode:
             fore, _, _, _ = self.screen.split_attr(self.screen.apage.row[
-                    state.console_state.row-1].buf[
-                    state.console_state.col-1][1] & 0xf)
-            backend.video_queue.put(backend.Event(backend.VIDEO_SET_CURSOR_ATTR, fore))
+                    state.console_state.row-1].attrs[
+                    state.console_state.col-1] & 0xf)
+            backend.video_queue.put_cursor(
+                    backend.Event(backend.VIDEO_SET_CURSOR_ATTR, fore))
 
     def show(self, do_show):
         """ Force cursor to be visible/invisible. """
@@ -30,6 +30,7 @@ import state
 import machine
 import timedate
 import basictoken as tk
+import codecache
 
 # binary operator priority, lowest index is tightest bound
 # operators of the same priority are evaluated left to right
@@ -49,11 +50,16 @@ priority = (
 
 # flatten list
 operator_tokens = [item for sublist in priority for item in sublist]
+# binding strength per operator, highest is tightest bound
+binding = dict((op, len(priority) - level)
+               for level, ops in enumerate(priority) for op in ops)
 # command line option /d
 # allow double precision math for ^, ATN, COS, EXP, LOG, SIN, SQR, and TAN
 option_double = False
 # enable pcjr/tandy syntax extensions
 is_pcjr_syntax = False
+# per-token evaluation counts and times, if profiling (see debug.profile)
+profile = None
 
 
 def prepare():
@@ -64,6 +70,10 @@ def prepare():
 
 def parse_expression(ins, allow_empty=False, empty_err=error.MISSING_OPERAND):
     """ Compute the value of the expression at the current code pointer. """
+    if codecache.enabled and ins is state.basic_state.bytecode:
+        compiled = codecache.get_expression(ins)
+        if compiled:
+            return compiled()
     units, operators = [], []
     while True:
         d = util.skip_white(ins)
@@ -74,22 +84,7 @@ def parse_expression(ins, allow_empty=False, empty_err=error.MISSING_OPERAND):
         # string lit breaks expression, number after string lit breaks expression, + or - doesnt (could be an operator...
         if d not in operator_tokens:
             break
-        else:
-            ins.read(1)
-        if d in (tk.O_LT, tk.O_EQ, tk.O_GT):
-            nxt = util.skip_white(ins)
-            if nxt in (tk.O_LT, tk.O_EQ, tk.O_GT):
-                ins.read(1)
-                if d == nxt:
-                    raise error.RunError(error.STX)
-                else:
-                    d += nxt
-                    if d[0] == tk.O_EQ:
-                        # =>, =<
-                        d = d[1] + d[0]
-                    elif d == tk.O_GT + tk.O_LT: # ><
-                        d = tk.O_LT + tk.O_GT
-        operators.append(d)
+        operators.append(read_operator(ins))
     # empty expression is a syntax error (inside brackets) or Missing Operand (in an assignment) or ok (in print)
     # PRINT 1+      :err 22
     # Print (1+)    :err 2
@@ -110,23 +105,45 @@ def parse_expression(ins, allow_empty=False, empty_err=error.MISSING_OPERAND):
         raise error.RunError(error.STX if d in (')', ']') else error.MISSING_OPERAND)
     return parse_operators(operators, units)
 
-def parse_operators(operators, units):
-    """ Parse the operator stack. """
-    for current_priority in priority:
-        pos = 0
-        while pos < len(operators):
-            if operators[pos] in current_priority:
-                units[pos] = value_operator(operators[pos], units[pos], units[pos+1])
-                del units[pos+1]
-                del operators[pos]
+def read_operator(ins):
+    """ Read a binary operator at the current code pointer. """
+    d = ins.read(1)
+    if d in (tk.O_LT, tk.O_EQ, tk.O_GT):
+        nxt = util.skip_white(ins)
+        if nxt in (tk.O_LT, tk.O_EQ, tk.O_GT):
+            ins.read(1)
+            if d == nxt:
+                raise error.RunError(error.STX)
             else:
-                pos += 1
-        if len(operators) == 0:
-            break
-    if len(operators) > 0:
-        # unrecognised operator, syntax error
-        raise error.RunError(error.STX)
-    return units[0]
+                d += nxt
+                if d[0] == tk.O_EQ:
+                    # =>, =<
+                    d = d[1] + d[0]
+                elif d == tk.O_GT + tk.O_LT: # ><
+                    d = tk.O_LT + tk.O_GT
+    return d
+
+def parse_operators(operators, units):
+    """ Apply the binary operators to the units by precedence climbing. """
+    apply_operator, get_binding = value_operator, binding.get
+    # stack of (binding strength, operator, left operand); bottom is a sentinel
+    stack = [(0, None, None)]
+    left = units[0]
+    for right, op in zip(units[1:], operators):
+        strength = get_binding(op)
+        if strength is None:
+            # unrecognised operator, syntax error
+            raise error.RunError(error.STX)
+        # apply tighter or equally bound operators to the left first
+        while stack[-1][0] >= strength:
+            _, stacked_op, stacked_left = stack.pop()
+            left = apply_operator(stacked_op, stacked_left, left)
+        stack.append((strength, op, left))
+        left = right
+    while len(stack) > 1:
+        _, stacked_op, stacked_left = stack.pop()
+        left = apply_operator(stacked_op, stacked_left, left)
+    return left
 
 def parse_expr_unit(ins):
     """ Compute the value of the expression unit at the current code pointer. """
@@ -168,84 +185,16 @@ def parse_expr_unit(ins):
     # single-byte tokens
     else:
         ins.read(1)
-        if d == tk.INPUT:         return value_input(ins)
-        elif d == tk.SCREEN:      return value_screen(ins)
-        elif d == tk.USR:         return value_usr(ins)
-        elif d == tk.FN:          return value_fn(ins)
-        elif d == tk.NOT:         return value_not(ins)
-        elif d == tk.ERL:         return value_erl(ins)
-        elif d == tk.ERR:         return value_err(ins)
-        elif d == tk.STRING:      return value_string(ins)
-        elif d == tk.INSTR:       return value_instr(ins)
-        elif d == tk.VARPTR:      return value_varptr(ins)
-        elif d == tk.CSRLIN:      return value_csrlin(ins)
-        elif d == tk.POINT:       return value_point(ins)
-        elif d == tk.INKEY:       return value_inkey(ins)
-        elif d == tk.O_PLUS:      return parse_expr_unit(ins)
-        elif d == tk.O_MINUS:     return value_neg(ins)
-        # two-byte tokens
-        elif d == '\xFD':
-            d += ins.read(1)
-            if d == tk.CVI:       return value_cvi(ins)
-            elif d == tk.CVS:     return value_cvs(ins)
-            elif d == tk.CVD:     return value_cvd(ins)
-            elif d == tk.MKI:     return value_mki(ins)
-            elif d == tk.MKS:     return value_mks(ins)
-            elif d == tk.MKD:     return value_mkd(ins)
-            elif d == tk.EXTERR:  return value_exterr(ins)
-        # two-byte tokens
-        elif d == '\xFE':
+        if d in ('\xFD', '\xFE', '\xFF'):
+            # two-byte tokens
             d += ins.read(1)
-            if d == tk.DATE:      return value_date(ins)
-            elif d == tk.TIME:    return value_time(ins)
-            elif d == tk.PLAY:    return value_play(ins)
-            elif d == tk.TIMER:   return value_timer(ins)
-            elif d == tk.ERDEV:   return value_erdev(ins)
-            elif d == tk.IOCTL:   return value_ioctl(ins)
-            elif d == tk.ENVIRON: return value_environ(ins)
-            elif d == tk.PMAP:    return value_pmap(ins)
-        # two-byte tokens
-        elif d == '\xFF':
-            d += ins.read(1)
-            if d == tk.LEFT:    return value_left(ins)
-            elif d == tk.RIGHT: return value_right(ins)
-            elif d == tk.MID:   return value_mid(ins)
-            elif d == tk.SGN:   return value_sgn(ins)
-            elif d == tk.INT:   return value_int(ins)
-            elif d == tk.ABS:   return value_abs(ins)
-            elif d == tk.SQR:   return value_sqr(ins)
-            elif d == tk.RND:   return value_rnd(ins)
-            elif d == tk.SIN:   return value_sin(ins)
-            elif d == tk.LOG:   return value_log(ins)
-            elif d == tk.EXP:   return value_exp(ins)
-            elif d == tk.COS:   return value_cos(ins)
-            elif d == tk.TAN:   return value_tan(ins)
-            elif d == tk.ATN:   return value_atn(ins)
-            elif d == tk.FRE:   return value_fre(ins)
-            elif d == tk.INP:   return value_inp(ins)
-            elif d == tk.POS:   return value_pos(ins)
-            elif d == tk.LEN:   return value_len(ins)
-            elif d == tk.STR:   return value_str(ins)
-            elif d == tk.VAL:   return value_val(ins)
-            elif d == tk.ASC:   return value_asc(ins)
-            elif d == tk.CHR:   return value_chr(ins)
-            elif d == tk.PEEK:  return value_peek(ins)
-            elif d == tk.SPACE: return value_space(ins)
-            elif d == tk.OCT:   return value_oct(ins)
-            elif d == tk.HEX:   return value_hex(ins)
-            elif d == tk.LPOS:  return value_lpos(ins)
-            elif d == tk.CINT:  return value_cint(ins)
-            elif d == tk.CSNG:  return value_csng(ins)
-            elif d == tk.CDBL:  return value_cdbl(ins)
-            elif d == tk.FIX:   return value_fix(ins)
-            elif d == tk.PEN:   return value_pen(ins)
-            elif d == tk.STICK: return value_stick(ins)
-            elif d == tk.STRIG: return value_strig(ins)
-            elif d == tk.EOF:   return value_eof(ins)
-            elif d == tk.LOC:   return value_loc(ins)
-            elif d == tk.LOF:   return value_lof(ins)
-        else:
+        try:
+            value_token = function_table[d]
+        except KeyError:
             return None
+        if profile:
+            return profile.call(d, value_token, ins)
+        return value_token(ins)
 
 ######################################################################
 # expression parsing utility functions
@@ -290,6 +239,22 @@ def parse_file_number(ins, file_mode='IOAR'):
         util.require_read(ins, (',',))
     return screen
 
+def read_var_name(ins):
+    """ Helper function: read a variable name, without completing its type. """
+    pos = ins.tell()
+    cacheable = ins is state.basic_state.bytecode
+    if cacheable:
+        try:
+            name, end = codecache.names_cache[pos]
+            ins.seek(end)
+            return name
+        except KeyError:
+            pass
+    name = util.read_var_name(ins)
+    if cacheable:
+        codecache.names_cache[pos] = name, ins.tell()
+    return name
+
 def parse_file_number_opthash(ins):
     """ Helper function: parse a file number, with optional hash. """
     util.skip_white_read_if(ins, ('#',))
@@ -299,7 +264,7 @@ def parse_file_number_opthash(ins):
 
 def get_var_or_array_name(ins):
     """ Helper function: parse a variable or array name. """
-    name = util.get_var_name(ins)
+    name = util.complete_var_name(read_var_name(ins))
     indices = []
     if util.skip_white_read_if(ins, ('[', '(')):
         # it's an array, read indices
@@ -347,17 +312,17 @@ def value_mkd(ins):
     """ MKD$: return the byte representation of a double. """
     return vartypes.pack_string(vartypes.pass_double_keep(parse_bracket(ins))[1])
 
-def value_cint(ins):
+def calc_cint(inp):
     """ CINT: convert a number to integer. """
-    return vartypes.pass_int_keep(parse_bracket(ins))
+    return vartypes.pass_int_keep(inp)
 
-def value_csng(ins):
+def calc_csng(inp):
     """ CSNG: convert a number to single. """
-    return vartypes.pass_single_keep(parse_bracket(ins))
+    return vartypes.pass_single_keep(inp)
 
-def value_cdbl(ins):
+def calc_cdbl(inp):
     """ CDBL: convert a number to double. """
-    return vartypes.pass_double_keep(parse_bracket(ins))
+    return vartypes.pass_double_keep(inp)
 
 def value_str(ins):
     """ STR$: string representation of a number. """
@@ -369,9 +334,9 @@ def value_val(ins):
     val = representation.str_to_value_keep(parse_bracket(ins))
     return val if val else vartypes.null['%']
 
-def value_chr(ins):
+def calc_chr(inp):
     """ CHR$: character for ASCII value. """
-    val = vartypes.pass_int_unpack(parse_bracket(ins))
+    val = vartypes.pass_int_unpack(inp)
     util.range_check(0, 255, val)
     return vartypes.pack_string(bytearray(chr(val)))
 
@@ -390,13 +355,13 @@ def value_hex(ins):
 ######################################################################
 # string maniulation
 
-def value_len(ins):
+def calc_len(inp):
     """ LEN: length of string. """
-    return vartypes.pack_int(len(vartypes.pass_string_unpack(parse_bracket(ins))) )
+    return vartypes.pack_int(len(vartypes.pass_string_unpack(inp)))
 
-def value_asc(ins):
+def calc_asc(inp):
     """ ASC: ordinal ASCII value of a character. """
-    s = vartypes.pass_string_unpack(parse_bracket(ins))
+    s = vartypes.pass_string_unpack(inp)
     if not s:
         raise error.RunError(error.IFC)
     return vartypes.pack_int(s[0])
@@ -629,9 +594,10 @@ def value_fn(ins):
     # save existing vars
     varsave = {}
     for name in varnames:
-        if name in state.basic_state.variables:
+        value = var.get_var_buffer(name)
+        if value is not None:
             # copy the *value* - set_var is in-place it's safe for FOR loops
-            varsave[name] = state.basic_state.variables[name][:]
+            varsave[name] = value[:]
     # read variables
     if util.skip_white_read_if(ins, ('(',)):
         exprs = parse_expr_list(ins, len(varnames), err=error.STX)
@@ -647,7 +613,7 @@ def value_fn(ins):
     # restore existing vars
     for name in varsave:
         # re-assign the stored value
-        state.basic_state.variables[name][:] = varsave[name]
+        var.get_var_buffer(name)[:] = varsave[name]
     return value
 
 ###############################################################
@@ -834,17 +800,17 @@ def value_ioctl(ins):
 ###########################################################
 # option_double regulated single & double precision math
 
-def value_unary(ins, fn):
+def calc_unary(inp, fn):
     """ Return value of unary math function. """
-    return fp.pack(fn(fp.unpack(vartypes.pass_float_keep(parse_bracket(ins), option_double))))
+    return fp.pack(fn(fp.unpack(vartypes.pass_float_keep(inp, option_double))))
 
-value_sqr = partial(value_unary, fn=fp.sqrt)
-value_exp = partial(value_unary, fn=fp.exp)
-value_sin = partial(value_unary, fn=fp.sin)
-value_cos = partial(value_unary, fn=fp.cos)
-value_tan = partial(value_unary, fn=fp.tan)
-value_atn = partial(value_unary, fn=fp.atn)
-value_log = partial(value_unary, fn=fp.log)
+calc_sqr = partial(calc_unary, fn=fp.sqrt)
+calc_exp = partial(calc_unary, fn=fp.exp)
+calc_sin = partial(calc_unary, fn=fp.sin)
+calc_cos = partial(calc_unary, fn=fp.cos)
+calc_tan = partial(calc_unary, fn=fp.tan)
+calc_atn = partial(calc_unary, fn=fp.atn)
+calc_log = partial(calc_unary, fn=fp.log)
 
 def value_rnd(ins):
     """ RND: get pseudorandom value. """
@@ -853,27 +819,27 @@ def value_rnd(ins):
     else:
         return rnd.get_random_int(1)
 
-def value_abs(ins):
+def calc_abs(inp):
     """ ABS: get absolute value. """
-    return vartypes.number_abs(vartypes.pass_number_keep(parse_bracket(ins)))
+    return vartypes.number_abs(vartypes.pass_number_keep(inp))
 
-def value_int(ins):
+def calc_int(inp):
     """ INT: get floor value. """
-    inp = vartypes.pass_number_keep(parse_bracket(ins))
+    inp = vartypes.pass_number_keep(inp)
     return inp if inp[0] == '%' else fp.pack(fp.unpack(inp).ifloor())
 
-def value_sgn(ins):
+def calc_sgn(inp):
     """ SGN: get sign. """
-    inp = vartypes.pass_number_keep(parse_bracket(ins))
+    inp = vartypes.pass_number_keep(inp)
     if inp[0] == '%':
         inp_int = vartypes.unpack_int(inp)
         return vartypes.pack_int(0 if inp_int==0 else (1 if inp_int > 0 else -1))
     else:
         return vartypes.pack_int(fp.unpack(inp).sign() )
 
-def value_fix(ins):
+def calc_fix(inp):
     """ FIX: round towards zero. """
-    inp = vartypes.pass_number_keep(parse_bracket(ins))
+    inp = vartypes.pass_number_keep(inp)
     if inp[0] == '%':
         return inp
     elif inp[0] == '!':
@@ -890,6 +856,41 @@ def value_not(ins):
     """ NOT: get two's complement NOT, -x-1. """
     return vartypes.pack_int(~vartypes.pass_int_unpack(parse_expr_unit(ins)))
 
+###########################################################
+# functions of a single bracketed argument
+
+def value_bracket(ins, fn):
+    """ Return value of a function of one bracketed argument. """
+    return fn(parse_bracket(ins))
+
+# functions without side effects, may be pre-parsed in compiled mode
+bracket_functions = {
+    tk.CINT: calc_cint, tk.CSNG: calc_csng, tk.CDBL: calc_cdbl,
+    tk.CHR: calc_chr, tk.LEN: calc_len, tk.ASC: calc_asc,
+    tk.SQR: calc_sqr, tk.EXP: calc_exp, tk.SIN: calc_sin, tk.COS: calc_cos,
+    tk.TAN: calc_tan, tk.ATN: calc_atn, tk.LOG: calc_log,
+    tk.ABS: calc_abs, tk.INT: calc_int, tk.SGN: calc_sgn, tk.FIX: calc_fix,
+    }
+
+value_cint = partial(value_bracket, fn=calc_cint)
+value_csng = partial(value_bracket, fn=calc_csng)
+value_cdbl = partial(value_bracket, fn=calc_cdbl)
+value_chr = partial(value_bracket, fn=calc_chr)
+value_len = partial(value_bracket, fn=calc_len)
+value_asc = partial(value_bracket, fn=calc_asc)
+value_sqr = partial(value_bracket, fn=calc_sqr)
+value_exp = partial(value_bracket, fn=calc_exp)
+value_sin = partial(value_bracket, fn=calc_sin)
+value_cos = partial(value_bracket, fn=calc_cos)
+value_tan = partial(value_bracket, fn=calc_tan)
+value_atn = partial(value_bracket, fn=calc_atn)
+value_log = partial(value_bracket, fn=calc_log)
+value_abs = partial(value_bracket, fn=calc_abs)
+value_int = partial(value_bracket, fn=calc_int)
+value_sgn = partial(value_bracket, fn=calc_sgn)
+value_fix = partial(value_bracket, fn=calc_fix)
+
+######################################################################
 # binary operators
 
 def value_operator(op, left, right):
@@ -945,23 +946,23 @@ def vcaret(left, right):
         return fp.pack( fp.power(fp.unpack(vartypes.pass_double_keep(left)), fp.unpack(vartypes.pass_double_keep(right))) )
     else:
         if right[0] == '%':
-            return fp.pack( fp.unpack(vartypes.pass_single_keep(left)).ipow_int(vartypes.unpack_int(right)) )
+            return fp.pow_int_packed(vartypes.pass_single_keep(left), vartypes.unpack_int(right))
         else:
             return fp.pack( fp.power(fp.unpack(vartypes.pass_single_keep(left)), fp.unpack(vartypes.pass_single_keep(right))) )
 
 def vtimes(left, right):
     """ Left*right. """
     if left[0] == '#' or right[0] == '#':
-        return fp.pack( fp.unpack(vartypes.pass_double_keep(left)).imul(fp.unpack(vartypes.pass_double_keep(right))) )
+        return fp.mul_packed(vartypes.pass_double_keep(left), vartypes.pass_double_keep(right))
     else:
-        return fp.pack( fp.unpack(vartypes.pass_single_keep(left)).imul(fp.unpack(vartypes.pass_single_keep(right))) )
+        return fp.mul_packed(vartypes.pass_single_keep(left), vartypes.pass_single_keep(right))
 
 def vdiv(left, right):
     """ Left/right. """
     if left[0] == '#' or right[0] == '#':
-        return fp.pack( fp.div(fp.unpack(vartypes.pass_double_keep(left)), fp.unpack(vartypes.pass_double_keep(right))) )
+        return fp.div_packed(vartypes.pass_double_keep(left), vartypes.pass_double_keep(right))
     else:
-        return fp.pack( fp.div(fp.unpack(vartypes.pass_single_keep(left)), fp.unpack(vartypes.pass_single_keep(right))) )
+        return fp.div_packed(vartypes.pass_single_keep(left), vartypes.pass_single_keep(right))
 
 def vplus(left, right):
     """ Left+right. """
@@ -970,4 +971,30 @@ def vplus(left, right):
     else:
         return vartypes.number_add(left, right)
 
+######################################################################
+# function dispatch table, keyed by one- or two-byte token
+
+function_table = {
+    tk.INPUT: value_input, tk.SCREEN: value_screen, tk.USR: value_usr,
+    tk.FN: value_fn, tk.NOT: value_not, tk.ERL: value_erl, tk.ERR: value_err,
+    tk.STRING: value_string, tk.INSTR: value_instr, tk.VARPTR: value_varptr,
+    tk.CSRLIN: value_csrlin, tk.POINT: value_point, tk.INKEY: value_inkey,
+    tk.O_PLUS: parse_expr_unit, tk.O_MINUS: value_neg, tk.CVI: value_cvi,
+    tk.CVS: value_cvs, tk.CVD: value_cvd, tk.MKI: value_mki, tk.MKS: value_mks,
+    tk.MKD: value_mkd, tk.EXTERR: value_exterr, tk.DATE: value_date,
+    tk.TIME: value_time, tk.PLAY: value_play, tk.TIMER: value_timer,
+    tk.ERDEV: value_erdev, tk.IOCTL: value_ioctl, tk.ENVIRON: value_environ,
+    tk.PMAP: value_pmap, tk.LEFT: value_left, tk.RIGHT: value_right,
+    tk.MID: value_mid, tk.SGN: value_sgn, tk.INT: value_int, tk.ABS: value_abs,
+    tk.SQR: value_sqr, tk.RND: value_rnd, tk.SIN: value_sin, tk.LOG: value_log,
+    tk.EXP: value_exp, tk.COS: value_cos, tk.TAN: value_tan, tk.ATN: value_atn,
+    tk.FRE: value_fre, tk.INP: value_inp, tk.POS: value_pos, tk.LEN: value_len,
+    tk.STR: value_str, tk.VAL: value_val, tk.ASC: value_asc, tk.CHR: value_chr,
+    tk.PEEK: value_peek, tk.SPACE: value_space, tk.OCT: value_oct,
+    tk.HEX: value_hex, tk.LPOS: value_lpos, tk.CINT: value_cint,
+    tk.CSNG: value_csng, tk.CDBL: value_cdbl, tk.FIX: value_fix,
+    tk.PEN: value_pen, tk.STICK: value_stick, tk.STRIG: value_strig,
+    tk.EOF: value_eof, tk.LOC: value_loc, tk.LOF: value_lof,
+    }
+
 prepare()
@@ -12,6 +12,7 @@ import var
 import vartypes
 import util
 import error
+import codecache
 import basictoken as tk
 
 # pointer position: False for direct line, True for program
@@ -59,10 +60,13 @@ def get_codestream():
 
 def jump_gosub(jumpnum, handler=None):
     """ Execute jump for a GOSUB. """
-    # set return position
-    state.basic_state.gosub_return.append((get_codestream().tell(), state.basic_state.run_mode, handler))
+    push_gosub(handler)
     jump(jumpnum)
 
+def push_gosub(handler=None):
+    """ Set return position for a GOSUB. """
+    state.basic_state.gosub_return.append((get_codestream().tell(), state.basic_state.run_mode, handler))
+
 def jump_return(jumpnum):
     """ Execute jump for a RETURN. """
     try:
@@ -86,7 +90,7 @@ def loop_init(ins, forpos, nextpos, varname, start, stop, step):
     var.set_var(varname, vartypes.number_add(start, vartypes.number_neg(step)))
     # NOTE: all access to varname must be in-place into the bytearray - no assignments!
     sgn = vartypes.unpack_int(vartypes.number_sgn(step))
-    state.basic_state.for_next_stack.append((forpos, nextpos, varname[-1], state.basic_state.variables[varname], number_unpack(stop), number_unpack(step), sgn))
+    state.basic_state.for_next_stack.append((forpos, nextpos, varname[-1], var.get_var_buffer(varname), number_unpack(stop), number_unpack(step), sgn))
     ins.seek(nextpos)
 
 def number_unpack(value):
@@ -154,11 +158,29 @@ def jump(jumpnum, err=error.UNDEFINED_LINE_NUMBER):
     if jumpnum is None:
         set_pointer(True, 0)
     else:
+        jump_to(state.basic_state.line_numbers.get(jumpnum), err)
+
+def jump_to(target, err=error.UNDEFINED_LINE_NUMBER):
+    """ Jump to a code position found by read_jump_target. """
+    if target is None:
+        raise error.RunError(err)
+    set_pointer(True, target)
+
+def read_jump_target(ins):
+    """ Parse a line number reference; return the code position of the line or None. """
+    pos = ins.tell()
+    cacheable = ins is state.basic_state.bytecode
+    if cacheable:
         try:
-            # jump to target
-            set_pointer(True, state.basic_state.line_numbers[jumpnum])
+            target, end = codecache.jumps_cache[pos]
+            ins.seek(end)
+            return target
         except KeyError:
-            raise error.RunError(err)
+            pass
+    target = state.basic_state.line_numbers.get(util.parse_jumpnum(ins))
+    if cacheable and target is not None:
+        codecache.jumps_cache[pos] = target, ins.tell()
+    return target
 
 def read_entry():
     """ READ a unit of DATA. """
@@ -23,6 +23,7 @@ This file is released under the GNU GPL version 3.
 # There is an assumed 1 bit after the radix point (so the assumed mantissa is 0.1ffff... where f's are the fraction bits)
 
 import math
+import struct
 from functools import partial
 
 import error
@@ -491,6 +492,167 @@ def pow_int(left_in, right_in):
     """ Raise a float to an integer power. """
     return left_in.copy().ipow_int(right_in)
 
+####################################
+# arithmetic on packed values
+# these give bit-for-bit the same results as the Float methods,
+# but work on the sign, mantissa and exponent as plain integers
+# without creating Float objects.
+# the mantissa includes the carry byte, as in Float.man
+
+def _unpack_fields(value):
+    """ Unpack a single or double into sign, mantissa and exponent. """
+    if value[0] == '!':
+        bits = struct.unpack_from('<L', value[1])[0]
+        return (bits >> 23) & 1, ((bits & 0xffffff) | 0x800000) << 8, bits >> 24
+    else:
+        bits = struct.unpack_from('<Q', value[1])[0]
+        return ((bits >> 55) & 1, ((bits & 0xffffffffffffff) | 0x80000000000000) << 8,
+                bits >> 56)
+
+def _pack_fields(typechar, neg, man, exp):
+    """ Round off the carry byte and pack into BASIC representation. """
+    if (man & 0xff) > 0x7f:
+        man += 0x100
+    if typechar == '!':
+        if man >= 0x100000000:
+            exp += 1
+            man >>= 1
+        s = bytearray(struct.pack('<L', ((man >> 8) & 0x7fffff) | (neg << 23)))
+    else:
+        if man >= 0x10000000000000000:
+            exp += 1
+            man >>= 1
+        s = bytearray(struct.pack('<Q', ((man >> 8) & 0x7fffffffffffff) | (neg << 55)))
+    s[-1] = exp
+    return typechar, s
+
+def _normalise_fields(typechar, neg, man, exp):
+    """ Bring sign, mantissa and exponent to normal form, as Float.normalise. """
+    if man == 0 or exp == 0:
+        return 0, 0, 0
+    cls = Single if typechar == '!' else Double
+    bits = cls.byte_size * 8
+    length = man.bit_length()
+    if length < bits or man == 1 << (bits-1):
+        # shift left until the mantissa exceeds 2**(bits-1)
+        shift = bits - length
+        man <<= shift
+        exp -= shift
+        if man == 1 << (bits-1):
+            man <<= 1
+            exp -= 1
+    elif man > 1 << bits:
+        # shift right until the mantissa is at most 2**bits
+        shift = length - bits - 1
+        man >>= shift
+        exp += shift
+        if man > 1 << bits:
+            man >>= 1
+            exp += 1
+    if exp < 0:
+        # underflow
+        exp = 0
+    elif exp > 0xff:
+        msg_overflow()
+        exp, man = 0xff, cls.carry_mask
+    return neg, man, exp
+
+def _add_fields(typechar, left, right):
+    """ Add unpacked floats, as Float.iadd. """
+    if right[2] == 0:
+        return _normalise_fields(typechar, *left)
+    if left[2] == 0:
+        return _normalise_fields(typechar, *right)
+    # ensure right has largest exponent
+    if left[2] > right[2]:
+        left, right = right, left
+    lneg, lman, lexp = left
+    rneg, rman, rexp = right
+    # denormalise left to match exponents
+    lman >>= rexp - lexp
+    # add mantissas, taking sign into account
+    if lneg == rneg:
+        return _normalise_fields(typechar, lneg, lman + rman, rexp)
+    elif lman > rman:
+        return _normalise_fields(typechar, lneg, lman - rman, rexp)
+    else:
+        return _normalise_fields(typechar, rneg, rman - lman, rexp)
+
+def _mul_fields(typechar, left, right):
+    """ Multiply unpacked floats, as Float.imul. """
+    if left[2] == 0:
+        return left
+    if right[2] == 0:
+        return right
+    bias = Single.bias if typechar == '!' else Double.bias
+    return _normalise_fields(typechar, left[0] ^ right[0], left[1] * right[1],
+                             left[2] + right[2] - bias - 8)
+
+def _div_fields(typechar, left, right):
+    """ Divide unpacked floats, as Float.idiv. """
+    cls = Single if typechar == '!' else Double
+    if right[2] == 0:
+        msg_zero_div()
+        return left[0], cls.max.man, cls.max.exp
+    if left[2] == 0:
+        return left
+    work_man, denom_man = left[1], right[1]
+    # one exponent step for every bit of the denominator
+    exp = left[2] - right[2] + cls.bias + 9 - denom_man.bit_length()
+    # long division of mantissas
+    man = 0
+    while denom_man:
+        man <<= 1
+        if work_man > denom_man:
+            work_man -= denom_man
+            man += 1
+        denom_man >>= 1
+    return _normalise_fields(typechar, left[0] ^ right[0], man, exp)
+
+def _pow_int_fields(typechar, base, expt):
+    """ Raise unpacked float to an integer power, as Float.ipow_int. """
+    # exponentiation by squares
+    if expt < 0:
+        return _div_fields(typechar, _one_fields[typechar],
+                           _pow_int_fields(typechar, base, -expt))
+    elif expt > 1:
+        half = _pow_int_fields(typechar, base, expt // 2)
+        result = _mul_fields(typechar, half, half)
+        if expt % 2:
+            result = _mul_fields(typechar, result, base)
+        return result
+    elif expt == 0:
+        return _one_fields[typechar]
+    return base
+
+def add_packed(left, right):
+    """ Add two packed floats of the same precision. """
+    state.basic_state.overflow = False
+    state.basic_state.zero_div = False
+    return _pack_fields(left[0], *_add_fields(left[0],
+                        _unpack_fields(left), _unpack_fields(right)))
+
+def mul_packed(left, right):
+    """ Multiply two packed floats of the same precision. """
+    state.basic_state.overflow = False
+    state.basic_state.zero_div = False
+    return _pack_fields(left[0], *_mul_fields(left[0],
+                        _unpack_fields(left), _unpack_fields(right)))
+
+def div_packed(left, right):
+    """ Divide two packed floats of the same precision. """
+    state.basic_state.overflow = False
+    state.basic_state.zero_div = False
+    return _pack_fields(left[0], *_div_fields(left[0],
+                        _unpack_fields(left), _unpack_fields(right)))
+
+def pow_int_packed(base, expt):
+    """ Raise a packed float to an integer power. """
+    state.basic_state.overflow = False
+    state.basic_state.zero_div = False
+    return _pack_fields(base[0], *_pow_int_fields(base[0],
+                        _unpack_fields(base), expt))
+
 ####################################
 # math function
 
@@ -549,3 +711,9 @@ Double.log2     = from_bytes(bytearray('\x7a\xcf\xd1\xf7\x17\x72\x31\x80'))
 Double.twopi    = mul(Double.pi, Double.two)
 Double.pi2      = mul(Double.pi, Double.half)
 Double.pi4      = mul(Double.pi2, Double.half)
+
+# unpacked 1 for integer powers
+_one_fields = {
+    '!': (Single.one.neg, Single.one.man, Single.one.exp),
+    '#': (Double.one.neg, Double.one.man, Double.one.exp),
+    }
@@ -264,6 +264,9 @@ class Drawing(object):
         # cut off any out-of-bound coordinates
         x0, y0 = self.screen.mode.cutoff_coord(x0, y0)
         x1, y1 = self.screen.mode.cutoff_coord(x1, y1)
+        if numpy:
+            self.screen.put_pixels(*line_points(x0, y0, x1, y1, pattern), index=c)
+            return
         if y1 <= y0:
             # work from top to bottom, or from x1,y1 if at the same height. this matters for mask.
             x1, y1, x0, y0 = x0, y0, x1, y1
@@ -306,6 +309,9 @@ class Drawing(object):
         """ Draw an empty box between the given corner points. """
         x0, y0 = self.screen.mode.cutoff_coord(x0, y0)
         x1, y1 = self.screen.mode.cutoff_coord(x1, y1)
+        if numpy:
+            self.screen.put_pixels(*box_points(x0, y0, x1, y1, pattern), index=c)
+            return
         mask = 0x8000
         mask = self.draw_straight(x1, y1, x0, y1, c, pattern, mask)
         mask = self.draw_straight(x1, y0, x0, y0, c, pattern, mask)
@@ -420,13 +426,17 @@ class Drawing(object):
                     oct1=-1, coo1=-1, line1=False):
         """ Draw a circle sector using the midpoint algorithm. """
         # see e.g. http://en.wikipedia.org/wiki/Midpoint_circle_algorithm
-        # find invisible octants
-        if oct0 == -1:
-            hide_oct = range(0,0)
-        elif oct0 < oct1 or oct0 == oct1 and octant_gte(oct0, coo1, coo0):
-            hide_oct = range(0, oct0) + range(oct1+1, 8)
-        else:
-            hide_oct = range(oct1+1, oct0)
+        hide_oct = hidden_octants(oct0, coo0, oct1, coo1)
+        if numpy:
+            xs, ys = circle_points(r)
+            self.screen.put_pixels(*octant_points(xs, ys, x0, y0, hide_oct,
+                                              oct0, coo0, oct1, coo1), index=c)
+            # draw pie-slice lines
+            if line0:
+                self.draw_line(x0, y0, *octant_coord(oct0, x0, y0, xs[coo0], coo0), c=c)
+            if line1:
+                self.draw_line(x0, y0, *octant_coord(oct1, x0, y0, xs[coo1], coo1), c=c)
+            return
         # if oct1==oct0:
         # ----|.....|--- : coo1 lt coo0 : print if y in [0,coo1] or in [coo0, r]
         # ....|-----|... ; coo1 gte coo0: print if y in [coo0,coo1]
@@ -476,13 +486,16 @@ class Drawing(object):
                      qua1=-1, x1=-1, y1=-1, line1=False):
         """ Draw ellipse using the midpoint algorithm. """
         # for algorithm see http://members.chello.at/~easyfilter/bresenham.html
-        # find invisible quadrants
-        if qua0 == -1:
-            hide_qua = range(0,0)
-        elif qua0 < qua1 or qua0 == qua1 and quadrant_gte(qua0, x1, y1, x0, y0):
-            hide_qua = range(0, qua0) + range(qua1+1, 4)
-        else:
-            hide_qua = range(qua1+1,qua0)
+        hide_qua = hidden_quadrants(qua0, x0, y0, qua1, x1, y1)
+        if numpy:
+            self.screen.put_pixels(*ellipse_points(cx, cy, rx, ry, hide_qua,
+                                        qua0, x0, y0, qua1, x1, y1), index=c)
+            # draw pie-slice lines
+            if line0:
+                self.draw_line(cx, cy, *quadrant_coord(qua0, cx, cy, x0, y0), c=c)
+            if line1:
+                self.draw_line(cx, cy, *quadrant_coord(qua1, cx, cy, x1, y1), c=c)
+            return
         # error increment
         dx = 16 * (1-2*rx) * ry * ry
         dy = 16 * rx * rx
@@ -550,7 +563,6 @@ class Drawing(object):
             tile, back = [[c]*8], None
         bound_x0, bound_y0, bound_x1, bound_y1 = self.get_view()
         x, y = self.view_coords(*self.get_window_physical(*lcoord))
-        line_seed = [(x, x, y, 0)]
         # paint nothing if seed is out of bounds
         if x < bound_x0 or x > bound_x1 or y < bound_y0 or y > bound_y1:
             return
@@ -558,6 +570,22 @@ class Drawing(object):
         # paint nothing if we start on border attrib
         if self.screen.get_pixel(x,y) == border:
             return
+        if numpy:
+            fill = FloodFill(self.screen.pixels.pages[self.screen.apagenum].buffer,
+                             self.get_view(), tile, back, border)
+            try:
+                fill.fill(x, y)
+            finally:
+                # show what has been painted, even if interrupted
+                self.screen.put_spans(fill.spans)
+        else:
+            self.paint_scanlines(x, y, solid, c, tile, back, border)
+        self.last_attr = c
+
+    def paint_scanlines(self, x, y, solid, c, tile, back, border):
+        """ Flood fill interval by interval through the screen. """
+        bound_x0, bound_y0, bound_x1, bound_y1 = self.get_view()
+        line_seed = [(x, x, y, 0)]
         while len(line_seed) > 0:
             # consider next interval
             x_start, x_stop, y, ydir = line_seed.pop()
@@ -588,7 +616,6 @@ class Drawing(object):
             # allow interrupting the paint
             if y%4 == 0:
                 backend.check_events()
-        self.last_attr = c
 
     def check_scanline(self, line_seed, x_start, x_stop, y,
                        c, tile, back, border, ydir):
@@ -637,12 +664,10 @@ class Drawing(object):
             dx, dy, sprite, s_version = spriterec
         except KeyError:
             spriterec = None
-        if (not spriterec) or (s_version != a_version):
+        stale = (not spriterec) or (s_version != a_version)
+        if stale:
             # we don't have it stored or it has been modified
             dx, dy = self.screen.mode.record_to_sprite_size(byte_array)
-            sprite = self.screen.mode.array_to_sprite(byte_array, 4, dx, dy)
-            # store it now that we have it!
-            self.sprites[array_name] = (dx, dy, sprite, a_version)
         # sprite must be fully inside *viewport* boundary
         x1, y1 = x0+dx-1, y0+dy-1
         # Tandy screen 6 sprites are twice as wide as claimed
@@ -652,6 +677,10 @@ class Drawing(object):
         vx0, vy0, vx1, vy1 = self.get_view()
         util.range_check(vx0, vx1, x0, x1)
         util.range_check(vy0, vy1, y0, y1)
+        if stale:
+            sprite = self.screen.mode.array_to_sprite(byte_array, 4, dx, dy)
+            # store it now that we have it!
+            self.sprites[array_name] = (dx, dy, sprite, a_version)
         # apply the sprite to the screen
         self.screen.put_rect(x0, y0, x1, y1, sprite, operation_token)
 
@@ -810,6 +839,90 @@ class Drawing(object):
             self.last_point = x0, y0
 
 
+###############################################################################
+# flood fill for PAINT
+
+class FloodFill(object):
+    """ Scanline flood fill working directly on a numpy [y][x] pixel buffer. """
+
+    # number of intervals to fill between event checks
+    check_interval = 32
+
+    def __init__(self, buf, bounds, tile, back, border):
+        """ Prepare to fill within the given bounds with tiles in [y][x] format. """
+        self.buf = buf
+        self.bound_x0, self.bound_y0, self.bound_x1, self.bound_y1 = bounds
+        self.border = border
+        # tile rows repeated across the whole scanline
+        width = buf.shape[1]
+        self.tile = numpy.tile(numpy.array(tile), (1, (width+7)//8))[:, :width]
+        # never match zero pattern (special case)
+        self.tile_matchable = [any(row) for row in tile]
+        self.back = None
+        if back:
+            self.back = numpy.tile(numpy.array(back), (1, (width+7)//8))[:, :width]
+        # painted intervals as (x0, x1, y)
+        self.spans = []
+
+    def fill(self, x, y):
+        """ Fill the area around a seed point. """
+        bound_x0, bound_y0 = self.bound_x0, self.bound_y0
+        bound_x1, bound_y1 = self.bound_x1, self.bound_y1
+        border = self.border
+        line_seed = [(x, x, y, 0)]
+        while line_seed:
+            # consider next interval
+            x_start, x_stop, y, ydir = line_seed.pop()
+            row = self.buf[y]
+            # extend interval as far as it goes to left and right
+            left = numpy.flatnonzero(row[bound_x0:x_start] == border)
+            x_left = bound_x0 + int(left[-1]) + 1 if len(left) else bound_x0
+            right = numpy.flatnonzero(row[x_stop+1:bound_x1+1] == border)
+            x_right = x_stop + int(right[0]) if len(right) else bound_x1
+            # check next scanlines and add intervals to the list
+            if ydir == 0:
+                if y + 1 <= bound_y1:
+                    self.check_scanline(line_seed, x_left, x_right, y+1, 1)
+                if y - 1 >= bound_y0:
+                    self.check_scanline(line_seed, x_left, x_right, y-1, -1)
+            else:
+                # check the same interval one scanline onward in the same direction
+                if bound_y0 <= y+ydir <= bound_y1:
+                    self.check_scanline(line_seed, x_left, x_right, y+ydir, ydir)
+                # check any bit of the interval that was extended one scanline backward
+                # this is where the flood fill goes around corners.
+                if bound_y0 <= y-ydir <= bound_y1:
+                    self.check_scanline(line_seed, x_left, x_start-1, y-ydir, -ydir)
+                    self.check_scanline(line_seed, x_stop+1, x_right, y-ydir, -ydir)
+            # draw the pixels for the current interval
+            row[x_left:x_right+1] = self.tile[y % len(self.tile), x_left:x_right+1]
+            self.spans.append((x_left, x_right, y))
+            # allow interrupting the paint
+            if len(self.spans) % self.check_interval == 0:
+                backend.check_events()
+
+    def check_scanline(self, line_seed, x_start, x_stop, y, ydir):
+        """ Append all subintervals between border colours to the scanning stack. """
+        if x_stop < x_start:
+            return
+        pattern = self.buf[y, x_start:x_stop+1]
+        # find the runs of non-border pixels; stops are exclusive
+        inside = numpy.concatenate(([False], pattern != self.border, [False]))
+        edges = numpy.flatnonzero(inside[1:] != inside[:-1])
+        starts, stops = edges[::2], edges[1::2]
+        # don't append if same fill colour/pattern, to avoid infinite loops over bits already painted (eg. 00 shape)
+        # unless the pattern also equals the background
+        if self.tile_matchable[y % len(self.tile)]:
+            differs = pattern != self.tile[y % len(self.tile), x_start:x_stop+1]
+            if self.back is not None:
+                differs |= pattern == self.back[y % len(self.back), x_start:x_stop+1]
+            counts = numpy.concatenate(([0], numpy.cumsum(differs)))
+            new = counts[stops] > counts[starts]
+            starts, stops = starts[new], stops[new]
+        line_seed.extend((x_start+start, x_start+stop-1, y, ydir)
+                         for start, stop in zip(starts.tolist(), stops.tolist()))
+
+
 def tile_to_interval(x0, x1, y, tile):
     """ Convert a tile to a list of attributes. """
     dx = x1 - x0 + 1
@@ -823,9 +936,169 @@ def tile_to_interval(x0, x1, y, tile):
         return [tile[y % h][x % 8] for x in xrange(x0, x1+1)]
 
 
+###############################################################################
+# rasteriser for LINE and CIRCLE: pixel coordinates as numpy arrays
+
+def pattern_mask(pattern, length):
+    """ Return which of a run of pixels a 16-bit line style pattern draws. """
+    bits = numpy.array([pattern & (0x8000 >> i) != 0 for i in range(16)])
+    return bits[numpy.arange(length) % 16]
+
+def line_points(x0, y0, x1, y1, pattern=0xffff):
+    """ Return the pixels of a patterned line using the Bresenham algorithm. """
+    if y1 <= y0:
+        # work from top to bottom, or from x1,y1 if at the same height. this matters for mask.
+        x1, y1, x0, y0 = x0, y0, x1, y1
+    dx, dy = abs(x1-x0), abs(y1-y0)
+    steep = dy > dx
+    if steep:
+        x0, y0, x1, y1 = y0, x0, y1, x1
+        dx, dy = dy, dx
+    sx = 1 if x1 > x0 else -1
+    sy = 1 if y1 > y0 else -1
+    steps = numpy.arange(dx+1)
+    xs = x0 + sx*steps
+    if dx:
+        # number of times the error term, starting at dx/2, has dropped below zero
+        ys = y0 + sy*((steps*dy + dx - 1 - dx/2) // dx)
+    else:
+        ys = numpy.array([y0])
+    if steep:
+        xs, ys = ys, xs
+    drawn = pattern_mask(pattern, len(xs))
+    return xs[drawn], ys[drawn]
+
+def straight_points(x0, y0, x1, y1):
+    """ Return the pixels of a horizontal or vertical line. """
+    if x0 == x1:
+        sp = 1 if y1 > y0 else -1
+        ys = y0 + sp*numpy.arange(abs(y1-y0)+1)
+        return numpy.repeat(x0, len(ys)), ys
+    sp = 1 if x1 > x0 else -1
+    xs = x0 + sp*numpy.arange(abs(x1-x0)+1)
+    return xs, numpy.repeat(y0, len(xs))
+
+def box_points(x0, y0, x1, y1, pattern=0xffff):
+    """ Return the pixels of an empty box; the pattern continues along the sides. """
+    sides = [straight_points(x1, y1, x0, y1), straight_points(x1, y0, x0, y0)]
+    # verticals always drawn top to bottom
+    if y0 < y1:
+        y0, y1 = y1, y0
+    sides += [straight_points(x1, y1, x1, y0), straight_points(x0, y1, x0, y0)]
+    xs = numpy.concatenate([side[0] for side in sides])
+    ys = numpy.concatenate([side[1] for side in sides])
+    drawn = pattern_mask(pattern, len(xs))
+    return xs[drawn], ys[drawn]
+
+def circle_points(r):
+    """ Return the first octant of a circle using the midpoint algorithm. """
+    xs = []
+    x, y = r, 0
+    bres_error = 1-r
+    while x >= y:
+        xs.append(x)
+        # bresenham error step
+        y += 1
+        if bres_error < 0:
+            bres_error += 2*y+1
+        else:
+            x -= 1
+            bres_error += 2*(y-x+1)
+    return numpy.array(xs, dtype=int), numpy.arange(len(xs))
+
+def octant_points(xs, ys, x0, y0, hide_oct, oct0, coo0, oct1, coo1):
+    """ Reflect an octant into the visible octants of a circle sector. """
+    all_xs, all_ys = [], []
+    for octant in range(0,8):
+        if octant in hide_oct:
+            continue
+        elif oct0 != oct1 and octant == oct0:
+            visible = ~octant_gt(oct0, coo0, ys)
+        elif oct0 != oct1 and octant == oct1:
+            visible = ~octant_gt(oct1, ys, coo1)
+        elif oct0 == oct1 and octant == oct0:
+            if octant_gte(oct0, coo1, coo0):
+                # don't draw if y is outside coo's
+                visible = ~(octant_gt(oct0, ys, coo1) | octant_gt(oct0, coo0, ys))
+            else:
+                # don't draw if y is between coo's
+                visible = ~(octant_gt(oct0, ys, coo1) & octant_gt(oct0, coo0, ys))
+        else:
+            visible = numpy.ones(len(ys), dtype=bool)
+        octant_xs, octant_ys = octant_coord(octant, x0, y0, xs[visible], ys[visible])
+        all_xs.append(octant_xs)
+        all_ys.append(octant_ys)
+    if not all_xs:
+        return numpy.array([], dtype=int), numpy.array([], dtype=int)
+    return numpy.concatenate(all_xs), numpy.concatenate(all_ys)
+
+def ellipse_points(cx, cy, rx, ry, hide_qua, qua0, x0, y0, qua1, x1, y1):
+    """ Return the pixels of an ellipse sector using the midpoint algorithm. """
+    # error increment
+    dx = 16 * (1-2*rx) * ry * ry
+    dy = 16 * rx * rx
+    ddy = 32 * rx * rx
+    ddx = 32 * ry * ry
+    # error for first step
+    err = dx + dy
+    x, y = rx, 0
+    xs, ys = [], []
+    while True:
+        xs.append(x)
+        ys.append(y)
+        # bresenham error step
+        e2 = 2 * err
+        if (e2 <= dy):
+            y += 1
+            dy += ddy
+            err += dy
+        if (e2 >= dx or e2 > dy):
+            x -= 1
+            dx += ddx
+            err += dx
+        # NOTE - err changes sign at the change from y increase to x increase
+        if (x < 0):
+            break
+    xs, ys = numpy.array(xs, dtype=int), numpy.array(ys, dtype=int)
+    all_xs, all_ys = [], []
+    for quadrant in range(0,4):
+        # skip invisible arc sectors
+        if quadrant in hide_qua:
+            continue
+        elif qua0 != qua1 and quadrant == qua0:
+            visible = ~quadrant_gt(qua0, x0, y0, xs, ys)
+        elif qua0 != qua1 and quadrant == qua1:
+            visible = ~quadrant_gt(qua1, xs, ys, x1, y1)
+        elif qua0 == qua1 and quadrant == qua0:
+            if quadrant_gte(qua0, x1, y1, x0, y0):
+                visible = ~(quadrant_gt(qua0, xs, ys, x1, y1) | quadrant_gt(qua0, x0, y0, xs, ys))
+            else:
+                visible = ~(quadrant_gt(qua0, xs, ys, x1, y1) & quadrant_gt(qua0, x0, y0, xs, ys))
+        else:
+            visible = numpy.ones(len(ys), dtype=bool)
+        quadrant_xs, quadrant_ys = quadrant_coord(quadrant, cx, cy, xs[visible], ys[visible])
+        all_xs.append(quadrant_xs)
+        all_ys.append(quadrant_ys)
+    # too early stop of flat vertical ellipses
+    # finish tip of ellipse
+    tip = numpy.arange(y, ry)
+    all_xs += [numpy.repeat(cx, len(tip))] * 2
+    all_ys += [cy + tip, cy - tip]
+    return numpy.concatenate(all_xs), numpy.concatenate(all_ys)
+
+
 ###############################################################################
 # octant logic for CIRCLE
 
+def hidden_octants(oct0, coo0, oct1, coo1):
+    """ Return the octants outside a circle sector. """
+    if oct0 == -1:
+        return range(0,0)
+    elif oct0 < oct1 or oct0 == oct1 and octant_gte(oct0, coo1, coo0):
+        return range(0, oct0) + range(oct1+1, 8)
+    else:
+        return range(oct1+1, oct0)
+
 def get_octant(mbf, rx, ry):
     """ Get the circle octant for a given coordinate. """
     neg = mbf.neg
@@ -875,6 +1148,15 @@ def octant_gte(octant, y, coord):
 ###############################################################################
 # quadrant logic for CIRCLE
 
+def hidden_quadrants(qua0, x0, y0, qua1, x1, y1):
+    """ Return the quadrants outside an ellipse sector. """
+    if qua0 == -1:
+        return range(0,0)
+    elif qua0 < qua1 or qua0 == qua1 and quadrant_gte(qua0, x1, y1, x0, y0):
+        return range(0, qua0) + range(qua1+1, 4)
+    else:
+        return range(qua1+1,qua0)
+
 def quadrant_coord(quadrant, x0,y0, x,y):
     """ Return symmetrically reflected coordinates for a given pair. """
     if   quadrant == 3:     return x0+x, y0+y
@@ -884,26 +1166,15 @@ def quadrant_coord(quadrant, x0,y0, x,y):
 
 def quadrant_gt(quadrant, x, y, x0, y0):
     """ Return whether y is further along the ellipse than coord. """
+    # bitwise operators so that this also works elementwise on numpy arrays
     if quadrant%2 == 0:
-        if y != y0:
-            return y > y0
-        else:
-            return x < x0
+        return (y > y0) | ((y == y0) & (x < x0))
     else:
-        if y != y0:
-            return y < y0
-        else:
-            return x > x0
+        return (y < y0) | ((y == y0) & (x > x0))
 
 def quadrant_gte(quadrant, x, y, x0, y0):
     """ Return whether y is further along the ellipse than coord, or equal. """
     if quadrant%2 == 0:
-        if y != y0:
-            return y > y0
-        else:
-            return x <= x0
+        return (y > y0) | ((y == y0) & (x <= x0))
     else:
-        if y != y0:
-            return y < y0
-        else:
-            return x >= x0
+        return (y < y0) | ((y == y0) & (x >= x0))
@@ -59,7 +59,7 @@ class GWBasic2Python(object):
         """ Read local variables """
 
         # Single variables
-        for v in state.basic_state.variables:
+        for v, _ in var.get_var_list():
             v_val = self.type_converter(var.get_var(v))
             v = self.name_converter(v)
             dictionary[v] = v_val
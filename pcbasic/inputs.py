@@ -208,7 +208,8 @@ class Keyboard(object):
 
     def get_char(self):
         """ Read any keystroke, nonblocking. """
-        backend.wait()
+        backend.check_events()
+        backend.idle(self.buf.is_empty())
         return self.buf.getc()
 
     def wait_char(self):
@@ -482,7 +482,7 @@ def get_data_memory_var(address):
         offset = address - var_addr
         if offset >= var.byte_size[the_var[-1]]:
             return -1
-        var_rep = state.basic_state.variables[the_var]
+        var_rep = var.get_var_buffer(the_var)
         return var_rep[offset]
     else:
         offset = address - name_addr
@@ -523,10 +523,9 @@ def get_data_memory_string(address):
     # find the variable we're in
     str_nearest = -1
     the_var = None
-    for name in state.basic_state.variables:
+    for name, v in var.get_var_list():
         if name[-1] != '$':
             continue
-        v = state.basic_state.variables[name]
         str_try = state.basic_state.strings.address(v)
         if str_try <= address and str_try > str_nearest:
             str_nearest = str_try
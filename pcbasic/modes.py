@@ -385,43 +385,42 @@ class TextMode(VideoMode):
     def get_memory(self, addr, num_bytes):
         """ Retrieve bytes from textmode video memory. """
         addr -= self.video_segment*0x10
-        bytes = [0]*num_bytes
-        for i in xrange(num_bytes):
-            page = (addr+i) // self.page_size
-            offset = (addr+i) % self.page_size
-            ccol = (offset % (self.width*2)) // 2
-            crow = offset // (self.width*2)
-            try:
-                c = self.screen.text.pages[page].row[crow].buf[ccol][(addr+i)%2]
-                bytes[i] = c if (addr+i)%2==1 else ord(c)
-            except IndexError:
-                pass
+        bytes = bytearray(num_bytes)
+        for page, crow, start, ofs, length in self.walk_rows(addr, num_bytes):
+            therow = self.screen.text.pages[page].row[crow]
+            # characters in even bytes, attributes in odd bytes
+            row_bytes = bytearray(self.width*2)
+            row_bytes[0::2], row_bytes[1::2] = therow.chars, therow.attrs
+            bytes[ofs:ofs+length] = row_bytes[start:start+length]
         return bytes
 
     def set_memory(self, addr, bytes):
         """ Set bytes in textmode video memory. """
         addr -= self.video_segment*0x10
-        last_row = -1
-        for i in xrange(len(bytes)):
-            page = (addr+i) // self.page_size
-            offset = (addr+i) % self.page_size
-            ccol = (offset % (self.width*2)) // 2
-            crow = offset // (self.width*2)
-            try:
-                c, a = self.screen.text.pages[page].row[crow].buf[ccol]
-                if (addr+i)%2 == 0:
-                    c = chr(bytes[i])
-                else:
-                    a = bytes[i]
-                self.screen.text.pages[page].put_char_attr(crow+1, ccol+1, c, a, one_only=False)
-                if last_row >= 0 and last_row != crow:
-                    # set for_keys to true to avoid echoing to text terminal
-                    self.screen.refresh_range(page, last_row+1, 1, self.width, for_keys=True)
-            except IndexError:
-                pass
-            last_row = crow
-        if last_row >= 0 and last_row < 25 and page >= 0 and page < self.num_pages:
-            self.screen.refresh_range(page, last_row+1, 1, self.width, for_keys=True)
+        bytes = bytearray(bytes)
+        for page, crow, start, ofs, length in self.walk_rows(addr, len(bytes)):
+            therow = self.screen.text.pages[page].row[crow]
+            # extend to whole character cells
+            col0, col1 = start//2, (start+length+1)//2
+            cells = bytearray(2*(col1-col0))
+            cells[0::2], cells[1::2] = therow.chars[col0:col1], therow.attrs[col0:col1]
+            cells[start-2*col0:start-2*col0+length] = bytes[ofs:ofs+length]
+            self.screen.text.pages[page].put_chars_attrs(
+                                crow+1, col0+1, cells[0::2], cells[1::2])
+            # set for_keys to true to avoid echoing to text terminal
+            self.screen.refresh_range(page, crow+1, 1, self.width, for_keys=True)
+
+    def walk_rows(self, addr, num_bytes):
+        """ Yield the parts of a block of text memory on each screen row. """
+        row_size = self.width*2
+        ofs = 0
+        while ofs < num_bytes:
+            page, offset = divmod(addr+ofs, self.page_size)
+            crow, start = divmod(offset, row_size)
+            length = min(row_size-start, self.page_size-offset, num_bytes-ofs)
+            if 0 <= page < self.num_pages and crow < self.height:
+                yield page, crow, start, ofs, length
+            ofs += length
 
 
 # helper functions: convert between attribute lists and byte arrays
@@ -430,45 +429,19 @@ if numpy:
     def bytes_to_interval(bytes, pixels_per_byte, mask=1):
         """ Convert masked attributes packed into bytes to a scanline interval. """
         bpp = 8//pixels_per_byte
-        attrmask = (1<<bpp) - 1
-        bitval = numpy.array([128, 64, 32, 16, 8, 4, 2, 1], dtype=numpy.uint8)
-        bitmask = bitval[0::bpp]
-        for i in xrange(1, bpp):
-            bitmask |= bitval[i::bpp]
-        pre_mask = numpy.tile(bitmask, len(bytes))
-        post_shift = numpy.tile(
-                        numpy.array([7, 6, 5, 4, 3, 2, 1, 0])[(bpp-1)::bpp],
-                        len(bytes))
-        attrs = numpy.right_shift(
-                    numpy.repeat(numpy.array(bytes).astype(int),
-                                 pixels_per_byte) & pre_mask,
-                    post_shift) & attrmask
-        return numpy.array(attrs) * mask
+        bytes = numpy.array(bytearray(bytes), dtype=numpy.uint8)
+        # attributes are stored leftmost pixel in the most significant bits
+        shifts = numpy.arange(8-bpp, -1, -bpp)
+        attrs = (bytes[:, numpy.newaxis] >> shifts) & ((1<<bpp) - 1)
+        return attrs.ravel().astype(int) * mask
 
     def interval_to_bytes(colours, pixels_per_byte, plane=0):
         """ Convert a scanline interval into masked attributes packed into bytes. """
-        num_pixels = len(colours)
-        num_bytes, odd_out = divmod(num_pixels, pixels_per_byte)
-        if odd_out:
-            num_bytes += 1
         bpp = 8//pixels_per_byte
-        attrmask = (1<<bpp) - 1
-        colours = numpy.array(colours).astype(int)
-        if odd_out:
-            colours.resize(len(colours)+pixels_per_byte-odd_out)
-        shift = numpy.tile(numpy.array([7, 6, 5, 4, 3, 2, 1, 0])[(bpp-1)::bpp],
-                           num_bytes)
-        attrs = numpy.right_shift(colours, plane)
-        attrs = numpy.left_shift(attrs & attrmask, shift)
-        # below is much faster than:
-        #   return list([ sum(attrs[i:i+pixels_per_byte])
-        #                 for i in xrange(0, len(attrs), pixels_per_byte) ])
-        # and anything involving numpy.array_split or numpy.dot is even slower.
-        # numpy.roll is ok but this is the fastest I've found:
-        nattrs = attrs[0::pixels_per_byte]
-        for i in xrange(1, pixels_per_byte):
-            nattrs |= attrs[i::pixels_per_byte]
-        return list(nattrs)
+        attrs = (numpy.asarray(colours, dtype=int) >> plane) & ((1<<bpp) - 1)
+        bits = (attrs[:, numpy.newaxis] >> numpy.arange(bpp-1, -1, -1)) & 1
+        # packbits pads the last byte with zero bits
+        return bytearray(numpy.packbits(bits.astype(numpy.uint8)).tostring())
 
 else:
     def bytes_to_interval(bytes, pixels_per_byte, mask=1):
@@ -532,6 +505,64 @@ def walk_memory(self, addr, num_bytes, factor=1):
                 yield page, 0, y, ofs, row_size
         offset += row_size
 
+# single bytes (PEEK and POKE) are quicker to walk than to vectorise
+if numpy:
+    def block_coords(self, addr, num_bytes, factor=1):
+        """ Get page and coordinates of the first pixel of each byte in a block. """
+        # factor supports tandy-6 mode, which has 8 pixels per 2 bytes
+        offset = numpy.arange(num_bytes) + (int(addr) - self.video_segment*0x10)
+        page, offset = offset // self.page_size, offset % self.page_size
+        bank, offset = offset // self.bank_size, offset % self.bank_size
+        row, col = offset // self.bytes_per_row, offset % self.bytes_per_row
+        x = (col // factor) * factor * self.ppb
+        y = bank + self.interleave_times * row
+        valid = (page >= 0) & (page < self.num_pages) & (y < self.pixel_height)
+        return page, x, y, valid
+
+    def block_pixels(x, y, ppb):
+        """ Get coordinates of all pixels of each byte in a block. """
+        xs = x[:, numpy.newaxis] + numpy.arange(ppb)
+        return xs, numpy.repeat(y[:, numpy.newaxis], ppb, axis=1)
+
+    def block_select(sel):
+        """ Use a view rather than a copy if all bytes in a block are selected. """
+        return Ellipsis if sel.all() else sel
+
+    def get_memory_block(self, addr, num_bytes, planes=None, factor=1):
+        """ Retrieve a block of graphics memory, each byte from a given colour plane. """
+        page, x, y, valid = block_coords(self, addr, num_bytes, factor)
+        ppb = factor * self.ppb
+        xs, ys = block_pixels(x, y, ppb)
+        bytes = numpy.zeros(num_bytes, dtype=numpy.uint8)
+        for pagenum in numpy.unique(page[valid]):
+            sel = block_select(valid & (page == pagenum))
+            attrs = self.screen.get_pixels(xs[sel], ys[sel], pagenum)
+            if planes is not None:
+                attrs = attrs >> planes[sel, numpy.newaxis]
+            bytes[sel] = numpy.array(interval_to_bytes(attrs.ravel(), ppb))
+        return bytearray(bytes.tostring())
+
+    def set_memory_block(self, addr, bytes, masks=None, factor=1):
+        """ Set a block of graphics memory, each byte through a given colour plane mask. """
+        page, x, y, valid = block_coords(self, addr, len(bytes), factor)
+        ppb = factor * self.ppb
+        xs, ys = block_pixels(x, y, ppb)
+        attrs = bytes_to_interval(bytes, ppb).reshape(-1, ppb)
+        if masks is None:
+            for pagenum in numpy.unique(page[valid]):
+                sel = block_select(valid & (page == pagenum))
+                self.screen.put_pixels(xs[sel].ravel(), ys[sel].ravel(),
+                                       attrs[sel].ravel(), pagenum)
+            return
+        # bytes with different plane masks may cover the same pixels
+        for mask in numpy.unique(masks):
+            for pagenum in numpy.unique(page[valid & (masks == mask)]):
+                sel = block_select(valid & (masks == mask) & (page == pagenum))
+                old_attrs = self.screen.get_pixels(xs[sel], ys[sel], pagenum)
+                new_attrs = (old_attrs & ~mask) | ((attrs[sel] * mask) & mask)
+                self.screen.put_pixels(xs[sel].ravel(), ys[sel].ravel(),
+                                       new_attrs.ravel(), pagenum)
+
 def sprite_size_to_record_ega(self, dx, dy):
     """ Write 4-byte record of sprite size in EGA modes. """
     return vartypes.value_to_uint(dx) + vartypes.value_to_uint(dy)
@@ -542,45 +573,119 @@ def record_to_sprite_size_ega(self, byte_array):
     dy = vartypes.uint_to_value(byte_array[2:4])
     return dx, dy
 
-def sprite_to_array_ega(self, attrs, dx, dy, byte_array, offs):
-    """ Build the sprite byte array in EGA modes. """
-    # for EGA modes, sprites have 8 pixels per byte
-    # with colour planes in consecutive rows
-    # each new row is aligned on a new byte
-    #
-    # this is much faster for wide selections
-    # but for narrow selections storing in an array and indexing take longer
-    # than just getting each pixel separately
-    row_bytes = (dx+7) // 8
-    length = dy * self.bitsperpixel * row_bytes
-    if offs+length > len(byte_array):
-        raise ValueError('Sprite exceeds array byte size')
-    byte_array[offs:offs+length] = '\0'*length
-    for row in attrs:
-        for plane in range(self.bitsperpixel):
-            byte_array[offs:offs+row_bytes] = interval_to_bytes(row, 8, plane)
-            offs += row_bytes
-
-# elementwise OR, in-place if possible
 if numpy:
-    or_i = numpy.ndarray.__ior__
+    def sprite_to_array_ega(self, attrs, dx, dy, byte_array, offs):
+        """ Build the sprite byte array in EGA modes. """
+        # for EGA modes, sprites have 8 pixels per byte
+        # with colour planes in consecutive rows
+        # each new row is aligned on a new byte
+        row_bytes = (dx+7) // 8
+        length = dy * self.bitsperpixel * row_bytes
+        if offs+length > len(byte_array):
+            raise ValueError('Sprite exceeds array byte size')
+        byte_array[offs:offs+length] = '\0'*length
+        # split into planes along a new middle axis, then pack each plane row
+        planes = numpy.arange(self.bitsperpixel)[:, numpy.newaxis]
+        bits = (numpy.asarray(attrs, dtype=int)[:, numpy.newaxis, :] >> planes) & 1
+        packed = numpy.packbits(bits.astype(numpy.uint8), axis=2).tostring()
+        byte_array[offs:offs+len(packed)] = packed
+
+    def array_to_sprite_ega(self, byte_array, offset, dx, dy):
+        """ Build sprite from byte_array in EGA modes. """
+        row_bytes = (dx+7) // 8
+        length = dy * self.bitsperpixel * row_bytes
+        data = numpy.zeros(length, dtype=numpy.uint8)
+        packed = byte_array[offset:offset+length]
+        data[:len(packed)] = numpy.array(packed, dtype=numpy.uint8)
+        bits = numpy.unpackbits(
+                data.reshape(dy, self.bitsperpixel, row_bytes), axis=2)[:, :, :dx]
+        planes = numpy.arange(self.bitsperpixel)[:, numpy.newaxis]
+        return (bits.astype(int) << planes).sum(axis=1)
+
+    def sprite_to_array_cga(self, attrs, dx, dy, byte_array, offs):
+        """ Build the sprite byte array in CGA modes. """
+        bpp = self.bitsperpixel
+        row_bytes = (dx * bpp + 7) // 8
+        length = row_bytes*dy
+        if offs+length > len(byte_array):
+            raise ValueError('Sprite exceeds array byte size')
+        byte_array[offs:offs+length] = '\0'*length
+        # colour bits are packed consecutively, most significant first
+        attrs = numpy.asarray(attrs, dtype=int)
+        shifts = numpy.arange(bpp-1, -1, -1)
+        bits = (attrs[:, :, numpy.newaxis] >> shifts) & 1
+        bits = bits.astype(numpy.uint8).reshape(attrs.shape[0], attrs.shape[1]*bpp)
+        packed = numpy.packbits(bits, axis=1).tostring()
+        byte_array[offs:offs+len(packed)] = packed
+
+    def array_to_sprite_cga(self, byte_array, offset, dx, dy):
+        """ Build sprite from byte_array in CGA modes. """
+        bpp = self.bitsperpixel
+        row_bytes = (dx * bpp + 7) // 8
+        data = numpy.zeros(row_bytes*dy, dtype=numpy.uint8)
+        packed = byte_array[offset:offset+row_bytes*dy]
+        data[:len(packed)] = numpy.array(packed, dtype=numpy.uint8)
+        bits = numpy.unpackbits(data.reshape(dy, row_bytes), axis=1)[:, :dx*bpp]
+        return bits.reshape(dy, dx, bpp).dot(1 << numpy.arange(bpp-1, -1, -1))
+
 else:
+    # elementwise OR
     def or_i(list0, list1):
         return [ x | y for x, y in zip(list0, list1) ]
 
-def array_to_sprite_ega(self, byte_array, offset, dx, dy):
-    """ Build sprite from byte_array in EGA modes. """
-    row_bytes = (dx+7) // 8
-    attrs = []
-    for y in range(dy):
-        row = bytes_to_interval(byte_array[offset:offset+row_bytes], 8, 1)
-        offset += row_bytes
-        for plane in range(1, self.bitsperpixel):
-            row = or_i(row, bytes_to_interval(
+    def sprite_to_array_ega(self, attrs, dx, dy, byte_array, offs):
+        """ Build the sprite byte array in EGA modes. """
+        # for EGA modes, sprites have 8 pixels per byte
+        # with colour planes in consecutive rows
+        # each new row is aligned on a new byte
+        row_bytes = (dx+7) // 8
+        length = dy * self.bitsperpixel * row_bytes
+        if offs+length > len(byte_array):
+            raise ValueError('Sprite exceeds array byte size')
+        byte_array[offs:offs+length] = '\0'*length
+        for row in attrs:
+            for plane in range(self.bitsperpixel):
+                byte_array[offs:offs+row_bytes] = interval_to_bytes(row, 8, plane)
+                offs += row_bytes
+
+    def array_to_sprite_ega(self, byte_array, offset, dx, dy):
+        """ Build sprite from byte_array in EGA modes. """
+        row_bytes = (dx+7) // 8
+        attrs = []
+        for y in range(dy):
+            row = bytes_to_interval(byte_array[offset:offset+row_bytes], 8, 1)
+            offset += row_bytes
+            for plane in range(1, self.bitsperpixel):
+                row = or_i(row, bytes_to_interval(
                             byte_array[offset:offset+row_bytes], 8, 1 << plane))
+                offset += row_bytes
+            attrs.append(row[:dx])
+        return attrs
+
+    def sprite_to_array_cga(self, attrs, dx, dy, byte_array, offs):
+        """ Build the sprite byte array in CGA modes. """
+        row_bytes = (dx * self.bitsperpixel + 7) // 8
+        length = row_bytes*dy
+        if offs+length > len(byte_array):
+            # NOTE: if we use memoryviews instead of bytearrays, we won't need
+            # this check as the assignment will fail with ValueError anyway
+            raise ValueError('Sprite exceeds array byte size')
+        byte_array[offs:offs+length] = '\0'*length
+        for row in attrs:
+            byte_array[offs:offs+row_bytes] = interval_to_bytes(
+                                                row, 8//self.bitsperpixel, 0)
+            offs += row_bytes
+
+    def array_to_sprite_cga(self, byte_array, offset, dx, dy):
+        """ Build sprite from byte_array in CGA modes. """
+        row_bytes = (dx * self.bitsperpixel + 7) // 8
+        attrs = []
+        for y in range(dy):
+            row = bytes_to_interval(byte_array[offset:offset+row_bytes],
+                                      8//self.bitsperpixel, 1)
             offset += row_bytes
-        attrs.append(row[:dx])
-    return attrs
+            attrs.append(row[:dx])
+        return attrs
 
 def build_tile_cga(self, pattern):
     """ Build a flood-fill tile for CGA screens. """
@@ -678,12 +783,17 @@ class CGAMode(GraphicsMode):
 
     def set_memory(self, addr, bytes):
         """ Set bytes in CGA memory. """
+        if numpy and len(bytes) > 1:
+            set_memory_block(self, addr, bytes)
+            return
         for page, x, y, ofs, length in walk_memory(self, addr, len(bytes)):
             self.screen.put_interval(page, x, y,
                 bytes_to_interval(bytes[ofs:ofs+length], self.ppb))
 
     def get_memory(self, addr, num_bytes):
         """ Retrieve bytes from CGA memory. """
+        if numpy and num_bytes > 1:
+            return get_memory_block(self, addr, num_bytes)
         bytes = bytearray(num_bytes)
         for page, x, y, ofs, length in walk_memory(self, addr, num_bytes):
             bytes[ofs:ofs+length] = interval_to_bytes(
@@ -700,31 +810,8 @@ class CGAMode(GraphicsMode):
         dy = vartypes.uint_to_value(byte_array[2:4])
         return dx, dy
 
-    def sprite_to_array(self, attrs, dx, dy, byte_array, offs):
-        """ Build the sprite byte array. """
-        row_bytes = (dx * self.bitsperpixel + 7) // 8
-        length = row_bytes*dy
-        if offs+length > len(byte_array):
-            # NOTE: if we use memoryviews instead of bytearrays, we won't need
-            # this check as the assignment will fail with ValueError anyway
-            raise ValueError('Sprite exceeds array byte size')
-        byte_array[offs:offs+length] = '\0'*length
-        for row in attrs:
-            byte_array[offs:offs+row_bytes] = interval_to_bytes(
-                                                row, 8//self.bitsperpixel, 0)
-            offs += row_bytes
-
-    def array_to_sprite(self, byte_array, offset, dx, dy):
-        """ Build sprite from byte_array. """
-        row_bytes = (dx * self.bitsperpixel + 7) // 8
-        # illegal fn call if outside screen boundary
-        attrs = []
-        for y in range(dy):
-            row = bytes_to_interval(byte_array[offset:offset+row_bytes],
-                                      8//self.bitsperpixel, 1)
-            offset += row_bytes
-            attrs.append(row[:dx])
-        return attrs
+    sprite_to_array = sprite_to_array_cga
+    array_to_sprite = array_to_sprite_cga
 
     build_tile = build_tile_cga
 
@@ -780,6 +867,9 @@ class EGAMode(GraphicsMode):
         bytes = bytearray(num_bytes)
         if plane not in self.planes_used:
             return bytes
+        if numpy and num_bytes > 1:
+            return get_memory_block(self, addr, num_bytes,
+                                    numpy.full(num_bytes, plane, dtype=int))
         for page, x, y, ofs, length in walk_memory(self, addr, num_bytes):
             bytes[ofs:ofs+length] = interval_to_bytes(
                 self.screen.get_interval(page, x, y, length*self.ppb),
@@ -796,6 +886,10 @@ class EGAMode(GraphicsMode):
         # return immediately for unused colour planes
         if mask == 0:
             return
+        if numpy and len(bytes) > 1:
+            set_memory_block(self, addr, bytes,
+                             numpy.full(len(bytes), mask, dtype=int))
+            return
         for page, x, y, ofs, length in walk_memory(self, addr, len(bytes)):
             self.screen.put_interval(page, x, y,
                 bytes_to_interval(bytes[ofs:ofs+length], self.ppb, mask), mask)
@@ -857,6 +951,9 @@ class Tandy6Mode(GraphicsMode):
         """ Retrieve bytes from Tandy 640x200x4 """
         # 8 pixels per 2 bytes
         # low attribute bits stored in even bytes, high bits in odd bytes.
+        if numpy and num_bytes > 1:
+            planes = numpy.arange(addr, addr+num_bytes) % 2
+            return get_memory_block(self, addr, num_bytes, planes, 2)
         half_len = (num_bytes+1) // 2
         hbytes = bytearray(half_len), bytearray(half_len)
         for parity in (0, 1):
@@ -869,9 +966,13 @@ class Tandy6Mode(GraphicsMode):
 
     def set_memory(self, addr, bytes):
         """ Set bytes in Tandy 640x200x4 memory. """
-        hbytes = bytes[0::2], bytes[1::2]
         # Tandy-6 encodes 8 pixels per byte, alternating colour planes.
         # I.e. even addresses are 'colour plane 0', odd ones are 'plane 1'
+        if numpy and len(bytes) > 1:
+            masks = 1 << (numpy.arange(addr, addr+len(bytes)) % 2)
+            set_memory_block(self, addr, bytes, masks, 2)
+            return
+        hbytes = bytes[0::2], bytes[1::2]
         for parity in (0, 1):
             mask = 2 ** (parity^(addr%2))
             for page, x, y, ofs, length in walk_memory(self, addr, len(bytes), 2):
@@ -879,8 +980,14 @@ class Tandy6Mode(GraphicsMode):
                     bytes_to_interval(hbytes[parity][ofs:ofs+length], 2*self.ppb, mask),
                     mask)
 
-    sprite_to_array = sprite_to_array_ega
-    array_to_sprite = array_to_sprite_ega
+    def sprite_to_array(self, attrs, dx, dy, byte_array, offs):
+        """ Build the sprite byte array. """
+        # sprites are twice as wide as recorded
+        sprite_to_array_ega(self, attrs, 2*dx, dy, byte_array, offs)
+
+    def array_to_sprite(self, byte_array, offset, dx, dy):
+        """ Build sprite from byte_array. """
+        return array_to_sprite_ega(self, byte_array, offset, 2*dx, dy)
 
     sprite_size_to_record = sprite_size_to_record_ega
     record_to_sprite_size = record_to_sprite_size_ega
@@ -6,6 +6,8 @@ Program buffer utilities
 This file is released under the GNU GPL version 3.
 """
 
+import bisect
+
 import config
 import error
 import vartypes
@@ -17,6 +19,7 @@ import console
 import state
 import flow
 import memory
+import codecache
 import logging
 # ensure initialisation of state_console_state.sound
 import sound
@@ -55,8 +58,10 @@ def erase_program():
     state.basic_state.bytecode.write('\0\0\0')
     state.basic_state.protected = False
     state.basic_state.line_numbers = { 65536: 0 }
+    rebuild_line_index()
     state.basic_state.current_statement = 0
     state.basic_state.last_stored = None
+    codecache.invalidate()
     # reset stacks
     flow.init_program()
 
@@ -66,8 +71,26 @@ def truncate_program(rest=''):
     # cut off at current position
     state.basic_state.bytecode.truncate()
 
+def rebuild_line_index():
+    """ Build the sorted line number index from the line number dictionary. """
+    # sorted line numbers and their code offsets, in the same order
+    state.basic_state.line_index = sorted(state.basic_state.line_numbers)
+    state.basic_state.line_index_offsets = [state.basic_state.line_numbers[linum]
+                                    for linum in state.basic_state.line_index]
+    check_line_order()
+
+def check_line_order():
+    """ Check if code offsets increase with line numbers. """
+    offsets = state.basic_state.line_index_offsets
+    state.basic_state.lines_in_order = all(
+                offsets[i] < offsets[i+1] for i in xrange(len(offsets)-1))
+
 def get_line_number(pos):
     """ Get line number for stream position. """
+    if state.basic_state.lines_in_order:
+        i = bisect.bisect_right(state.basic_state.line_index_offsets, pos)
+        return state.basic_state.line_index[i-1] if i else -1
+    # lines have been stored out of order, e.g. by POKE or binary LOAD
     pre = -1
     for linum in state.basic_state.line_numbers:
         linum_pos = state.basic_state.line_numbers[linum]
@@ -103,6 +126,8 @@ def rebuild_line_dict():
         last = pos
     # ensure program is properly sealed - last offset must be 00 00. keep, but ignore, anything after.
     state.basic_state.bytecode.write('\0\0\0')
+    rebuild_line_index()
+    codecache.invalidate()
 
 def update_line_dict(pos, afterpos, length, deleteable, beyond):
     """ Update line number dictionary after deleting lines. """
@@ -124,6 +149,15 @@ def update_line_dict(pos, afterpos, length, deleteable, beyond):
         del state.basic_state.line_numbers[key]
     for key in beyond:
         state.basic_state.line_numbers[key] += length
+    # update line number index; deleteable lines come right before beyond
+    start = bisect.bisect_left(state.basic_state.line_index, beyond[0])
+    offsets = state.basic_state.line_index_offsets
+    offsets[start:] = [offset + length for offset in offsets[start:]]
+    del state.basic_state.line_index[start-len(deleteable):start]
+    del offsets[start-len(deleteable):start]
+    if not state.basic_state.lines_in_order:
+        check_line_order()
+    codecache.invalidate()
 
 def check_number_start(linebuf):
     """ Check if the given line buffer starts with a line number. """
@@ -168,26 +202,33 @@ def store_line(linebuf):
     update_line_dict(pos, afterpos, length, deleteable, beyond)
     if not empty:
         state.basic_state.line_numbers[scanline] = pos
+        i = bisect.bisect_left(state.basic_state.line_index, scanline)
+        state.basic_state.line_index.insert(i, scanline)
+        state.basic_state.line_index_offsets.insert(i, pos)
+        if not state.basic_state.lines_in_order:
+            check_line_order()
     # clear all program stacks
     flow.init_program()
     state.basic_state.last_stored = scanline
 
 def find_pos_line_dict(fromline, toline):
     """ Find code positions for line range. """
-    deleteable = [ num for num in state.basic_state.line_numbers if num >= fromline and num <= toline ]
-    beyond = [num for num in state.basic_state.line_numbers if num > toline ]
+    index = state.basic_state.line_index
+    first = bisect.bisect_left(index, fromline)
+    after = bisect.bisect_right(index, toline)
+    deleteable, beyond = index[first:after], index[after:]
     # find lowest number strictly above range
-    afterpos = state.basic_state.line_numbers[min(beyond)]
+    afterpos = state.basic_state.line_numbers[beyond[0]]
     # find lowest number within range
-    try:
-        startpos = state.basic_state.line_numbers[min(deleteable)]
-    except ValueError:
+    if deleteable:
+        startpos = state.basic_state.line_numbers[deleteable[0]]
+    else:
         startpos = afterpos
     return startpos, afterpos, deleteable, beyond
 
 def delete(fromline, toline):
     """ Delete range of lines from stored program. """
-    fromline = fromline if fromline is not None else min(state.basic_state.line_numbers)
+    fromline = fromline if fromline is not None else state.basic_state.line_index[0]
     toline = toline if toline is not None else 65535
     startpos, afterpos, deleteable, beyond = find_pos_line_dict(fromline, toline)
     if not deleteable:
@@ -236,7 +277,8 @@ def renum(new_line, start_line, step):
     start_line = 0 if start_line is None else start_line
     step = 10 if step is None else step
     # get a sorted list of line numbers
-    keys = sorted([ k for k in state.basic_state.line_numbers.keys() if k >= start_line])
+    first = bisect.bisect_left(state.basic_state.line_index, start_line)
+    keys = state.basic_state.line_index[first:]
     # assign the new numbers
     old_to_new = {}
     for old_line in keys:
@@ -274,6 +316,12 @@ def renum(new_line, start_line, step):
         new_lines[old_to_new[old_line]] = state.basic_state.line_numbers[old_line]
         del state.basic_state.line_numbers[old_line]
     state.basic_state.line_numbers.update(new_lines)
+    # renumbered lines keep their order, but may now sort before earlier lines
+    state.basic_state.line_index[first:] = [old_to_new.get(linum, linum)
+                                            for linum in keys]
+    if first and keys and state.basic_state.line_index[first-1] >= state.basic_state.line_index[first]:
+        rebuild_line_index()
+    codecache.invalidate()
     # stop running if we were
     flow.set_pointer(False)
     # reset loop stacks
@@ -306,6 +354,8 @@ def load(g):
         # assume ASCII file
         # anything but numbers or whitespace: Direct Statement in File
         merge(g)
+        # store_line has kept line number dict and offsets up to date
+        return
     # rebuild line number dict and offsets
     rebuild_line_dict()
 
@@ -368,9 +418,9 @@ def list_lines(from_line, to_line):
     if to_line is None:
         to_line = max_list_line
     # sort by positions, not line numbers!
-    listable = sorted([ state.basic_state.line_numbers[num]
-                            for num in state.basic_state.line_numbers
-                            if num >= from_line and num <= to_line ])
+    listable = sorted(state.basic_state.line_index_offsets[
+                bisect.bisect_left(state.basic_state.line_index, from_line):
+                bisect.bisect_right(state.basic_state.line_index, to_line)])
     lines = []
     for pos in listable:
         state.basic_state.bytecode.seek(pos + 1)
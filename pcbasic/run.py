@@ -54,7 +54,7 @@ def run_once():
             if state.basic_state.execute_mode:
                 try:
                     # may raise Break
-                    backend.check_events()
+                    backend.poll_events()
                     handle_basic_events()
                     if not statements.parse_statement():
                         state.basic_state.execute_mode = False
@@ -73,6 +73,7 @@ audio_backends = {
     'curses': ('none',),
     'pygame': ('pygame', 'none'),
     'sdl2': ('sdl2', 'none'),
+    'headless': ('none',),
     }
 
 def init_audio_plugin(interface_name):
@@ -8,6 +8,9 @@ This file is released under the GNU GPL version 3.
 
 import os
 import logging
+import hashlib
+import struct
+from array import array
 
 try:
     import numpy
@@ -23,11 +26,27 @@ def prepare():
     global debug
     debug = config.get('debug')
 
+# compiled font cache: magic and format version, followed by the cache key
+cache_magic = 'PCBASIC FONT CACHE 1\x1a'
+# height and number of glyphs, in native byte order
+cache_header = struct.Struct('=HI')
+
 def load_fonts(font_families, heights_needed, unicode_needed, substitutes):
     """ Load font typefaces. """
     fonts = {}
+    file_hashes = {}
     # load fonts, height-16 first
     for height in reversed(sorted(heights_needed)):
+        # missing glyphs are taken from the 16-pixel font, so its files are in the key
+        cache_file, key = _cache_key(font_families, height,
+                list(_font_filenames(font_families, height)) +
+                list(_font_filenames(font_families, 16)),
+                unicode_needed, substitutes, file_hashes)
+        # in debug mode, always parse the fonts to get warnings for missing glyphs
+        font = None if debug else _load_cache(cache_file, key)
+        if font:
+            fonts[height] = font
+            continue
         # load a Unifont .hex font and take the codepage subset
         fonts[height] = Font(height).load_hex(
             _font_filenames(font_families, height),
@@ -41,6 +60,8 @@ def load_fonts(font_families, heights_needed, unicode_needed, substitutes):
                 unicode_needed, substitutes, warn=False)
         if font_16:
             fonts[height].fix_missing(unicode_needed, font_16)
+        if key:
+            _save_cache(cache_file, key, fonts[height])
     return fonts
 
 def _font_filenames(families, height, ext='hex'):
@@ -49,6 +70,74 @@ def _font_filenames(families, height, ext='hex'):
     return (name if os.path.exists(name) else os.path.join(plat.font_dir, name)
                 for name in names)
 
+def _cache_key(families, height, filenames, unicode_needed, substitutes, file_hashes):
+    """ Return cache file name and key for a font height and codepage subset. """
+    filenames = [name for name in filenames if os.path.exists(name)]
+    if not filenames:
+        return None, None
+    # the codepage is represented by the glyphs it needs
+    subset = repr((sorted(unicode_needed), sorted(substitutes.iteritems())))
+    subset_hash = hashlib.sha1(subset).hexdigest()
+    key = hashlib.sha1('%s:%d:%s' % (cache_magic, height, subset_hash))
+    for name in filenames:
+        if name not in file_hashes:
+            try:
+                with open(name, 'rb') as f:
+                    file_hashes[name] = hashlib.sha1(f.read()).hexdigest()
+            except EnvironmentError:
+                return None, None
+        key.update(':%s:%s' % (os.path.basename(name), file_hashes[name]))
+    cache_file = os.path.join(plat.state_path, 'fonts', '%s_%02d_%s.fnt' % (
+                              '_'.join(families), height, subset_hash[:8]))
+    return cache_file, key.hexdigest()
+
+def _load_cache(cache_file, key):
+    """ Load a font from the compiled font cache; return None if not available. """
+    try:
+        # read the whole atlas at once
+        with open(cache_file, 'rb') as f:
+            data = f.read()
+        start = len(cache_magic) + len(key)
+        if data[:start] != cache_magic + key:
+            return None
+        height, count = cache_header.unpack_from(data, start)
+        start += cache_header.size
+        # lengths of the utf-8 grapheme clusters and of their glyphs
+        lengths = array('H')
+        lengths.fromstring(data[start:start+4*count])
+        start += 4*count
+        keys_end = start + sum(lengths[:count])
+        if keys_end + sum(lengths[count:]) != len(data):
+            return None
+        fontdict = {}
+        key_start, glyph_start = start, keys_end
+        for key_len, glyph_len in zip(lengths[:count], lengths[count:]):
+            c = data[key_start:key_start+key_len].decode('utf-8')
+            fontdict[c] = data[glyph_start:glyph_start+glyph_len]
+            key_start += key_len
+            glyph_start += glyph_len
+        return Font(height, fontdict)
+    except (EnvironmentError, ValueError, struct.error):
+        return None
+
+def _save_cache(cache_file, key, font):
+    """ Store a font in the compiled font cache. """
+    clusters = [c.encode('utf-8') for c in font.fontdict]
+    glyphs = font.fontdict.values()
+    try:
+        if not os.path.isdir(os.path.dirname(cache_file)):
+            os.makedirs(os.path.dirname(cache_file))
+        with open(cache_file, 'wb') as f:
+            f.write(cache_magic + key)
+            f.write(cache_header.pack(font.height, len(clusters)))
+            f.write(array('H', [len(c) for c in clusters] +
+                               [len(g) for g in glyphs]).tostring())
+            f.write(''.join(clusters))
+            f.write(''.join(glyphs))
+    except EnvironmentError as e:
+        logging.debug('Could not write font cache %s: %s', cache_file, e)
+
+
 class Font(object):
     """ Single-height bitfont. """
 
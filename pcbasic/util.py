@@ -137,6 +137,10 @@ def parse_jumpnum(ins, allow_empty=False, err=error.STX):
 
 def get_var_name(ins, allow_empty=False, err=error.STX):
     """ Get variable name from token stream. """
+    return complete_var_name(read_var_name(ins, allow_empty, err))
+
+def read_var_name(ins, allow_empty=False, err=error.STX):
+    """ Read variable name from token stream, without completing its type. """
     name = ''
     d = skip_white_read(ins)
     if not d:
@@ -154,7 +158,10 @@ def get_var_name(ins, allow_empty=False, err=error.STX):
             ins.seek(-len(d), 1)
     if not name and not allow_empty:
         raise error.RunError(err)
-    # append type specifier
+    return name
+
+def complete_var_name(name):
+    """ Append the type specifier to a variable name and normalise it. """
     name = vartypes.complete_name(name)
     # only the first 40 chars are relevant in GW-BASIC, rest is discarded
     if len(name) > 41:
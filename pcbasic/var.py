@@ -7,6 +7,7 @@ This file is released under the GNU GPL version 3.
 """
 
 from operator import itemgetter
+import timeit
 
 import error
 import vartypes
@@ -18,18 +19,36 @@ byte_size = {'$': 5, '%': 2, '!': 4, '#': 8}
 
 def prepare():
     """ Initialise the var module """
+    # symbol table for scalar variables: full name -> slot number
+    # slots are never released, so that pre-parsed code can keep its slot numbers
+    state.basic_state.var_slots = {}
+    # full variable name for each slot
+    state.basic_state.var_names = []
     clear_variables()
 
 class StringSpace(object):
     """ String space is a table of strings accessible by their 2-byte pointers. """
 
+    # owners are not known for string spaces saved without the reverse index
+    unindexed = False
+
     def __init__(self):
         """ Initialise empty string space. """
         self.clear()
 
+    def __setstate__(self, st):
+        """ Unpickle; string spaces saved without owners are indexed on the next collection. """
+        self.__dict__.update(st)
+        if 'owners' not in st:
+            self.owners = {}
+            self.unindexed = True
+
     def clear(self):
         """ Empty string space. """
         self.strings = {}
+        # reverse index: where the pointer to each string was stored
+        # (array name, byte offset) for array elements, (None, slot) for scalars
+        self.owners = {}
         # strings are placed at the top of string memory, just below the stack
         self.current = memory.stack_start()
 
@@ -48,7 +67,7 @@ class StringSpace(object):
         """ Return a packed copy of the string by its 2-byte key or 3-byte sequence. """
         return vartypes.pack_string(self.retrieve(key)[:])
 
-    def store(self, string_buffer, address=None):
+    def store(self, string_buffer, address=None, owner=None):
         """ Store a new string and return the 3-byte memory sequence. """
         # don't store overlong strings
         if len(string_buffer) > 255:
@@ -65,8 +84,16 @@ class StringSpace(object):
             if key in self.strings:
                 raise KeyError('String key %s at %d already defined.' % (repr(key), address))
             self.strings[key] = string_buffer
+            self.owners[key] = owner
         return bytearray(chr(len(string_buffer)) + key)
 
+    def claim(self, sequence, owner):
+        """ Record a new location for the pointer to a stored string. """
+        key = str(sequence[-4:])
+        # empty strings carry the address of the last stored string, but don't own it
+        if sequence[0] and key in self.owners:
+            self.owners[key] = owner
+
     def address(self, key):
         """ Return the address of a given key. """
         return struct.unpack('i', key[-4:])
@@ -102,10 +129,9 @@ def clear_variables(preserve_common=False, preserve_all=False, preserve_deftype=
             # preserve COMMON variables (CHAIN does this)
             common, common_arrays, common_strings = {}, {}, {}
             for varname in state.basic_state.common_names:
-                try:
-                    common[varname] = state.basic_state.variables[varname]
-                except KeyError:
-                    pass
+                value = get_var_buffer(varname)
+                if value is not None:
+                    common[varname] = value
             for varname in state.basic_state.common_array_names:
                 try:
                     common_arrays[varname] = state.basic_state.arrays[varname]
@@ -121,7 +147,8 @@ def clear_variables(preserve_common=False, preserve_all=False, preserve_deftype=
             state.basic_state.common_array_names = []
         # restore only common variables
         # this is a re-assignment which is not FOR-safe; but clear_variables is only called in CLEAR which also clears the FOR stack
-        state.basic_state.variables = {}
+        # value buffer for each slot, None if the variable does not exist
+        state.basic_state.var_values = [None] * len(state.basic_state.var_names)
         state.basic_state.arrays = {}
         state.basic_state.var_memory = {}
         state.basic_state.array_memory = {}
@@ -136,10 +163,11 @@ def clear_variables(preserve_common=False, preserve_all=False, preserve_deftype=
         # use set_var and dim_array to rebuild memory model
         for v in common:
             if v[-1] == '$':
-                state.basic_state.variables[v] = (
+                slot = get_slot(v)
+                state.basic_state.var_values[slot] = (
                     new_strings.store(bytearray(vartypes.unpack_string(
                         get_string_copy_packed(common[v])
-                    ))))
+                    )), owner=(None, slot)))
             else:
                 set_var(v, (v[-1], common[v]))
         for a in common_arrays:
@@ -149,15 +177,56 @@ def clear_variables(preserve_common=False, preserve_all=False, preserve_deftype=
                 for i in range(0, len(common_arrays[a][1]), byte_size['$']):
                     s += (new_strings.store(bytearray(vartypes.unpack_string(
                         get_string_copy_packed(common_arrays[a][1][i+1:i+byte_size['$']])
-                    ))))
+                    )), owner=(a, i)))
                 state.basic_state.arrays[a][1] = s
             else:
                 state.basic_state.arrays[a] = common_arrays[a]
         state.basic_state.strings = new_strings
 
+def convert_variables():
+    """ Move the variables of a state saved with a name-keyed dict into slots. """
+    try:
+        variables = state.basic_state.variables
+    except AttributeError:
+        return
+    del state.basic_state.variables
+    # allocate slots in the order the variables were created in memory
+    names = sorted(variables, key=lambda name: state.basic_state.var_memory.get(name))
+    state.basic_state.var_names = names
+    state.basic_state.var_slots = dict((name, slot) for slot, name in enumerate(names))
+    state.basic_state.var_values = [variables[name] for name in names]
+
+def get_slot(name):
+    """ Return the slot number of a full variable name, allocating a new slot if needed. """
+    try:
+        return state.basic_state.var_slots[name]
+    except KeyError:
+        slot = len(state.basic_state.var_names)
+        state.basic_state.var_slots[name] = slot
+        state.basic_state.var_names.append(name)
+        state.basic_state.var_values.append(None)
+        return slot
+
+def get_var_buffer(name):
+    """ Return the value buffer of a full variable name, or None if it does not exist. """
+    try:
+        return state.basic_state.var_values[state.basic_state.var_slots[name]]
+    except KeyError:
+        return None
+
+def get_var_list():
+    """ Return a list of (name, value buffer) for all existing variables. """
+    return [(name, value) for name, value in
+            zip(state.basic_state.var_names, state.basic_state.var_values)
+            if value is not None]
+
 def set_var(name, value):
     """ Assign a value to a variable. """
-    name = vartypes.complete_name(name)
+    set_slot(get_slot(vartypes.complete_name(name)), value)
+
+def set_slot(slot, value):
+    """ Assign a value to the variable in a given slot. """
+    name = state.basic_state.var_names[slot]
     type_char = name[-1]
     # check if garbage needs collecting before allocating mem
     size = (max(5, len(name)) + 1 + byte_size[type_char])
@@ -169,45 +238,60 @@ def set_var(name, value):
         collect_garbage()
         if fre() <= size:
             raise error.RunError(error.OUT_OF_MEMORY)
+    values = state.basic_state.var_values
+    current = values[slot]
     # assign variables
     if type_char == '$':
         # every assignment to string leads to new pointer being allocated
         # TODO: string literals in programs have the var ptr point to program space.
-        state.basic_state.variables[name] = state.basic_state.strings.store(bytearray(unpacked[:]))
-    else:
+        values[slot] = state.basic_state.strings.store(
+                                bytearray(unpacked[:]), owner=(None, slot))
+    elif current is not None:
         # make a copy of the value in case we want to use POKE on it - we would change both values otherwise
         # NOTE: this is an in-place copy - crucial for FOR!
-        try:
-            state.basic_state.variables[name][:] = vartypes.pass_type_keep(name[-1], value)[1][:]
-        except KeyError:
-            state.basic_state.variables[name] = vartypes.pass_type_keep(name[-1], value)[1][:]
+        current[:] = vartypes.pass_type_keep(type_char, value)[1]
+        return
+    else:
+        values[slot] = vartypes.pass_type_keep(type_char, value)[1][:]
     # update memory model
     # first two bytes: chars of name or 0 if name is one byte long
     if name not in state.basic_state.var_memory:
         name_ptr = state.basic_state.var_current
         var_ptr = name_ptr + max(5, len(name)) + 1 # byte_size first_letter second_letter_or_nul remaining_length_or_nul
-        state.basic_state.var_current += max(5, len(name)) + 1 + byte_size[name[-1]]
+        state.basic_state.var_current += max(5, len(name)) + 1 + byte_size[type_char]
         state.basic_state.var_memory[name] = (name_ptr, var_ptr)
 
 def get_var(name):
     """ Retrieve the value of a variable. """
     name = vartypes.complete_name(name)
     try:
-        if name[-1] == '$':
-            return get_string_copy_packed(state.basic_state.variables[name])
-        else:
-            return (name[-1], state.basic_state.variables[name])
+        slot = state.basic_state.var_slots[name]
     except KeyError:
         return vartypes.null[name[-1]]
+    return get_slot_value(slot)
+
+def get_slot_value(slot):
+    """ Retrieve the value of the variable in a given slot. """
+    value = state.basic_state.var_values[slot]
+    type_char = state.basic_state.var_names[slot][-1]
+    if value is None:
+        return vartypes.null[type_char]
+    elif type_char == '$':
+        try:
+            return get_string_copy_packed(value)
+        except KeyError:
+            return vartypes.null[type_char]
+    else:
+        return (type_char, value)
 
 def swap_var(name1, index1, name2, index2):
     """ Swap two variables by reference (Strings) or value (everything else). """
     if name1[-1] != name2[-1]:
         # type mismatch
         raise error.RunError(error.TYPE_MISMATCH)
-    elif ((index1 == [] and name1 not in state.basic_state.variables) or
+    elif ((index1 == [] and get_var_buffer(name1) is None) or
             (index1 != [] and name1 not in state.basic_state.arrays) or
-            (index2 == [] and name2 not in state.basic_state.variables) or
+            (index2 == [] and get_var_buffer(name2) is None) or
             (index2 != [] and name2 not in state.basic_state.arrays)):
         # illegal function call
         raise error.RunError(error.IFC)
@@ -215,17 +299,23 @@ def swap_var(name1, index1, name2, index2):
     size = byte_size[typechar]
     # swap non-strings by value, strings by address
     if index1 == []:
-        p1, off1 = state.basic_state.variables[name1], 0
+        p1, off1 = get_var_buffer(name1), 0
     else:
         dimensions, p1, _ = state.basic_state.arrays[name1]
         off1 = index_array(index1, dimensions)*size
     if index2 == []:
-        p2, off2 = state.basic_state.variables[name2], 0
+        p2, off2 = get_var_buffer(name2), 0
     else:
         dimensions, p2, _ = state.basic_state.arrays[name2]
         off2 = index_array(index2, dimensions)*size
     # swap the contents
     p1[off1:off1+size], p2[off2:off2+size] =  p2[off2:off2+size], p1[off1:off1+size]
+    if typechar == '$':
+        # strings have swapped owners
+        state.basic_state.strings.claim(p1[off1:off1+size],
+            (None, state.basic_state.var_slots[name1]) if index1 == [] else (name1, off1))
+        state.basic_state.strings.claim(p2[off2:off2+size],
+            (None, state.basic_state.var_slots[name2]) if index2 == [] else (name2, off2))
     # inc version
     if name1 in state.basic_state.arrays:
         state.basic_state.arrays[name1][2] += 1
@@ -343,10 +433,11 @@ def set_array(name, index, value):
     bigindex = index_array(index, dimensions)
     # make a copy of the value, we don't want them to be linked
     value = (vartypes.pass_type_keep(name[-1], value)[1])[:]
+    bytesize = var_size_bytes(name)
     # for strings, store the string in string space and store the key in the array
     if name[-1] == '$':
-        value = state.basic_state.strings.store(bytearray(value))
-    bytesize = var_size_bytes(name)
+        value = state.basic_state.strings.store(
+                            bytearray(value), owner=(name, bigindex*bytesize))
     lst[bigindex*bytesize:(bigindex+1)*bytesize] = value
     # inc version
     state.basic_state.arrays[name][2] += 1
@@ -378,7 +469,7 @@ def set_field_var_or_array(random_file, varname, indices, offset, length):
     # assign the string ptr to the variable name
     # desired side effect: if we re-assign this string variable through LET, it's no longer connected to the FIELD.
     if indices == []:
-        state.basic_state.variables[varname] = str_sequence
+        state.basic_state.var_values[get_slot(varname)] = str_sequence
         # update memory model (see set_var)
         if varname not in state.basic_state.var_memory:
             name_ptr = state.basic_state.var_current
@@ -398,7 +489,7 @@ def get_var_or_array_string_pointer(name, indices):
         raise error.RunError(error.TYPE_MISMATCH)
     try:
         if indices == []:
-            return state.basic_state.variables[name]
+            return get_var_buffer(name)
         else:
             check_dim_array(name, indices)
             dimensions, lst, _ = state.basic_state.arrays[name]
@@ -469,40 +560,76 @@ def string_assign_unpacked_into(sequence, offset, num, val):
 
 ##########################################
 
+class GarbageStats(object):
+    """ String space garbage collection statistics. """
+
+    def __init__(self):
+        """ Initialise statistics. """
+        self.collections = 0
+        self.bytes_moved = 0
+        self.pause_time = 0.
+
+gc_stats = GarbageStats()
+
 def collect_garbage():
     """ Collect garbage from string space. Compactify string storage. """
+    start = timeit.default_timer()
+    strings = state.basic_state.strings
+    if strings.unindexed:
+        index_string_owners(strings)
+    # only strings that are still referenced from where they were stored are live
+    # empty strings carry the address of the last stored string, so the length must match too
     string_list = []
-    # copy all strings that are actually referenced
-    for name in state.basic_state.variables:
-        if name[-1] == '$':
-            v = state.basic_state.variables[name]
-            try:
-                string_list.append((v, 0,
-                        state.basic_state.strings.address(v),
-                        state.basic_state.strings.retrieve(v)))
-            except KeyError:
-                # string is not located in memory - FIELD or code
-                pass
-    for name in state.basic_state.arrays:
-        if name[-1] == '$':
-            # ignore version - we can't put and get into string arrays
-            dimensions, lst, _ = state.basic_state.arrays[name]
-            for i in range(0, len(lst), 5):
-                v = lst[i:i+5]
-                try:
-                    string_list.append((lst, i,
-                            state.basic_state.strings.address(v),
-                            state.basic_state.strings.retrieve(v)))
-                except KeyError:
-                    # string is not located in memory - FIELD or code
-                    pass
+    for key, owner in strings.owners.iteritems():
+        if owner is not None and get_owner_sequence(owner) == chr(len(strings.strings[key])) + key:
+            string_list.append((strings.address(key), key, owner))
     # sort by str_ptr, largest first (maintain order of storage)
-    string_list.sort(key=itemgetter(2), reverse=True)
-    # clear the string buffer and re-store all referenced strings
-    state.basic_state.strings.clear()
-    for item in string_list:
+    string_list.sort(key=itemgetter(0), reverse=True)
+    # clear the string buffer and re-store all live strings
+    old_strings = strings.strings
+    strings.clear()
+    for _, key, owner in string_list:
         # re-allocate string space; no need to copy buffer
-        item[0][item[1]:item[1]+5] = state.basic_state.strings.store(item[3])
+        string_buffer = old_strings[key]
+        sequence = strings.store(string_buffer, owner=owner)
+        if sequence[-4:] != key:
+            set_owner_sequence(owner, sequence)
+            gc_stats.bytes_moved += len(string_buffer)
+    gc_stats.collections += 1
+    gc_stats.pause_time += timeit.default_timer() - start
+
+def index_string_owners(strings):
+    """ Rebuild the reverse index of string owners from all string pointers. """
+    strings.owners = dict.fromkeys(strings.strings)
+    for slot, name in enumerate(state.basic_state.var_names):
+        sequence = state.basic_state.var_values[slot]
+        if name[-1] == '$' and sequence is not None:
+            strings.claim(sequence, (None, slot))
+    for name, (_, buf, _) in state.basic_state.arrays.iteritems():
+        if name[-1] == '$':
+            for i in range(0, len(buf), byte_size['$']):
+                strings.claim(buf[i:i+byte_size['$']], (name, i))
+    strings.unindexed = False
+
+def get_owner_sequence(owner):
+    """ Return the 3-byte sequence at a string pointer location. """
+    name, index = owner
+    if name is None:
+        sequence = state.basic_state.var_values[index]
+    else:
+        try:
+            sequence = state.basic_state.arrays[name][1][index:index+5]
+        except KeyError:
+            sequence = None
+    return sequence or bytearray(5)
+
+def set_owner_sequence(owner, sequence):
+    """ Write a 3-byte sequence into a string pointer location. """
+    name, index = owner
+    if name is None:
+        state.basic_state.var_values[index][:] = sequence
+    else:
+        state.basic_state.arrays[name][1][index:index+5] = sequence
 
 def fre():
     """ Return the amount of memory available to variables, arrays, strings and code. """
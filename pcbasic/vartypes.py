@@ -254,7 +254,7 @@ def number_add(left, right):
     """ Add two numbers. """
     left, right = pass_most_precise_keep(left, right)
     if left[0] in ('#', '!'):
-        return fp.pack(fp.unpack(left).iadd(fp.unpack(right)))
+        return fp.add_packed(left, right)
     else:
         return pack_int(unpack_int(left) + unpack_int(right))
 
@@ -100,6 +100,8 @@ class VideoPlugin(object):
                 alive = False
             elif signal.event_type == backend.VIDEO_SET_MODE:
                 self.set_mode(signal.params)
+            elif signal.event_type == backend.VIDEO_PUT_BATCH:
+                self.put_batch(signal.params)
             elif signal.event_type == backend.VIDEO_PUT_GLYPH:
                 self.put_glyph(*signal.params)
             elif signal.event_type == backend.VIDEO_MOVE_CURSOR:
@@ -142,6 +144,8 @@ class VideoPlugin(object):
                 self.fill_rect(*signal.params)
             elif signal.event_type == backend.VIDEO_SET_CAPTION:
                 self.set_caption_message(signal.params)
+            elif signal.event_type == backend.VIDEO_CAPTURE:
+                self.capture_frame(signal.params)
             backend.video_queue.task_done()
 
     # signal handlers
@@ -188,6 +192,14 @@ class VideoPlugin(object):
     def put_glyph(self, pagenum, row, col, cp, is_fullwidth, fore, back, blink, underline, for_keys):
         """ Put a character at a given position. """
 
+    def put_batch(self, batch):
+        """ Put a list of (glyph, rect or None) cell updates. """
+        put_glyph, put_rect = self.put_glyph, self.put_rect
+        for glyph, rect in batch:
+            put_glyph(*glyph)
+            if rect:
+                put_rect(*rect)
+
     def build_glyphs(self, new_dict):
         """ Build a dict of glyphs for use in text mode. """
 
@@ -209,5 +221,8 @@ class VideoPlugin(object):
     def put_rect(self, pagenum, x0, y0, x1, y1, array):
         """ Apply numpy array [y][x] of attribytes to an area. """
 
+    def capture_frame(self, trigger):
+        """ Capture the visible page; trigger is 'end', 'pcopy' or 'interval'. """
+
 
 prepare()
@@ -32,6 +32,11 @@ class VideoANSI(video_cli.VideoCLI):
 
     def __init__(self, **kwargs):
         """ Initialise the text interface. """
+        # escape sequences waiting to be written, and number of bytes written
+        self.out = []
+        self.bytes_written = 0
+        # last scroll written to self.out, to combine repeated scrolls into one
+        self.last_scroll = None
         self.caption = kwargs.get('caption', '')
         self.set_caption_message('')
         # prevent logger from defacing the screen
@@ -47,46 +52,114 @@ class VideoANSI(video_cli.VideoCLI):
         self.cursor_col = 1
         # last used colour attributes
         self.last_attributes = None
-        # last position
+        # last position of the terminal's cursor
         self.last_pos = None
+        self._set_default_colours(16)
+        video_cli.VideoCLI.__init__(self, **kwargs)
         # text and colour buffer
         self.num_pages = 1
         self.vpagenum, self.apagenum = 0, 0
         self.height = 25
         self.width = 80
         self.text = [[[(u' ', (7, 0, False, False))]*80 for _ in range(25)]]
-        self._set_default_colours(16)
-        video_cli.VideoCLI.__init__(self, **kwargs)
+        # what the terminal shows; None for unknown cells
+        self.shown = [[None]*80 for _ in range(25)]
 
     def close(self):
         """ Close the text interface. """
         video.VideoPlugin.close(self)
-        sys.stdout.write(ansi.esc_set_colour % 0)
-        sys.stdout.write(ansi.esc_clear_screen)
-        sys.stdout.write(ansi.esc_move_cursor % (1, 1))
+        self._write(ansi.esc_set_colour % 0)
+        self._write(ansi.esc_clear_screen)
+        self._write(ansi.esc_move_cursor % (1, 1))
         self.show_cursor(True)
-        sys.stdout.flush()
+        self._flush()
         # re-enable logger
         self.logger.disabled = False
+        logging.debug('ANSI interface wrote %d bytes.', self.bytes_written)
         video_cli.term_echo()
 
     def _check_display(self):
         """ Handle screen and interface events. """
+        for row in range(self.height):
+            if self.text[self.vpagenum][row] != self.shown[row]:
+                self._update_row(row)
         if self.cursor_visible and self.last_pos != (self.cursor_row, self.cursor_col):
-            sys.stdout.write(ansi.esc_move_cursor % (self.cursor_row, self.cursor_col))
-            sys.stdout.flush()
+            self._write(ansi.esc_move_cursor % (self.cursor_row, self.cursor_col))
             self.last_pos = (self.cursor_row, self.cursor_col)
+        self._flush()
 
-    def _redraw(self):
-        """ Redraw the screen. """
-        sys.stdout.write(ansi.esc_clear_screen)
-        for row, textrow in enumerate(self.text[self.vpagenum]):
-            for col, charattr in enumerate(textrow):
-                sys.stdout.write(ansi.esc_move_cursor % (row+1, col+1))
-                self._set_attributes(*charattr[1])
-                sys.stdout.write(charattr[0].encode(encoding, 'replace'))
-        sys.stdout.write(ansi.esc_move_cursor % (self.cursor_row, self.cursor_col))
-        sys.stdout.flush()
+    def _write(self, s):
+        """ Queue an escape sequence or text for the terminal. """
+        self.out.append(s)
+        self.last_scroll = None
+
+    def _flush(self):
+        """ Write all queued output to the terminal at once. """
+        if self.out:
+            data = ''.join(self.out)
+            self.bytes_written += len(data)
+            sys.stdout.write(data)
+            sys.stdout.flush()
+            self.out = []
+            self.last_scroll = None
+
+    def _move(self, row, col):
+        """ Move the terminal's cursor, if not already there. """
+        if self.last_pos != (row, col):
+            self._write(ansi.esc_move_cursor % (row, col))
+            self.last_pos = row, col
+
+    def _update_row(self, row):
+        """ Bring a row on the terminal up to date with the text buffer. """
+        textrow, shownrow = self.text[self.vpagenum][row], self.shown[row]
+        width = len(textrow)
+        # a fullwidth character is followed by an empty continuation cell
+        # and is written in full if either half has changed
+        fullwidth = [col+1 < width and not textrow[col+1][0] for col in range(width)]
+        changed = [textrow[col] != shownrow[col] for col in range(width)]
+        for col in range(width-1):
+            if fullwidth[col] and changed[col+1]:
+                changed[col] = True
+        # a blank end of the row can be cleared rather than written
+        blank = (u' ', textrow[-1][1])
+        clear_from = width
+        while clear_from > 0 and textrow[clear_from-1] == blank:
+            clear_from -= 1
+        if width - clear_from < 4 or not any(changed[clear_from:]):
+            clear_from = width
+        for col in range(clear_from):
+            char, attrs = textrow[col]
+            if not changed[col] or not char:
+                continue
+            if self.last_pos and self.last_pos[0] == row+1:
+                gap = range(self.last_pos[1]-1, col)
+            else:
+                gap = None
+            if gap and len(gap) < 4 and all(
+                    not changed[c] and not fullwidth[c] and textrow[c][0] and
+                    textrow[c][1] == self.last_attributes for c in gap):
+                # rewriting a few unchanged cells is shorter than moving the cursor
+                self._write(u''.join(textrow[c][0] for c in gap).encode(encoding, 'replace'))
+            else:
+                self._move(row+1, col+1)
+            if self.last_attributes != attrs:
+                self._set_attributes(*attrs)
+            self._write(char.encode(encoding, 'replace'))
+            shownrow[col] = textrow[col]
+            if fullwidth[col]:
+                shownrow[col+1] = textrow[col+1]
+            if fullwidth[col] or col+1 >= width:
+                # terminals may disagree on the width of fullwidth characters
+                # and on where the cursor goes at the end of a line
+                self.last_pos = None
+            else:
+                self.last_pos = row+1, col+2
+        if clear_from < width:
+            self._move(row+1, clear_from+1)
+            if self.last_attributes != blank[1]:
+                self._set_attributes(*blank[1])
+            self._write(ansi.esc_clear_to_eol)
+            shownrow[clear_from:] = textrow[clear_from:]
 
     def _set_default_colours(self, num_attr):
         """ Set colours for default palette. """
@@ -99,19 +172,18 @@ class VideoANSI(video_cli.VideoCLI):
 
     def _set_attributes(self, fore, back, blink, underline):
         """ Set ANSI colours based on split attribute. """
+        self.last_attributes = fore, back, blink, underline
         bright = (fore & 8)
         if bright == 0:
             fore = 30 + self.default_colours[fore%8]
         else:
             fore = 90 + self.default_colours[fore%8]
         back = 40 + self.default_colours[back%8]
-        sys.stdout.write(ansi.esc_set_colour % 0)
-        sys.stdout.write(ansi.esc_set_colour % back)
-        sys.stdout.write(ansi.esc_set_colour % fore)
+        # reset, then set all in one sequence
+        codes = [0, back, fore]
         if blink:
-            sys.stdout.write(ansi.esc_set_colour % 5)
-        sys.stdout.flush()
-
+            codes.append(5)
+        self._write(ansi.esc_set_colours % ';'.join(str(code) for code in codes))
 
     def set_mode(self, mode_info):
         """ Change screen mode. """
@@ -122,33 +194,26 @@ class VideoANSI(video_cli.VideoCLI):
                             for _ in range(self.height)]
                             for _ in range(self.num_pages)]
         self._set_default_colours(len(mode_info.palette))
-        sys.stdout.write(ansi.esc_resize_term % (self.height, self.width))
-        sys.stdout.write(ansi.esc_clear_screen)
-        sys.stdout.flush()
+        self._write(ansi.esc_resize_term % (self.height, self.width))
+        self._write(ansi.esc_clear_screen)
+        # cleared in the terminal's own default colours
+        self.shown = [[None]*self.width for _ in range(self.height)]
+        self._flush()
         return True
 
     def set_page(self, new_vpagenum, new_apagenum):
         """ Set visible and active page. """
         self.vpagenum, self.apagenum = new_vpagenum, new_apagenum
-        self._redraw()
 
     def copy_page(self, src, dst):
         """ Copy screen pages. """
         self.text[dst] = [row[:] for row in self.text[src]]
-        if dst == self.vpagenum:
-            self._redraw()
 
     def clear_rows(self, back_attr, start, stop):
         """ Clear screen rows. """
         self.text[self.apagenum][start-1:stop] = [
-            [(u' ', (7, 0, False, False))]*len(self.text[self.apagenum][0])
+            [(u' ', (7, back_attr, False, False))]*len(self.text[self.apagenum][0])
                         for _ in range(start-1, stop)]
-        if self.vpagenum == self.apagenum:
-            self._set_attributes(7, back_attr, False, False)
-            for r in range(start, stop+1):
-                sys.stdout.write(ansi.esc_move_cursor % (r, 1))
-                sys.stdout.write(ansi.esc_clear_line)
-            sys.stdout.flush()
 
     def move_cursor(self, crow, ccol):
         """ Move the cursor to a new position. """
@@ -162,13 +227,12 @@ class VideoANSI(video_cli.VideoCLI):
         """ Change visibility of cursor. """
         self.cursor_visible = cursor_on
         if cursor_on:
-            sys.stdout.write(ansi.esc_show_cursor)
+            self._write(ansi.esc_show_cursor)
             #sys.stdout.write(ansi.esc_set_cursor_shape % cursor_shape)
         else:
             # force move when made visible again
-            sys.stdout.write(ansi.esc_hide_cursor)
+            self._write(ansi.esc_hide_cursor)
             self.last_pos = None
-        sys.stdout.flush()
 
     def set_cursor_shape(self, width, height, from_line, to_line):
         """ Set the cursor shape. """
@@ -177,9 +241,8 @@ class VideoANSI(video_cli.VideoCLI):
         else:
             self.cursor_shape = 3
         # 1 blinking block 2 block 3 blinking line 4 line
-        if self.cursor_visible:
-            #sys.stdout.write(ansi.esc_set_cursor_shape % cursor_shape)
-            sys.stdout.flush()
+        #if self.cursor_visible:
+        #    sys.stdout.write(ansi.esc_set_cursor_shape % cursor_shape)
 
     def put_glyph(self, pagenum, row, col, cp, is_fullwidth, fore, back, blink, underline, for_keys):
         """ Put a character at a given position. """
@@ -189,56 +252,55 @@ class VideoANSI(video_cli.VideoCLI):
         self.text[pagenum][row-1][col-1] = char, (fore, back, blink, underline)
         if is_fullwidth:
             self.text[pagenum][row-1][col] = u'', (fore, back, blink, underline)
-        if self.vpagenum != pagenum:
-            return
-        sys.stdout.write(ansi.esc_move_cursor % (row, col))
-        if self.last_attributes != (fore, back, blink, underline):
-            self.last_attributes = fore, back, blink, underline
-            self._set_attributes(fore, back, blink, underline)
-        sys.stdout.write(char.encode(encoding, 'replace'))
-        if is_fullwidth:
-            sys.stdout.write(' ')
-        sys.stdout.write(ansi.esc_move_cursor % (self.cursor_row, self.cursor_col))
-        self.last_pos = (self.cursor_row, self.cursor_col)
-        sys.stdout.flush()
 
     def scroll_up(self, from_line, scroll_height, back_attr):
         """ Scroll the screen up between from_line and scroll_height. """
         self.text[self.apagenum][from_line-1:scroll_height] = (
                 self.text[self.apagenum][from_line:scroll_height] +
-                [[(u' ', 0)]*len(self.text[self.apagenum][0])])
-        if self.apagenum != self.vpagenum:
-            return
-        sys.stdout.write(ansi.esc_set_scroll_region % (from_line, scroll_height))
-        sys.stdout.write(ansi.esc_scroll_up % 1)
-        sys.stdout.write(ansi.esc_set_scroll_screen)
-        if self.cursor_row > 1:
-            sys.stdout.write(ansi.esc_move_cursor % (self.cursor_row, self.cursor_col))
-            self.last_pos = (self.cursor_row, self.cursor_col)
-        self.clear_rows(back_attr, scroll_height, scroll_height)
+                [[(u' ', (7, back_attr, False, False))]*len(self.text[self.apagenum][0])])
+        if self.apagenum == self.vpagenum:
+            self._scroll(from_line, scroll_height, 1)
 
     def scroll_down(self, from_line, scroll_height, back_attr):
         """ Scroll the screen down between from_line and scroll_height. """
         self.text[self.apagenum][from_line-1:scroll_height] = (
-                [[(u' ', 0)]*len(self.text[self.apagenum][0])] +
+                [[(u' ', (7, back_attr, False, False))]*len(self.text[self.apagenum][0])] +
                 self.text[self.apagenum][from_line-1:scroll_height-1])
-        if self.apagenum != self.vpagenum:
-            return
-        sys.stdout.write(ansi.esc_set_scroll_region % (from_line, scroll_height))
-        sys.stdout.write(ansi.esc_scroll_down % 1)
-        sys.stdout.write(ansi.esc_set_scroll_screen)
-        if self.cursor_row > 1:
-            sys.stdout.write(ansi.esc_move_cursor % (self.cursor_row, self.cursor_col))
-            self.last_pos = (self.cursor_row, self.cursor_col)
-        self.clear_rows(back_attr, from_line, from_line)
+        if self.apagenum == self.vpagenum:
+            self._scroll(from_line, scroll_height, -1)
+
+    def _scroll(self, from_line, scroll_height, lines):
+        """ Scroll a region of the terminal; negative is down. """
+        blank = [None]*self.width
+        if lines > 0:
+            self.shown[from_line-1:scroll_height] = (
+                    self.shown[from_line:scroll_height] + [blank])
+        else:
+            self.shown[from_line-1:scroll_height] = (
+                    [blank] + self.shown[from_line-1:scroll_height-1])
+        if self.last_scroll and self.last_scroll[:2] == (from_line, scroll_height):
+            # combine with the previous scroll in the same region
+            lines += self.last_scroll[2]
+            self.out.pop()
+        if lines > 0:
+            scroll = ansi.esc_scroll_up % lines
+        elif lines < 0:
+            scroll = ansi.esc_scroll_down % -lines
+        else:
+            scroll = ''
+        self._write(ansi.esc_set_scroll_region % (from_line, scroll_height) +
+                    scroll + ansi.esc_set_scroll_screen)
+        self.last_scroll = from_line, scroll_height, lines
+        # setting the scroll region homes the cursor
+        self.last_pos = None
 
     def set_caption_message(self, msg):
         """ Add a message to the window caption. """
         if msg:
-            sys.stdout.write(ansi.esc_set_title % (self.caption + ' - ' + msg))
+            self._write(ansi.esc_set_title % (self.caption + ' - ' + msg))
         else:
-            sys.stdout.write(ansi.esc_set_title % self.caption)
-        sys.stdout.flush()
+            self._write(ansi.esc_set_title % self.caption)
+        self._flush()
 
 
 prepare()
@@ -102,6 +102,8 @@ class VideoCurses(video.VideoPlugin):
         self.window.nodelay(True)
         self.window.keypad(True)
         self.window.scrollok(False)
+        # let curses scroll with the terminal's own line insert and delete
+        self.window.idlok(True)
         self.can_change_palette = (curses.can_change_color() and curses.COLORS >= 16
                               and curses.COLOR_PAIRS > 128)
         self.caption = kwargs.get('caption', '')
@@ -216,7 +218,8 @@ class VideoCurses(video.VideoPlugin):
 
     def _redraw(self):
         """ Redraw the screen. """
-        self.window.clear()
+        # erase rather than clear, so that refresh only sends the differences
+        self.window.erase()
         if self.last_colour != 0:
             self.window.bkgdset(' ', self._curses_colour(7, 0, False))
         for row, textrow in enumerate(self.text[self.vpagenum]):
@@ -430,6 +433,7 @@ class VideoCurses(video.VideoPlugin):
             sys.stdout.write(ansi.esc_set_title % self.caption)
         sys.stdout.flush()
         # redraw in case terminal didn't recognise ansi sequence
+        self.window.clearok(True)
         self._redraw()
 
 
@@ -28,6 +28,8 @@ if plat.system == 'Windows':
 
 # percentage of the screen to leave unused for window decorations etc.
 display_slack = 15
+# number of separate changed areas to keep before merging them into one
+max_damage_rects = 16
 
 
 
@@ -68,6 +70,15 @@ class VideoGraphical(video.VideoPlugin):
         # size of window (canvas+border)
         self.window_width = None
         self.window_height = None
+        # changed canvas areas on the visible page since last flip
+        self.damage = []
+        # whole frame must be redrawn on next flip
+        self.full_damage = True
+        self.screen_changed = True
+        # work surface and display sizes the scale maps were built for
+        self.scale_sizes = None
+        # work surface pixel shown by each display column and row
+        self.scale_map_x, self.scale_map_y = None, None
 
 
     ###########################################################################
@@ -127,6 +138,59 @@ class VideoGraphical(video.VideoPlugin):
                     apx = mx, my
             return apx[0] * pixel_x, apx[1] * pixel_y
 
+    ###########################################################################
+    # damage tracking
+
+    def _damage(self, pagenum, x, y, width, height):
+        """ Mark a canvas area as changed; ignored if not on the visible page. """
+        if pagenum != self.vpagenum:
+            return
+        self.damage.append((x, y, width, height))
+        if len(self.damage) > max_damage_rects:
+            self.damage = [bounding_rect(self.damage)]
+        self.screen_changed = True
+
+    def _damage_all(self):
+        """ Mark the whole frame, including border, as changed. """
+        self.full_damage = True
+        self.screen_changed = True
+
+    def _pop_damage(self):
+        """ Return and reset the changed canvas areas; None for the whole frame. """
+        damage, self.damage = self.damage, []
+        if self.full_damage:
+            self.full_damage = False
+            return None
+        return damage
+
+    def _cursor_damage(self):
+        """ Canvas areas of the cursor at its previous and current location. """
+        # wide enough for a cursor on a fullwidth character
+        width = 2 * self.font_width
+        return [((col-1) * self.font_width, (row-1) * self.font_height,
+                 width, self.font_height)
+                for row, col in ((self.last_row, self.last_col),
+                                 (self.cursor_row, self.cursor_col))
+                if row >= 1 and col >= 1]
+
+    def _update_scale_maps(self, work_size, display_size):
+        """ Build nearest-neighbour maps from display to work surface; return True if changed. """
+        if self.scale_sizes == (work_size, display_size):
+            return False
+        self.scale_sizes = work_size, display_size
+        self.scale_map_x = (numpy.arange(display_size[0]) * work_size[0]) // display_size[0]
+        self.scale_map_y = (numpy.arange(display_size[1]) * work_size[1]) // display_size[1]
+        return True
+
+    def _scale_rect(self, src_pixels, dst_pixels, rect):
+        """ Scale a work surface rect onto [x][y] display pixels; return the display rect. """
+        x, y, width, height = rect
+        x0, x1 = numpy.searchsorted(self.scale_map_x, (x, x + width))
+        y0, y1 = numpy.searchsorted(self.scale_map_y, (y, y + height))
+        dst_pixels[x0:x1, y0:y1] = src_pixels[
+                numpy.ix_(self.scale_map_x[x0:x1], self.scale_map_y[y0:y1])]
+        return int(x0), int(y0), int(x1 - x0), int(y1 - y0)
+
 
 
 class ClipboardInterface(object):
@@ -162,7 +226,7 @@ class ClipboardInterface(object):
         self.select_start = None
         self.select_stop = None
         self.selection_rect = None
-        self.videoplugin.screen_changed = True
+        self.videoplugin._damage_all()
 
     def copy(self, mouse=False):
         """ Copy screen characters from selection into clipboard. """
@@ -213,7 +277,7 @@ class ClipboardInterface(object):
                       self.size[0], rect_bot - rect_top - 2*self.font_height),
                 (0, rect_bot - self.font_height,
                       rect_right, self.font_height)]
-        self.videoplugin.screen_changed = True
+        self.videoplugin._damage_all()
 
     def handle_key(self, scan, c):
         """ Handle keyboard clipboard commands. """
@@ -265,6 +329,14 @@ composite_640 = {
         (0x74, 0x53, 0xff),        (0x77, 0x77, 0x77),        (0xff, 0x79, 0xff),        (0x00, 0xc8, 0x71),
         (0x00, 0xcc, 0xff),        (0x00, 0xfa, 0x00),        (0xff, 0xff, 0xff) ]        }
 
+def bounding_rect(rects):
+    """ Smallest (x, y, width, height) rect containing all given rects. """
+    x0 = min(r[0] for r in rects)
+    y0 = min(r[1] for r in rects)
+    x1 = max(r[0] + r[2] for r in rects)
+    y1 = max(r[1] + r[3] for r in rects)
+    return x0, y0, x1 - x0, y1 - y0
+
 def apply_composite_artifacts(src_array, pixels=4):
     """ Process the canvas to apply composite colour artifacts. """
     width, height = src_array.shape
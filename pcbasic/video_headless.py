@@ -0,0 +1,229 @@
+"""
+PC-BASIC - video_headless.py
+Headless framebuffer interface with frame capture to PNG or raw files
+
+(c) 2016 Rob Hagemans
+This file is released under the GNU GPL version 3.
+"""
+
+import logging
+import struct
+import time
+import zlib
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import video
+import video_none
+
+# interval between queue checks; shorter than the graphical frame tick
+# so that the signal queue does not build up during fast batch runs
+tick_s = 0.002
+
+###############################################################################
+
+def prepare():
+    """ Initialise video_headless module. """
+    video.plugin_dict['headless'] = VideoHeadless
+
+
+##############################################################################
+
+class VideoHeadless(video_none.VideoNone):
+    """ Filter interface that keeps the screen in numpy arrays and captures frames. """
+
+    def __init__(self, **kwargs):
+        """ Initialise headless interface. """
+        if not numpy:
+            logging.debug('NumPy module not found.')
+            raise video.InitFailed()
+        video_none.VideoNone.__init__(self, **kwargs)
+        # frame file name pattern, to be formatted with the frame number
+        self.capture_file = kwargs.get('capture_file', 'frame%04d')
+        # png or raw
+        self.capture_format = kwargs.get('capture_format', 'png')
+        # events that trigger a capture: end, pcopy, quit
+        # interval captures are only signalled if an interval is set
+        self.capture_on = set(kwargs.get('capture_on', ('end',))) | set(('interval',))
+        self.frame_number = 0
+        # all-black palette until the first set_palette
+        self.num_fore_attrs = 16
+        self.show_palette = numpy.zeros((256, 3), dtype=numpy.uint8)
+        self.vpagenum, self.apagenum = 0, 0
+        self.glyph_dict = {}
+        self.set_mode(kwargs['initial_mode'])
+
+    def close(self):
+        """ Close the interface, capturing a final frame if requested. """
+        video_none.VideoNone.close(self)
+        if 'quit' in self.capture_on:
+            self._write_frame()
+
+    def _sleep(self):
+        """ Sleep a tick; there is no frame rate to keep. """
+        time.sleep(tick_s)
+
+    ###########################################################################
+    # frame capture
+
+    def capture_frame(self, trigger):
+        """ Write the visible page to a frame file if the trigger is enabled. """
+        if trigger in self.capture_on:
+            self._write_frame()
+
+    def _write_frame(self):
+        """ Write the visible page to the next frame file. """
+        name = self.capture_file
+        if '%' in name:
+            name = name % self.frame_number
+        name += '.' + self.capture_format
+        self.frame_number += 1
+        pixels = self.pixels[self.vpagenum]
+        try:
+            with open(name, 'wb') as f:
+                if self.capture_format == 'png':
+                    write_png(f, pixels, self.show_palette)
+                else:
+                    write_raw(f, pixels, self.show_palette)
+        except EnvironmentError as e:
+            logging.warning('Could not write frame %s: %s', name, e)
+
+    ###########################################################################
+    # signal handlers
+
+    def set_mode(self, mode_info):
+        """ Initialise a given text or graphics mode. """
+        self.text_mode = mode_info.is_text_mode
+        self.font_height = mode_info.font_height
+        self.font_width = mode_info.font_width
+        self.size = (mode_info.pixel_width, mode_info.pixel_height)
+        # screen pages, [y][x] attributes
+        self.pixels = [
+                numpy.zeros((self.size[1], self.size[0]), dtype=numpy.uint8)
+                for _ in range(mode_info.num_pages)]
+        self.glyph_dict = {
+                u'\0': numpy.zeros((self.font_height, self.font_width), dtype=numpy.uint8)}
+
+    def set_palette(self, rgb_palette_0, rgb_palette_1):
+        """ Build the palette. """
+        self.num_fore_attrs = min(16, len(rgb_palette_0))
+        # bottom 128 are non-blink, top 128 blink; frames show blink state 0
+        self.show_palette = numpy.array(
+                rgb_palette_0[:self.num_fore_attrs] * (256//self.num_fore_attrs),
+                dtype=numpy.uint8)
+
+    def set_colorburst(self, on, rgb_palette, rgb_palette1):
+        """ Change the NTSC colorburst setting. """
+        self.set_palette(rgb_palette, rgb_palette1)
+
+    def clear_rows(self, back_attr, start, stop):
+        """ Clear a range of screen rows. """
+        self.pixels[self.apagenum][
+                (start-1)*self.font_height : stop*self.font_height] = back_attr
+
+    def set_page(self, vpage, apage):
+        """ Set the visible and active page. """
+        self.vpagenum, self.apagenum = vpage, apage
+
+    def copy_page(self, src, dst):
+        """ Copy source to destination page. """
+        self.pixels[dst][:] = self.pixels[src]
+
+    def scroll_up(self, from_line, scroll_height, back_attr):
+        """ Scroll the screen up between from_line and scroll_height. """
+        pixels = self.pixels[self.apagenum]
+        y0, y1 = (from_line-1)*self.font_height, (scroll_height-1)*self.font_height
+        pixels[y0:y1] = pixels[y0+self.font_height:y1+self.font_height]
+        pixels[y1:y1+self.font_height] = back_attr
+
+    def scroll_down(self, from_line, scroll_height, back_attr):
+        """ Scroll the screen down between from_line and scroll_height. """
+        pixels = self.pixels[self.apagenum]
+        y0, y1 = from_line*self.font_height, scroll_height*self.font_height
+        pixels[y0:y1] = pixels[y0-self.font_height:y1-self.font_height]
+        pixels[y0-self.font_height:y0] = back_attr
+
+    def put_glyph(self, pagenum, row, col, cp, is_fullwidth, fore, back, blink, underline, for_keys):
+        """ Put a character at a given position. """
+        if not self.text_mode:
+            # in graphics mode, a put_rect call does the actual drawing
+            return
+        attr = fore + self.num_fore_attrs*back + 128*blink
+        x0, y0 = (col-1)*self.font_width, (row-1)*self.font_height
+        try:
+            glyph = self.glyph_dict[cp]
+        except KeyError:
+            logging.warning('No glyph received for code point %s', cp.encode('hex'))
+            glyph = self.glyph_dict[u'\0']
+        width = glyph.shape[1]
+        area = self.pixels[pagenum][y0:y0+self.font_height, x0:x0+width]
+        area[:] = numpy.where(glyph, attr, back)
+        if underline:
+            area[-1] = attr
+
+    def build_glyphs(self, new_dict):
+        """ Build a dict of glyphs for use in text mode. """
+        for char, glyph in new_dict.iteritems():
+            self.glyph_dict[char] = numpy.asarray(glyph, dtype=numpy.uint8)
+
+    def put_pixel(self, pagenum, x, y, index):
+        """ Put a pixel on the screen; callback to empty character buffer. """
+        self.pixels[pagenum][y, x] = index
+
+    def fill_rect(self, pagenum, x0, y0, x1, y1, index):
+        """ Fill a rectangle in a solid attribute. """
+        self.pixels[pagenum][y0:y1+1, x0:x1+1] = index
+
+    def fill_interval(self, pagenum, x0, x1, y, index):
+        """ Fill a scanline interval in a solid attribute. """
+        self.pixels[pagenum][y, x0:x1+1] = index
+
+    def put_interval(self, pagenum, x, y, colours):
+        """ Write a list of attributes to a scanline interval. """
+        self.pixels[pagenum][y, x:x+len(colours)] = colours
+
+    def put_rect(self, pagenum, x0, y0, x1, y1, array):
+        """ Apply numpy array [y][x] of attribytes to an area. """
+        if (x1 < x0) or (y1 < y0):
+            return
+        self.pixels[pagenum][y0:y1+1, x0:x1+1] = array
+
+
+###############################################################################
+# frame file formats
+
+def write_png(f, pixels, palette):
+    """ Write [y][x] attributes as an 8-bit indexed PNG image. """
+    height, width = pixels.shape
+    # each scanline starts with filter type 0 (none)
+    scanlines = numpy.zeros((height, width+1), dtype=numpy.uint8)
+    scanlines[:, 1:] = pixels
+    f.write('\x89PNG\r\n\x1a\n')
+    # 8 bits per pixel, colour type 3 (indexed), no interlace
+    _write_png_chunk(f, 'IHDR', struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0))
+    _write_png_chunk(f, 'PLTE', palette.tostring())
+    _write_png_chunk(f, 'IDAT', zlib.compress(scanlines.tostring(), 6))
+    _write_png_chunk(f, 'IEND', '')
+
+def _write_png_chunk(f, chunk_type, data):
+    """ Write a PNG chunk with length and checksum. """
+    f.write(struct.pack('>I', len(data)))
+    f.write(chunk_type)
+    f.write(data)
+    f.write(struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff))
+
+def write_raw(f, pixels, palette):
+    """ Write [y][x] attributes as a raw indexed dump with palette. """
+    height, width = pixels.shape
+    # little-endian width, height and number of palette entries
+    f.write(struct.pack('<HHH', width, height, len(palette)))
+    # RGB triplets for each attribute
+    f.write(palette.tostring())
+    # one byte per pixel, row by row
+    f.write(pixels.tostring())
+
+
+prepare()
@@ -80,6 +80,9 @@ class VideoPygame(video_graphical.VideoGraphical):
         # update cycle
         # update flag
         self.screen_changed = True
+        self.blink_state = 0
+        # nearest-neighbour scaled copy of the work surface
+        self.scaled_surface = None
         # refresh cycle parameters
         self.cycle = 0
         self.last_cycle = 0
@@ -226,6 +229,8 @@ class VideoPygame(video_graphical.VideoGraphical):
             elif event.type == pygame.VIDEORESIZE:
                 self.fullscreen = False
                 self._resize_display(event.w, event.h)
+            elif event.type == pygame.VIDEOEXPOSE:
+                self._damage_all()
             elif event.type == pygame.QUIT:
                 if self.nokill:
                     self.set_caption_message('to exit type <CTRL+BREAK> <ESC> SYSTEM')
@@ -303,11 +308,16 @@ class VideoPygame(video_graphical.VideoGraphical):
 
     def _check_display(self):
         """ Check screen and blink events; update screen if necessary. """
-        self.blink_state = 0
+        blink_state = 0
         if self.mode_has_blink:
-            self.blink_state = 0 if self.cycle < self.blink_cycles * 2 else 1
+            blink_state = 0 if self.cycle < self.blink_cycles * 2 else 1
             if self.cycle % self.blink_cycles == 0:
+                # cursor blink
                 self.screen_changed = True
+        if blink_state != self.blink_state:
+            # blinking characters change colour
+            self.blink_state = blink_state
+            self._damage_all()
         if self.cursor_visible and (
                 (self.cursor_row != self.last_row) or
                 (self.cursor_col != self.last_col)):
@@ -323,21 +333,28 @@ class VideoPygame(video_graphical.VideoGraphical):
                 self.screen_changed = False
 
     def _do_flip(self):
-        """ Draw the canvas to the screen. """
-        # create the screen that will be stretched onto the display
-        border_x = int(self.size[0] * self.border_width / 200.)
-        border_y = int(self.size[1] * self.border_width / 200.)
-        # surface depth and flags match those of canvas
-        screen = pygame.Surface((self.size[0] + 2*border_x,
-                                 self.size[1] + 2*border_y),
-                                 0, self.canvas[self.vpagenum])
+        """ Draw the changed parts of the canvas to the screen. """
+        damage = self._pop_damage()
+        if self.composite_artifacts or self.clipboard.active():
+            damage = None
+        # the screen that will be stretched onto the display
+        screen = self.work_surface
         screen.set_palette(self.work_palette)
-        # border colour
-        border_colour = pygame.Color(0, 0, self.border_attr % self.num_fore_attrs)
-        screen.fill(border_colour)
-        screen.blit(self.canvas[self.vpagenum], (border_x, border_y))
         # subsurface referencing the canvas area
-        workscreen = screen.subsurface((border_x, border_y, self.size[0], self.size[1]))
+        workscreen = screen.subsurface(
+                (self.border_x, self.border_y, self.size[0], self.size[1]))
+        if damage is None:
+            # border colour
+            border_colour = pygame.Color(0, 0, self.border_attr % self.num_fore_attrs)
+            screen.fill(border_colour)
+            workscreen.blit(self.canvas[self.vpagenum], (0, 0))
+            rects = [screen.get_rect()]
+        else:
+            # refresh the changed areas and erase the cursor
+            rects = []
+            for x, y, w, h in damage + self._cursor_damage():
+                workscreen.blit(self.canvas[self.vpagenum], (x, y), (x, y, w, h))
+                rects.append((x + self.border_x, y + self.border_y, w, h))
         self._draw_cursor(workscreen)
         if self.clipboard.active():
             create_feedback(workscreen, self.clipboard.selection_rect)
@@ -347,12 +364,27 @@ class VideoPygame(video_graphical.VideoGraphical):
         else:
             screen.set_palette(self.show_palette[self.blink_state])
         if self.smooth:
+            # smoothing blends neighbouring pixels, so present the whole frame
             pygame.transform.smoothscale(screen.convert(self.display),
                                          self.display.get_size(), self.display)
+            pygame.display.flip()
         else:
-            pygame.transform.scale(screen.convert(self.display),
-                                   self.display.get_size(), self.display)
-        pygame.display.flip()
+            pygame.display.update(self._present_rects(screen, rects))
+
+    def _present_rects(self, screen, rects):
+        """ Scale screen rects onto the display; return display rects. """
+        if self._update_scale_maps(screen.get_size(), self.display.get_size()):
+            self.scaled_surface = pygame.Surface(self.display.get_size(), depth=8)
+        self.scaled_surface.set_palette(screen.get_palette())
+        src_pixels = pygame.surfarray.pixels2d(screen)
+        dst_pixels = pygame.surfarray.pixels2d(self.scaled_surface)
+        display_rects = [self._scale_rect(src_pixels, dst_pixels, rect)
+                         for rect in rects]
+        # release the surface locks before blitting
+        del src_pixels, dst_pixels
+        for rect in display_rects:
+            self.display.blit(self.scaled_surface, rect[:2], rect)
+        return display_rects
 
     def _draw_cursor(self, screen):
         """ Draw the cursor on the surface provided. """
@@ -395,7 +427,7 @@ class VideoPygame(video_graphical.VideoGraphical):
         self.display = pygame.display.set_mode((width, height), flags)
         self.window_width, self.window_height = width, height
         # load display if requested
-        self.screen_changed = True
+        self._damage_all()
 
 
     ###########################################################################
@@ -425,10 +457,16 @@ class VideoPygame(video_graphical.VideoGraphical):
                         for _ in range(self.num_pages)]
         for i in range(self.num_pages):
             self.canvas[i].set_palette(self.work_palette)
+        # create work surface for border, cursor and composite
+        self.border_x = int(self.size[0] * self.border_width / 200.)
+        self.border_y = int(self.size[1] * self.border_width / 200.)
+        self.work_surface = pygame.Surface(
+                (self.size[0] + 2*self.border_x, self.size[1] + 2*self.border_y),
+                depth=8)
         # initialise clipboard
         self.clipboard = video_graphical.ClipboardInterface(self,
                 mode_info.width, mode_info.height)
-        self.screen_changed = True
+        self._damage_all()
 
     def set_caption_message(self, msg):
         """ Add a message to the window caption. """
@@ -449,12 +487,12 @@ class VideoPygame(video_graphical.VideoGraphical):
         self.show_palette[1] = rgb_palette_1[:self.num_fore_attrs] * (128//self.num_fore_attrs)
         for b in rgb_palette_1[:self.num_back_attrs] * (128//self.num_fore_attrs//self.num_back_attrs):
             self.show_palette[1] += [b]*self.num_fore_attrs
-        self.screen_changed = True
+        self._damage_all()
 
     def set_border_attr(self, attr):
         """ Change the border attribute. """
         self.border_attr = attr
-        self.screen_changed = True
+        self._damage_all()
 
     def set_colorburst(self, on, rgb_palette, rgb_palette1):
         """ Change the NTSC colorburst setting. """
@@ -467,17 +505,18 @@ class VideoPygame(video_graphical.VideoGraphical):
         scroll_area = pygame.Rect(0, (start-1)*self.font_height,
                                   self.size[0], (stop-start+1)*self.font_height)
         self.canvas[self.apagenum].fill(bg, scroll_area)
-        self.screen_changed = True
+        self._damage(self.apagenum, *scroll_area)
 
     def set_page(self, vpage, apage):
         """ Set the visible and active page. """
         self.vpagenum, self.apagenum = vpage, apage
-        self.screen_changed = True
+        self._damage_all()
 
     def copy_page(self, src, dst):
         """ Copy source to destination page. """
         self.canvas[dst].blit(self.canvas[src], (0, 0))
-        self.screen_changed = True
+        if dst == self.vpagenum:
+            self._damage_all()
 
     def show_cursor(self, cursor_on):
         """ Change visibility of cursor. """
@@ -508,7 +547,7 @@ class VideoPygame(video_graphical.VideoGraphical):
                                    0, (scroll_height-1) * self.font_height,
                                    self.size[0], self.font_height))
         self.canvas[self.apagenum].set_clip(None)
-        self.screen_changed = True
+        self._damage(self.apagenum, *temp_scroll_area)
 
     def scroll_down(self, from_line, scroll_height, back_attr):
         """ Scroll the screen down between from_line and scroll_height. """
@@ -523,7 +562,7 @@ class VideoPygame(video_graphical.VideoGraphical):
                                     0, (from_line-1) * self.font_height,
                                     self.size[0], self.font_height))
         self.canvas[self.apagenum].set_clip(None)
-        self.screen_changed = True
+        self._damage(self.apagenum, *temp_scroll_area)
 
     def put_glyph(self, pagenum, row, col, cp, is_fullwidth, fore, back, blink, underline, for_keys):
         """ Put a single-byte character at a given position. """
@@ -554,7 +593,7 @@ class VideoPygame(video_graphical.VideoGraphical):
         if underline:
             self.canvas[pagenum].fill(color, (x0, y0 + self.font_height - 1,
                                                             self.font_width, 1))
-        self.screen_changed = True
+        self._damage(pagenum, x0, y0, self.font_width, self.font_height)
 
     def build_glyphs(self, new_dict):
         """ Build a dict of glyphs for use in text mode. """
@@ -576,26 +615,26 @@ class VideoPygame(video_graphical.VideoGraphical):
     def put_pixel(self, pagenum, x, y, index):
         """ Put a pixel on the screen; callback to empty character buffer. """
         self.canvas[pagenum].set_at((x,y), index)
-        self.screen_changed = True
+        self._damage(pagenum, x, y, 1, 1)
 
     def fill_rect(self, pagenum, x0, y0, x1, y1, index):
         """ Fill a rectangle in a solid attribute. """
         rect = pygame.Rect(x0, y0, x1-x0+1, y1-y0+1)
         self.canvas[pagenum].fill(index, rect)
-        self.screen_changed = True
+        self._damage(pagenum, x0, y0, x1-x0+1, y1-y0+1)
 
     def fill_interval(self, pagenum, x0, x1, y, index):
         """ Fill a scanline interval in a solid attribute. """
         dx = x1 - x0 + 1
         self.canvas[pagenum].fill(index, (x0, y, dx, 1))
-        self.screen_changed = True
+        self._damage(pagenum, x0, y, dx, 1)
 
     def put_interval(self, pagenum, x, y, colours):
         """ Write a list of attributes to a scanline interval. """
         # reference the interval on the canvas
         pygame.surfarray.pixels2d(self.canvas[pagenum]
                 )[x:x+len(colours), y] = numpy.array(colours).astype(int)
-        self.screen_changed = True
+        self._damage(pagenum, x, y, len(colours), 1)
 
     def put_rect(self, pagenum, x0, y0, x1, y1, array):
         """ Apply numpy array [y][x] of attribytes to an area. """
@@ -604,7 +643,7 @@ class VideoPygame(video_graphical.VideoGraphical):
         # reference the destination area
         pygame.surfarray.pixels2d(self.canvas[pagenum].subsurface(
             pygame.Rect(x0, y0, x1-x0+1, y1-y0+1)))[:] = numpy.array(array).T
-        self.screen_changed = True
+        self._damage(pagenum, x0, y0, x1-x0+1, y1-y0+1)
 
 ###############################################################################
 # clipboard handling
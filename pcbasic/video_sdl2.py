@@ -65,6 +65,7 @@ class VideoSDL2(video_graphical.VideoGraphical):
         self.last_cycle = 0
         self.cycle_time = 120
         self.blink_cycles = 5
+        self.blink_state = 0
         # cursor
         # current cursor location
         self.last_row = 1
@@ -103,6 +104,8 @@ class VideoSDL2(video_graphical.VideoGraphical):
         self.physical_size = display_mode.w, display_mode.h
         # create the window initially, size will be corrected later
         self.display = None
+        # nearest-neighbour scaled copy of the work surface
+        self.scaled_surface = None
         # create window in same thread that manipulates it
         # "NOTE: You should not expect to be able to create a window, render, or receive events on any thread other than the main one"
         # https://wiki.libsdl.org/CategoryThread
@@ -150,6 +153,7 @@ class VideoSDL2(video_graphical.VideoGraphical):
                 sdl2.SDL_FreeSurface(s)
             sdl2.SDL_FreeSurface(self.work_surface)
             sdl2.SDL_FreeSurface(self.overlay)
+            sdl2.SDL_FreeSurface(self.scaled_surface)
             # free palettes
             for p in self.show_palette:
                 sdl2.SDL_FreePalette(p)
@@ -182,7 +186,7 @@ class VideoSDL2(video_graphical.VideoGraphical):
                     width, height, flags)
         self._set_icon()
         self.display_surface = sdl2.SDL_GetWindowSurface(self.display)
-        self.screen_changed = True
+        self._damage_all()
         self.window_width, self.window_height = width, height
 
 
@@ -238,6 +242,8 @@ class VideoSDL2(video_graphical.VideoGraphical):
             elif event.type == sdl2.SDL_WINDOWEVENT:
                 if event.window.event == sdl2.SDL_WINDOWEVENT_RESIZED:
                     self._resize_display(event.window.data1, event.window.data2)
+                elif event.window.event == sdl2.SDL_WINDOWEVENT_EXPOSED:
+                    self._damage_all()
                 # unset Alt modifiers on entering/leaving the window
                 # workaround for what seems to be an SDL2 bug
                 # where the ALT modifier sticks on the first Alt-Tab out
@@ -359,11 +365,16 @@ class VideoSDL2(video_graphical.VideoGraphical):
 
     def _check_display(self):
         """ Check screen and blink events; update screen if necessary. """
-        self.blink_state = 0
+        blink_state = 0
         if self.mode_has_blink:
-            self.blink_state = 0 if self.cycle < self.blink_cycles * 2 else 1
+            blink_state = 0 if self.cycle < self.blink_cycles * 2 else 1
             if self.cycle % self.blink_cycles == 0:
+                # cursor blink
                 self.screen_changed = True
+        if blink_state != self.blink_state:
+            # blinking characters change colour
+            self.blink_state = blink_state
+            self._damage_all()
         if self.cursor_visible and (
                 (self.cursor_row != self.last_row) or
                 (self.cursor_col != self.last_col)):
@@ -379,24 +390,38 @@ class VideoSDL2(video_graphical.VideoGraphical):
                 self.screen_changed = False
 
     def _do_flip(self):
-        """ Draw the canvas to the screen. """
-        sdl2.SDL_FillRect(self.work_surface, None, self.border_attr)
-        if self.composite_artifacts:
-            self.work_pixels[:] = video_graphical.apply_composite_artifacts(
+        """ Draw the changed parts of the canvas to the screen. """
+        damage = self._pop_damage()
+        if self.composite_artifacts or self.clipboard.active():
+            damage = None
+        if damage is None:
+            # redraw border and canvas
+            sdl2.SDL_FillRect(self.work_surface, None, self.border_attr)
+            if self.composite_artifacts:
+                self.work_pixels[:] = video_graphical.apply_composite_artifacts(
                             self.pixels[self.vpagenum], 4//self.bitsperpixel)
-            sdl2.SDL_SetSurfacePalette(self.work_surface, self.composite_palette)
+                palette = self.composite_palette
+            else:
+                self.work_pixels[:] = self.pixels[self.vpagenum]
+                palette = self.show_palette[self.blink_state]
+            rects = [(0, 0, self.work_surface.contents.w, self.work_surface.contents.h)]
         else:
-            self.work_pixels[:] = self.pixels[self.vpagenum]
-            sdl2.SDL_SetSurfacePalette(self.work_surface, self.show_palette[self.blink_state])
+            # refresh the changed areas and erase the cursor
+            pixels = self.pixels[self.vpagenum]
+            rects = []
+            for x, y, w, h in damage + self._cursor_damage():
+                self.work_pixels[x:x+w, y:y+h] = pixels[x:x+w, y:y+h]
+                rects.append((x + self.border_x, y + self.border_y, w, h))
+            palette = self.show_palette[self.blink_state]
+        sdl2.SDL_SetSurfacePalette(self.work_surface, palette)
         # apply cursor to work surface
         self._show_cursor(True)
-        # convert 8-bit work surface to (usually) 32-bit display surface format
-        pixelformat = self.display_surface.contents.format
-        conv = sdl2.SDL_ConvertSurface(self.work_surface, pixelformat, 0)
-        # scale converted surface and blit onto display
         if not self.smooth:
-            sdl2.SDL_BlitScaled(conv, None, self.display_surface, None)
+            rects = self._present_rects(rects, palette)
         else:
+            # convert 8-bit work surface to 32-bit display surface format
+            conv = sdl2.SDL_ConvertSurface(self.work_surface,
+                                    self.display_surface.contents.format, 0)
             # smooth-scale converted surface
             w, h = self.window_width, self.window_height
             zoomx = ctypes.c_double(w/(self.size[0] + 2.0*self.border_x))
@@ -406,8 +431,11 @@ class VideoSDL2(video_graphical.VideoGraphical):
             # this seems to avoid unpredictable delays
             sdl2.SDL_FreeSurface(self.zoomed)
             self.zoomed = sdl2.sdlgfx.zoomSurface(conv, zoomx, zoomy, sdl2.sdlgfx.SMOOTHING_ON)
+            sdl2.SDL_FreeSurface(conv)
             # blit onto display
             sdl2.SDL_BlitSurface(self.zoomed, None, self.display_surface, None)
+            # smoothing blends neighbouring pixels, so present the whole frame
+            rects = None
         # create clipboard feedback
         if self.clipboard.active():
             rects = (sdl2.SDL_Rect(
@@ -419,8 +447,33 @@ class VideoSDL2(video_graphical.VideoGraphical):
             sdl2.SDL_FillRects(self.overlay, sdl_rects, len(sdl_rects),
                 sdl2.SDL_MapRGBA(self.overlay.contents.format, 128, 0, 128, 0))
             sdl2.SDL_BlitScaled(self.overlay, None, self.display_surface, None)
+            rects = None
         # flip the display
-        sdl2.SDL_UpdateWindowSurface(self.display)
+        if rects is None:
+            sdl2.SDL_UpdateWindowSurface(self.display)
+        else:
+            sdl_rects = (sdl2.SDL_Rect*len(rects))(*(sdl2.SDL_Rect(*r) for r in rects))
+            sdl2.SDL_UpdateWindowSurfaceRects(self.display, sdl_rects, len(rects))
+
+    def _present_rects(self, rects, palette):
+        """ Scale work surface rects onto the display surface; return display rects. """
+        work = self.work_surface.contents
+        if self._update_scale_maps((work.w, work.h),
+                                   (self.window_width, self.window_height)):
+            sdl2.SDL_FreeSurface(self.scaled_surface)
+            self.scaled_surface = sdl2.SDL_CreateRGBSurface(0,
+                    self.window_width, self.window_height, 8, 0, 0, 0, 0)
+            self.scaled_pixels = pixels2d(self.scaled_surface.contents)
+        sdl2.SDL_SetSurfacePalette(self.scaled_surface, palette)
+        work_pixels = pixels2d(work)
+        display_rects = []
+        for rect in rects:
+            display_rect = self._scale_rect(work_pixels, self.scaled_pixels, rect)
+            # convert to display format
+            sdl2.SDL_BlitSurface(self.scaled_surface, sdl2.SDL_Rect(*display_rect),
+                        self.display_surface, sdl2.SDL_Rect(*display_rect))
+            display_rects.append(display_rect)
+        return display_rects
 
     def _show_cursor(self, do_show):
         """ Draw or remove the cursor on the visible page. """
@@ -475,7 +528,7 @@ class VideoSDL2(video_graphical.VideoGraphical):
         sdl2.SDL_GetWindowSize(self.display, ctypes.byref(w), ctypes.byref(h))
         self.window_width, self.window_height = w.value, h.value
         self.display_surface = sdl2.SDL_GetWindowSurface(self.display)
-        self.screen_changed = True
+        self._damage_all()
 
 
     ###########################################################################
@@ -529,7 +582,7 @@ class VideoSDL2(video_graphical.VideoGraphical):
         # initialise clipboard
         self.clipboard = video_graphical.ClipboardInterface(self,
                 mode_info.width, mode_info.height)
-        self.screen_changed = True
+        self._damage_all()
 
     def set_caption_message(self, msg):
         """ Add a message to the window caption. """
@@ -552,12 +605,12 @@ class VideoSDL2(video_graphical.VideoGraphical):
         colors_1 = (sdl2.SDL_Color * 256)(*(sdl2.SDL_Color(r, g, b, 255) for (r, g, b) in show_palette_1))
         sdl2.SDL_SetPaletteColors(self.show_palette[0], colors_0, 0, 256)
         sdl2.SDL_SetPaletteColors(self.show_palette[1], colors_1, 0, 256)
-        self.screen_changed = True
+        self._damage_all()
 
     def set_border_attr(self, attr):
         """ Change the border attribute. """
         self.border_attr = attr
-        self.screen_changed = True
+        self._damage_all()
 
     def set_colorburst(self, on, rgb_palette, rgb_palette1):
         """ Change the NTSC colorburst setting. """
@@ -570,19 +623,21 @@ class VideoSDL2(video_graphical.VideoGraphical):
                 0, (start-1)*self.font_height,
                 self.size[0], (stop-start+1)*self.font_height)
         sdl2.SDL_FillRect(self.canvas[self.apagenum], scroll_area, back_attr)
-        self.screen_changed = True
+        self._damage(self.apagenum, 0, (start-1)*self.font_height,
+                     self.size[0], (stop-start+1)*self.font_height)
 
     def set_page(self, vpage, apage):
         """ Set the visible and active page. """
         self.vpagenum, self.apagenum = vpage, apage
-        self.screen_changed = True
+        self._damage_all()
 
     def copy_page(self, src, dst):
         """ Copy source to destination page. """
         self.pixels[dst][:] = self.pixels[src][:]
         # alternative:
         # sdl2.SDL_BlitSurface(self.canvas[src], None, self.canvas[dst], None)
-        self.screen_changed = True
+        if dst == self.vpagenum:
+            self._damage_all()
 
     def show_cursor(self, cursor_on):
         """ Change visibility of cursor. """
@@ -606,7 +661,7 @@ class VideoSDL2(video_graphical.VideoGraphical):
         old_y0, old_y1 = from_line*self.font_height, scroll_height*self.font_height
         pixels[x0:x1, new_y0:new_y1] = pixels[x0:x1, old_y0:old_y1]
         pixels[x0:x1, new_y1:old_y1] = numpy.zeros((x1-x0, old_y1-new_y1))
-        self.screen_changed = True
+        self._damage(self.apagenum, x0, new_y0, x1-x0, old_y1-new_y0)
 
     def scroll_down(self, from_line, scroll_height, back_attr):
         """ Scroll the screen down between from_line and scroll_height. """
@@ -617,7 +672,7 @@ class VideoSDL2(video_graphical.VideoGraphical):
         new_y0, new_y1 = from_line*self.font_height, scroll_height*self.font_height
         pixels[x0:x1, new_y0:new_y1] = pixels[x0:x1, old_y0:old_y1]
         pixels[x0:x1, old_y0:new_y0] = numpy.zeros((x1-x0, new_y0-old_y0))
-        self.screen_changed = True
+        self._damage(self.apagenum, x0, old_y0, x1-x0, new_y1-old_y0)
 
     def put_glyph(self, pagenum, row, col, cp, is_fullwidth, fore, back, blink, underline, for_keys):
         """ Put a character at a given position. """
@@ -648,7 +703,7 @@ class VideoSDL2(video_graphical.VideoGraphical):
                 self.canvas[self.apagenum],
                 sdl2.SDL_Rect(x0, y0 + self.font_height - 1, glyph_width, 1),
                 attr)
-        self.screen_changed = True
+        self._damage(pagenum, x0, y0, glyph_width, self.font_height)
 
     def build_glyphs(self, new_dict):
         """ Build a dict of glyphs for use in text mode. """
@@ -665,25 +720,25 @@ class VideoSDL2(video_graphical.VideoGraphical):
     def put_pixel(self, pagenum, x, y, index):
         """ Put a pixel on the screen; callback to empty character buffer. """
         self.pixels[pagenum][x, y] = index
-        self.screen_changed = True
+        self._damage(pagenum, x, y, 1, 1)
 
     def fill_rect(self, pagenum, x0, y0, x1, y1, index):
         """ Fill a rectangle in a solid attribute. """
         rect = sdl2.SDL_Rect(x0, y0, x1-x0+1, y1-y0+1)
         sdl2.SDL_FillRect(self.canvas[pagenum], rect, index)
-        self.screen_changed = True
+        self._damage(pagenum, x0, y0, x1-x0+1, y1-y0+1)
 
     def fill_interval(self, pagenum, x0, x1, y, index):
         """ Fill a scanline interval in a solid attribute. """
         rect = sdl2.SDL_Rect(x0, y, x1-x0+1, 1)
         sdl2.SDL_FillRect(self.canvas[pagenum], rect, index)
-        self.screen_changed = True
+        self._damage(pagenum, x0, y, x1-x0+1, 1)
 
     def put_interval(self, pagenum, x, y, colours):
         """ Write a list of attributes to a scanline interval. """
         # reference the interval on the canvas
         self.pixels[pagenum][x:x+len(colours), y] = numpy.array(colours).astype(int)
-        self.screen_changed = True
+        self._damage(pagenum, x, y, len(colours), 1)
 
     def put_rect(self, pagenum, x0, y0, x1, y1, array):
         """ Apply numpy array [y][x] of attribytes to an area. """
@@ -691,7 +746,7 @@ class VideoSDL2(video_graphical.VideoGraphical):
             return
         # reference the destination area
         self.pixels[pagenum][x0:x1+1, y0:y1+1] = numpy.array(array).T
-        self.screen_changed = True
+        self._damage(pagenum, x0, y0, x1-x0+1, y1-y0+1)
 
 
 ###############################################################################
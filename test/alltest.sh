@@ -1,5 +1,9 @@
 #!/bin/bash
 for test in $(ls -d */)
 do
-    ./test.sh $test
+    # directories without a model are not tests (e.g. bench)
+    if [ -d "$test/model" ]
+    then
+        ./test.sh $test
+    fi
 done
@@ -0,0 +1,138 @@
+#!/usr/bin/env python2
+"""
+PC-BASIC - bench.py
+Benchmark suite runner
+
+(c) 2016 Rob Hagemans
+This file is released under the GNU GPL version 3.
+
+Runs each benchmark program in this directory in a separate headless
+interpreter (video and audio plugins 'none') and writes statements per
+second, wall time and peak memory use to a JSON file. A benchmark NAME.BAS
+that needs particular settings can have them in NAME.INI next to it.
+
+Usage: bench.py [--output=FILE] [--timeout=SECONDS] [NAME ...] [PCBASIC OPTIONS]
+Unrecognised options are passed on to PC-BASIC, e.g. bench.py --precompile
+"""
+
+import os
+import sys
+import json
+import time
+import glob
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import timeit
+try:
+    import resource
+except ImportError:
+    resource = None
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(os.path.dirname(bench_dir))
+
+
+def run_child(program, result_file, options):
+    """ Run a benchmark program in this process and write its figures to a file. """
+    sys.argv = ['pcbasic', '-n', '--run=' + program] + options
+    sys.path.insert(0, root_dir)
+    import pcbasic
+    from pcbasic import statements, debug, state
+    # count statements through the per-token profile
+    statements.profile = debug.TokenProfile()
+    start = timeit.default_timer()
+    pcbasic.main()
+    wall_time = timeit.default_timer() - start
+    count = sum(statements.profile.counts.itervalues())
+    peak = None
+    if resource:
+        # kilobytes on Linux, bytes on Mac OS X
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            peak //= 1024
+    with open(result_file, 'w') as f:
+        json.dump({
+            # error number of the last BASIC error, 0 if none occurred
+            'basic_error': state.basic_state.errn,
+            'version': pcbasic.__version__,
+            'statements': count,
+            'wall_time': wall_time,
+            'statements_per_second': count / wall_time if wall_time else None,
+            'peak_memory_kb': peak,
+            }, f)
+
+def run_benchmark(name, options, timeout):
+    """ Run a benchmark program in a fresh interpreter and working directory. """
+    work_dir = tempfile.mkdtemp()
+    try:
+        shutil.copy(os.path.join(bench_dir, name + '.BAS'), work_dir)
+        ini_file = os.path.join(bench_dir, name + '.INI')
+        if os.path.exists(ini_file):
+            # settings the program needs, such as a video adapter
+            shutil.copy(ini_file, os.path.join(work_dir, 'PCBASIC.INI'))
+        else:
+            with open(os.path.join(work_dir, 'PCBASIC.INI'), 'w') as f:
+                f.write('[pcbasic]\n')
+        result_file = os.path.join(work_dir, 'result.json')
+        with open(os.devnull, 'r+') as null:
+            # on error, the interpreter reads commands from the null device and exits
+            child = subprocess.Popen([sys.executable, os.path.abspath(__file__),
+                        '--child', name + '.BAS', result_file] + options,
+                        cwd=work_dir, stdin=null, stdout=null, stderr=null)
+            deadline = time.time() + timeout
+            while child.poll() is None and time.time() < deadline:
+                time.sleep(0.05)
+            if child.poll() is None:
+                child.kill()
+                child.wait()
+                return {'name': name, 'status': 'timeout'}
+        try:
+            with open(result_file) as f:
+                result = json.load(f)
+        except (IOError, ValueError):
+            return {'name': name, 'status': 'error'}
+        result.update(name=name, status='error' if result['basic_error'] else 'ok')
+        return result
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def main():
+    """ Run the benchmark suite. """
+    if sys.argv[1:2] == ['--child']:
+        run_child(sys.argv[2], sys.argv[3], sys.argv[4:])
+        return
+    parser = argparse.ArgumentParser(description='Run the PC-BASIC benchmark suite.')
+    parser.add_argument('names', nargs='*', metavar='NAME',
+                        help='benchmark to run (default: all)')
+    parser.add_argument('--output', default='bench.json',
+                        help='JSON file to write results to (default: bench.json)')
+    parser.add_argument('--timeout', type=float, default=300.,
+                        help='seconds to allow for each benchmark (default: 300)')
+    args, options = parser.parse_known_args()
+    names = [name.upper() for name in args.names] or sorted(
+                os.path.basename(path)[:-4]
+                for path in glob.glob(os.path.join(bench_dir, '*.BAS')))
+    results = []
+    for name in names:
+        result = run_benchmark(name, options, args.timeout)
+        if result['status'] == 'ok':
+            sys.stdout.write('%-10s %8d statements %9.3fs %10.1f/s %8s kB\n' % (
+                    name, result['statements'], result['wall_time'],
+                    result['statements_per_second'], result['peak_memory_kb']))
+        else:
+            sys.stdout.write('%-10s %s\n' % (name, result['status']))
+        results.append(result)
+    with open(args.output, 'w') as f:
+        json.dump({
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'options': options,
+            'results': results,
+            }, f, indent=2, sort_keys=True)
+
+if __name__ == '__main__':
+    main()